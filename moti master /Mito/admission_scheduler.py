@@ -0,0 +1,152 @@
+"""
+MitoAI Platform - Admission Scheduler
+Creator: Daniel Guzman
+Contact: guzman.daniel@outlook.com
+Copyright: 2025 Daniel Guzman - All Rights Reserved
+
+NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
+
+Per-key concurrency limits and weighted fair queuing in front of model execution
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1]: sorted set of in-flight request tokens scored by lease expiry
+# ARGV: now, lease expiry, limit, token
+ACQUIRE_SLOT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[4])
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2]) - tonumber(ARGV[1])))
+return 1
+"""
+
+TIER_WEIGHTS = {'basic': 1, 'professional': 2, 'enterprise': 4, 'unlimited': 8}
+
+
+class AdmissionRejected(Exception):
+    """Request not admitted; the caller should answer 429 with Retry-After"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('event', 'admitted', 'cancelled')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.admitted = False
+        self.cancelled = False
+
+
+class AdmissionScheduler:
+    """
+    Gates model execution per worker and per API key
+
+    Each key may have at most its tier's concurrent_requests in flight across
+    all workers, tracked as leased tokens in a Redis sorted set so a crashed
+    worker's slots expire. Within a worker at most max_active requests run;
+    the rest wait in per-tier queues served by weighted fair queuing
+    (TIER_WEIGHTS), so a flood of basic traffic cannot starve enterprise keys.
+    Waiting longer than max_queue_seconds, or arriving at a full tier queue,
+    is rejected.
+    """
+
+    def __init__(self, redis_client, max_active: int = 32, max_queue_per_tier: int = 200,
+                 max_queue_seconds: float = 10.0, lease_seconds: int = 300):
+        self.redis = redis_client
+        self.max_active = max_active
+        self.max_queue_per_tier = max_queue_per_tier
+        self.max_queue_seconds = max_queue_seconds
+        self.lease_seconds = lease_seconds
+        self._acquire_slot = redis_client.register_script(ACQUIRE_SLOT_SCRIPT)
+        self._active = 0
+        self._queue = []
+        self._queued = {}
+        self._last_finish = {}
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _acquire_key_slot(self, api_key: str, limit: int):
+        if limit is None or limit < 0:
+            return None
+        token = uuid.uuid4().hex
+        now = time.time()
+        if not self._acquire_slot(keys=[f"concurrency:{api_key}"],
+                                  args=[now, now + self.lease_seconds, limit, token]):
+            raise AdmissionRejected('Concurrent request limit reached for this API key', 1)
+        return token
+
+    def _release_key_slot(self, api_key: str, token):
+        if token is None:
+            return
+        try:
+            self.redis.zrem(f"concurrency:{api_key}", token)
+        except Exception as e:
+            # The lease expires on its own
+            logger.warning(f"Concurrency slot release failed: {str(e)}")
+
+    def _enter(self, tier: str):
+        with self._lock:
+            if self._active < self.max_active:
+                self._active += 1
+                return
+            if self._queued.get(tier, 0) >= self.max_queue_per_tier:
+                raise AdmissionRejected(f'{tier} queue is full', max(int(self.max_queue_seconds), 1))
+            weight = TIER_WEIGHTS.get(tier, 1)
+            finish = max(self._virtual_time, self._last_finish.get(tier, 0.0)) + 1.0 / weight
+            self._last_finish[tier] = finish
+            waiter = _Waiter()
+            heapq.heappush(self._queue, (finish, next(self._sequence), tier, waiter))
+            self._queued[tier] = self._queued.get(tier, 0) + 1
+
+        if waiter.event.wait(self.max_queue_seconds):
+            return
+        with self._lock:
+            if waiter.admitted:
+                return
+            waiter.cancelled = True
+            self._queued[tier] -= 1
+        raise AdmissionRejected('Timed out waiting for capacity', max(int(self.max_queue_seconds), 1))
+
+    def _leave(self):
+        with self._lock:
+            while self._queue:
+                finish, _, tier, waiter = heapq.heappop(self._queue)
+                if waiter.cancelled:
+                    continue
+                self._queued[tier] -= 1
+                self._virtual_time = finish
+                waiter.admitted = True
+                waiter.event.set()
+                return  # The slot passes straight to the waiter
+            self._active -= 1
+
+    @contextmanager
+    def admit(self, api_key: str, tier: str, concurrent_limit: int):
+        """Hold a key slot and a worker slot for the duration of the block"""
+        token = self._acquire_key_slot(api_key, concurrent_limit)
+        try:
+            self._enter(tier)
+        except Exception:
+            self._release_key_slot(api_key, token)
+            raise
+        try:
+            yield
+        finally:
+            self._leave()
+            self._release_key_slot(api_key, token)
@@ -9,14 +9,23 @@ NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
 Advanced AI Project Management System with Industry-Specific Expertise
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 import openai
 import json
 from datetime import datetime, timedelta
 import logging
+import os
 from dataclasses import dataclass
 from typing import Dict, List, Optional
 import uuid
+import textwrap
+from redis import Redis
+from project_state_store import ProjectStateStore
+from phase_executor import PhaseExecutor, find_phase, normalize_phases, phase_instructions as planned_instructions
+from project_context import ProjectContext, PROJECT_BRIEF_FIELDS, PHASE_INSTRUCTIONS, compact_json, truncate_to_tokens
+from streaming_json import IncrementalJSONParser, parse_tolerant
+from plan_retrieval import PlanIndex
+from prompt_cache import PromptCache
 
 class IndustryProjectManagerEngine:
     """
@@ -26,19 +35,23 @@ class IndustryProjectManagerEngine:
     
     def __init__(self):
         self.industry_managers = self.initialize_industry_managers()
-        self.active_projects = {}
+        self.projects = ProjectStateStore(
+            database_url=os.getenv('DATABASE_URL'),
+            redis_client=Redis(host='localhost', port=6379, db=0)
+        )
+        self.phase_executor = PhaseExecutor(self.projects, BaseProjectManager.context)
+        self.plan_index = BaseProjectManager.plan_index
+        # Loads historical plans in every worker process (gunicorn never runs __main__)
+        self.plan_index.start_background_refresh(self.projects.iter_projects)
         self.logger = self.setup_logging()
         
     def initialize_industry_managers(self):
         """Initialize specialized AI project managers for different industries"""
         return {
-            
-            'software': SoftwareProject enginner(),
-            'media': Multi-media enginner(),
-            'manufacturing': Manufacturing/developmnt enginner(),
-            'marketing': MarketingProjectManager(),
-         'communications': (communications engineer),
-         
+            'healthcare': HealthcareProjectManager(),
+            'construction': ConstructionProjectManager(),
+            'software': SoftwareProjectManager(),
+            'finance': FinanceProjectManager()
         }
     
     def setup_logging(self):
@@ -72,27 +85,24 @@ class IndustryProjectManagerEngine:
                     'available_industries': list(self.industry_managers.keys())
                 }
             
-           
-             #im not to sure what to write here
-             = self.industry_managers[industry]
+            project_manager = self.industry_managers[industry]
             
-            Create unique project ID
+            # Create unique project ID
             project_id = str(uuid.uuid4())
             
-            Initialize project with AI manager
+            # Initialize project with AI manager
             project_plan = project_manager.initialize_project(project_data)
             
-            Store active project
-            self.active_projects[project_id] = {
+            # Store active project (shared by every worker; the manager is looked up by industry)
+            project = self.projects.save({
                 'project_id': project_id,
                 'industry': industry,
-                'manager': project_manager,
                 'project_data': project_data,
                 'project_plan': project_plan,
                 'status': 'active',
-                'created_at': datetime.now().isoformat(),
-                'last_updated': datetime.now().isoformat()
-            }
+                'created_at': datetime.now().isoformat()
+            })
+            self.plan_index.add([project])
             
             return {
                 'success': True,
@@ -110,26 +120,61 @@ class IndustryProjectManagerEngine:
     def execute_project_phase(self, project_id: str, phase_instructions: Dict) -> Dict:
         """Execute specific project phase with AI project manager"""
         try:
-            if project_id not in self.active_projects:
+            project = self.projects.get(project_id)
+            if project is None:
                 return {'success': False, 'error': 'Project not found'}
             
-            project = self.active_projects[project_id]
-            manager = project['manager']
+            manager = self.industry_managers[project['industry']]
+            if not isinstance(phase_instructions, dict):
+                phase_instructions = {'description': str(phase_instructions)}
             
-            # Execute phase with specialized manager
-            phase_results = manager.execute_phase(
-                project['project_data'],
-                project['project_plan'],
-                phase_instructions
-            )
+            # Phase ids follow normalize_phases, so results line up with full plan runs
+            requested = (phase_instructions.get('phase_id') or phase_instructions.get('phase')
+                         or project['project_plan'].get('current_phase'))
+            phases = normalize_phases(project['project_plan'])
+            phase = find_phase(phases, requested)
+            if phase is None and phases:
+                return {'success': False, 'error': f'Unknown phase: {requested}'}
+            phase_id = phase['id'] if phase else str(requested or 'phase_1')
             
-            # Update project status
-            project['last_updated'] = datetime.now().isoformat()
-            project['project_plan']['current_phase'] = phase_results.get('next_phase')
+            token = self.projects.acquire_run_lock(project_id)
+            if token is None:
+                return {'success': False, 'error': 'Project is already running'}
+            try:
+                project = self.projects.get(project_id) or project
+                
+                # Execute phase with specialized manager; earlier phases travel as summaries
+                phase_summaries = {
+                    earlier_id: result['summary']
+                    for earlier_id, result in (project.get('phase_results') or {}).items()
+                    if result.get('status') == 'completed' and result.get('summary')
+                }
+                instructions = dict(planned_instructions(phase) if phase else {})
+                instructions.update(phase_instructions, phase=phase, phase_summaries=phase_summaries)
+                phase_results = manager.execute_phase(
+                    project['project_data'],
+                    project['project_plan'],
+                    instructions
+                )
+                
+                # Update project status (records from the store are shared, so copy before changing)
+                project_plan = dict(project['project_plan'], current_phase=phase_results.get('next_phase'))
+                phase_log = {phase_id: {
+                    'status': 'failed' if phase_results.get('error') else 'completed',
+                    'output': phase_results,
+                    'summary': manager.context.summarize(phase_results),
+                    'finished_at': datetime.now().isoformat()
+                }}
+                if phase_results.get('error'):
+                    phase_log[phase_id] = dict(phase_log[phase_id], error=phase_results['error'])
+                project = self.projects.save(dict(project, project_plan=project_plan, phase_results=phase_log))
+            finally:
+                self.projects.release_run_lock(project_id, token)
             
             return {
                 'success': True,
                 'project_id': project_id,
+                'phase_id': phase_id,
                 'phase_results': phase_results,
                 'updated_plan': project['project_plan']
             }
@@ -138,12 +183,117 @@ class IndustryProjectManagerEngine:
             self.logger.error(f"Phase execution failed: {str(e)}")
             return {'success': False, 'error': str(e)}
 
+    def stream_project_assignment(self, industry: str, project_data: Dict):
+        """Like assign_project_manager, but streams plan sections while the plan is generated"""
+        if industry not in self.industry_managers:
+            yield {'event': 'plan_error', 'error': f'Industry {industry} not supported'}
+            return
+        project_manager = self.industry_managers[industry]
+        for event in project_manager.stream_project_plan(project_data):
+            if event['event'] == 'plan_error':
+                # Nothing is saved for a failed plan
+                yield event
+                return
+            if event['event'] != 'plan_complete':
+                yield event
+                continue
+            project = self.projects.save({
+                'project_id': str(uuid.uuid4()),
+                'industry': industry,
+                'project_data': project_data,
+                'project_plan': event['plan'],
+                'status': 'active',
+                'created_at': datetime.now().isoformat()
+            })
+            self.plan_index.add([project])
+            yield dict(event, project_id=project['project_id'])
+    
+    def execute_project_plan(self, project_id: str):
+        """Run every remaining phase of the plan, independent phases in parallel; yields progress events"""
+        project = self.projects.get(project_id)
+        if project is None:
+            return iter([{'event': 'run_failed', 'project_id': project_id, 'error': 'Project not found'}])
+        return self.phase_executor.run(project_id, self.industry_managers[project['industry']])
+
 class BaseProjectManager:
     """
     Base class for all industry-specific AI project managers
     Provides common project management capabilities
     """
     
+    # Keeps phase prompts within a fixed token budget as projects grow
+    context = ProjectContext()
+    
+    # Plan sections reported while the plan is still being generated
+    PLAN_SECTIONS = {'phases': 'phase', 'milestones': 'milestone', 'risks': 'risk'}
+    
+    # Earlier plans and phase summaries, searched for planning exemplars
+    plan_index = PlanIndex()
+    PLAN_EXEMPLARS = 3
+    
+    # Static system prefixes go first so the provider can serve them from its prompt cache
+    prompt_cache = PromptCache()
+    # Persona, profile, standards and task instructions together must stay above MIN_CACHEABLE_TOKENS
+    MANAGEMENT_STANDARDS = """MANAGEMENT STANDARDS (apply to every plan and phase):
+- Severity: "high" threatens safety, compliance, the deadline or more than 10 percent of
+  the budget; "medium" threatens one phase or milestone; "low" is absorbed within a phase.
+- Likelihood: "high" is more likely than not, "medium" is a realistic possibility, "low"
+  needs an unusual combination of events.
+- Every deliverable and risk has one accountable owner, named by role (for example
+  "Project Sponsor", "Lead Engineer", "Compliance Officer"), never by a person's name.
+- Scope, schedule or budget changes go through change control: describe the change, its
+  impact on timeline and cost, and who approves it.
+- Quality gates: a phase is complete only when its deliverables have been reviewed by
+  the owner of every phase that depends on it.
+- Reporting: progress is measured by completed deliverables, not by time spent.
+- Communication: stakeholders listed in the brief are informed at every milestone, and
+  sponsors approve every decision point before the next phase starts.
+"""
+    PLANNING_INSTRUCTIONS = """Create a project plan for the brief given by the user.
+
+INPUT
+The user message holds the PROJECT BRIEF and up to three SIMILAR PAST PLANS found
+among earlier projects. Follow the structure of the past plans where they fit the
+brief (phase breakdown, typical durations, recurring risks), but never copy their
+names, numbers or dates: every figure must come from this brief.
+
+PLANNING RULES
+- Break the work into phases that each end in a reviewable deliverable. Four to ten
+  phases suit most projects.
+- Give every phase a short, stable id in snake_case (for example "requirements" or
+  "vendor_selection"). Ids never change once the plan exists; progress is tracked by
+  them.
+- Express ordering only through depends_on. A phase lists the ids of the phases whose
+  results it needs; phases with no shared dependency can run in parallel, so do not
+  chain independent work. The first phases have an empty depends_on list. No cycles.
+- Durations are whole weeks. The critical path through depends_on must fit the
+  brief's timeline; if it cannot, say so in risks rather than compressing phases.
+- Budget line items must add up to the total, and the total must respect the brief's
+  budget, keeping a contingency reserve of 10 to 15 percent.
+- Include the regulatory, safety and compliance work your industry requires as
+  explicit phases or deliverables, not as footnotes.
+- Milestones mark decision points for stakeholders and reference the phase that
+  completes them.
+
+OUTPUT
+Respond with a single JSON object and nothing else: no prose before or after it and
+no code fences. Write the keys in this order, so the plan can be shown while it is
+still being generated:
+- "objectives": list of measurable objectives, each one sentence.
+- "phases": list of objects {"id", "name", "depends_on" (list of phase ids),
+  "deliverables" (list of strings), "duration_weeks" (number), "instructions"
+  (one paragraph telling the phase executor what to produce)}.
+- "milestones": list of objects {"name", "phase" (phase id), "week" (number),
+  "criteria"}.
+- "risks": list of objects {"risk", "severity" ("low", "medium" or "high"),
+  "likelihood" ("low", "medium" or "high"), "mitigation", "owner"}.
+- "budget": object {"currency", "total", "contingency", "line_items" (list of
+  {"item", "amount", "phase"})}.
+- "timeline_weeks": the length of the critical path in weeks.
+- "current_phase": the id of the first phase to execute.
+Strings use plain text without markdown. Numbers are JSON numbers, not strings.
+"""
+    
     def __init__(self, industry_name: str, expertise_areas: List[str]):
         self.industry_name = industry_name
         self.expertise_areas = expertise_areas
@@ -166,12 +316,12 @@ class BaseProjectManager:
         planning_prompt = self.create_project_planning_prompt(project_data)
         
         try:
-            response = self.openai_client.ChatCompletion.create(
+            response = self.prompt_cache.create(
+                self.openai_client,
+                self.static_prompt(self.PLANNING_INSTRUCTIONS),
+                planning_prompt,
+                name=f"{self.industry_name} planning",
                 model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": self.get_system_prompt()},
-                    {"role": "user", "content": planning_prompt}
-                ],
                 max_tokens=3000,
                 temperature=0.3
             )
@@ -182,6 +332,46 @@ class BaseProjectManager:
         except Exception as e:
             return {'error': f'Project planning failed: {str(e)}'}
     
+    def stream_project_plan(self, project_data: Dict):
+        """Generate the plan as a stream, yielding each phase, milestone and risk as soon as it closes"""
+        parser = IncrementalJSONParser(self.PLAN_SECTIONS)
+        try:
+            response = self.prompt_cache.create(
+                self.openai_client,
+                self.static_prompt(self.PLANNING_INSTRUCTIONS),
+                self.create_project_planning_prompt(project_data),
+                name=f"{self.industry_name} planning",
+                model="gpt-4-turbo-preview",
+                max_tokens=3000,
+                temperature=0.3,
+                stream=True
+            )
+            for chunk in response:
+                for event in parser.feed(chunk.choices[0].delta.get('content') or ''):
+                    yield dict(event, event='plan_section')
+        except Exception as e:
+            # Sections already streamed stay with the client; a partial plan is not completed
+            yield {'event': 'plan_error', 'error': f'Project planning failed: {str(e)}'}
+            return
+        plan = parser.finish()
+        if not isinstance(plan, dict) or not plan.get('phases'):
+            yield {'event': 'plan_error', 'error': 'Project planning failed: no usable plan in the completion'}
+            return
+        yield {'event': 'plan_complete', 'plan': plan}
+    
+    def parse_project_plan(self, content: str) -> Dict:
+        """Plan JSON from the completion, repaired if malformed or truncated"""
+        plan = parse_tolerant(content)
+        if not isinstance(plan, dict):
+            return {'raw_plan': content, 'phases': []}
+        return plan
+    
+    def parse_phase_results(self, content: str) -> Dict:
+        results = parse_tolerant(content)
+        if not isinstance(results, dict):
+            return {'result': content}
+        return results
+    
     def execute_phase(self, project_data: Dict, project_plan: Dict, phase_instructions: Dict) -> Dict:
         """Execute specific project phase with AI expertise"""
         phase_prompt = self.create_phase_execution_prompt(
@@ -189,12 +379,12 @@ class BaseProjectManager:
         )
         
         try:
-            response = self.openai_client.ChatCompletion.create(
+            response = self.prompt_cache.create(
+                self.openai_client,
+                self.static_prompt(PHASE_INSTRUCTIONS),
+                phase_prompt,
+                name=f"{self.industry_name} phase",
                 model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": self.get_system_prompt()},
-                    {"role": "user", "content": phase_prompt}
-                ],
                 max_tokens=4000,
                 temperature=0.3
             )
@@ -205,10 +395,40 @@ class BaseProjectManager:
         except Exception as e:
             return {'error': f'Phase execution failed: {str(e)}'}
     
+    def create_project_planning_prompt(self, project_data: Dict) -> str:
+        """Planning prompt from a compact project brief and the most similar earlier plans"""
+        brief = {field: project_data[field] for field in PROJECT_BRIEF_FIELDS if field in project_data}
+        brief = truncate_to_tokens(compact_json(brief or project_data), self.context.brief_tokens)
+        exemplars = self.plan_index.search(f"{self.industry_name} {brief}", k=self.PLAN_EXEMPLARS)
+        sections = [f"PROJECT BRIEF:\n{brief}"]
+        for number, exemplar in enumerate(exemplars, 1):
+            sections.append(f"SIMILAR PAST PLAN {number} ({exemplar['kind']}):\n{exemplar['text']}")
+        return "\n\n".join(sections)
+    
+    def static_prompt(self, instructions: str) -> str:
+        """System prompt, manager profile and fixed task instructions, identical on every call"""
+        profile = "\n".join([
+            "AREAS OF EXPERTISE:", *(f"- {area}" for area in self.expertise_areas),
+            "", "CAPABILITIES:", *(f"- {capability}" for capability in self.get_capabilities()),
+            "", f"CERTIFICATIONS: {', '.join(self.get_certifications())}",
+        ])
+        return (f"{textwrap.dedent(self.get_system_prompt()).strip()}\n\n{profile}\n\n"
+                f"{self.MANAGEMENT_STANDARDS}\n{instructions}")
+    
+    def create_phase_execution_prompt(self, project_data: Dict, project_plan: Dict, phase_instructions: Dict) -> str:
+        """Phase prompt from summaries of earlier phases and the relevant plan sections only"""
+        return self.context.build_phase_prompt(project_data, project_plan, phase_instructions)
+    
     def get_capabilities(self) -> List[str]:
         """Override in subclasses for industry-specific capabilities"""
         return [
-            
+            'Project Planning and Scheduling',
+            'Risk Identification and Mitigation',
+            'Budget Tracking and Forecasting',
+            'Stakeholder Communication',
+            'Resource Allocation',
+            'Progress Reporting'
+        ]
     
     def get_certifications(self) -> List[str]:
         """Override in subclasses for industry certifications"""
@@ -225,13 +445,20 @@ class HealthcareProjectManager(BaseProjectManager):
         super().__init__(
             industry_name="Healthcare & Medical",
             expertise_areas=[
-                "???
+                "Hospital Operations and Administration",
+                "Medical Device Development",
+                "Clinical Trial Management",
+                "Healthcare IT and HIPAA Compliance",
+                "Patient Safety and Quality Improvement",
+                "Healthcare Facility Design",
+                "Pharmaceutical Research",
+                "Telemedicine and Digital Health"
             ]
         )
     
     def get_system_prompt(self) -> str:
         return """
-        You are a ? with 20+ years of experience managing 
+        You are a Senior Healthcare Project Manager with 20+ years of experience managing 
         complex medical and healthcare projects. You have expertise in:
         
         - Hospital operations and administration
@@ -280,7 +507,16 @@ class ConstructionProjectManager(BaseProjectManager):
         super().__init__(
             industry_name="Construction & Infrastructure",
             expertise_areas=[
-                
+                "Commercial and Residential Construction",
+                "Infrastructure Development",
+                "Permits, Zoning and Regulatory Approvals",
+                "Construction Safety and OSHA Compliance",
+                "Cost Estimation and Budget Control",
+                "Contractor Management",
+                "Building Codes and Engineering Standards",
+                "Environmental Impact Assessment",
+                "Critical Path Scheduling"
+            ]
         )
     
     def get_system_prompt(self) -> str:
@@ -401,13 +637,13 @@ app = Flask(__name__)
 project_engine = IndustryProjectManagerEngine()
 
 @app.route('/api/project-manager/industries', methods=['GET'])
-def cd get_available_industries(): # type: ignore
+def get_available_industries():
     """Get list of available industry project managers"""
     industries = {}
     for industry, manager in project_engine.industry_managers.items():
         industries[industry] = manager.get_manager_profile()
     
-     jsonify({
+    return jsonify({
         'success': True,
         'available_industries': industries,
         'total_industries': len(industries)
@@ -440,6 +676,15 @@ def assign_project_manager():
             'error': str(e)
         }), 500
 
+@app.route('/api/project-manager/assign/stream', methods=['POST'])
+def stream_project_assignment():
+    """Assign a project manager, streaming plan sections as NDJSON while the plan is written"""
+    data = request.json or {}
+    if 'industry' not in data:
+        return jsonify({'success': False, 'error': 'Missing required field: industry'}), 400
+    events = project_engine.stream_project_assignment(data['industry'], data)
+    return Response((json.dumps(event) + '\n' for event in events), mimetype='application/x-ndjson')
+
 @app.route('/api/project-manager/execute-phase', methods=['POST'])
 def execute_project_phase():
     """Execute specific project phase with AI project manager"""
@@ -465,18 +710,23 @@ def execute_project_phase():
             'error': str(e)
         }), 500
 
+@app.route('/api/project-manager/project/<project_id>/run', methods=['POST'])
+def run_project_plan(project_id):
+    """Execute all remaining phases, streaming one JSON progress event per line"""
+    events = project_engine.execute_project_plan(project_id)
+    return Response((json.dumps(event) + '\n' for event in events), mimetype='application/x-ndjson')
+
 @app.route('/api/project-manager/project/<project_id>/status', methods=['GET'])
 def get_project_status(project_id):
     """Get current project status and progress"""
     try:
-        if project_id not in project_engine.active_projects:
+        project = project_engine.projects.get(project_id)
+        if project is None:
             return jsonify({
                 'success': False,
                 'error': 'Project not found'
             }), 404
         
-        project = project_engine.active_projects[project_id]
-        
         return jsonify({
             'success': True,
             'project_id': project_id,
@@ -502,7 +752,8 @@ def platform_status():
         'creator': 'Daniel Guzman',
         'contact': 'guzman.daniel@outlook.com',
         'version': '1.0.0',
-        'active_projects': len(project_engine.active_projects),
+        'active_projects': project_engine.projects.count_active(),
+        'prompt_cache': BaseProjectManager.prompt_cache.stats(),
         'supported_industries': len(project_engine.industry_managers),
         'timestamp': datetime.now().isoformat()
     })
@@ -10,6 +10,7 @@ Scalable API Key Distribution System for Multiple AI Business Models
 """
 
 from flask import Flask, request, jsonify
+from functools import lru_cache, wraps
 import openai
 import json
 from datetime import datetime, timedelta
@@ -19,8 +20,397 @@ import hmac
 from dataclasses import dataclass
 from typing import Dict, List, Optional
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
 import redis
+import psycopg2
+from psycopg2.extras import execute_values
 from cryptography.fernet import Fernet
+from admission_scheduler import AdmissionScheduler, AdmissionRejected
+from prompt_cache import PromptCache
+
+KEY_CONFIG_INVALIDATION_CHANNEL = 'mitoai:key-config:invalidate'
+
+# Usage counters: one hash per key per month plus a lifetime hash, updated with HINCRBY
+USAGE_MONTH_TTL_SECONDS = 400 * 86400
+USAGE_ROLLUP_INTERVAL_SECONDS = 300
+# Monthly hashes changed since the last rollup, so the rollup never scans the keyspace
+USAGE_DIRTY_SET = 'usage:dirty'
+USAGE_ROLLUP_LOCK = 'usage:rollup:lock'
+USAGE_LEGACY_MIGRATED = 'usage:legacy-migrated'
+
+# KEYS: month hash, lifetime hash, dirty set
+# ARGV: day field, monthly limit, daily limit (-1 is unlimited), now, month TTL
+# Checks the key's monthly and daily limits and counts the request in the same call;
+# returns {status, monthly, daily} with status 1 admitted, 0 monthly limit, -1 daily limit
+COUNT_USAGE_SCRIPT = """
+local monthly = tonumber(redis.call('HGET', KEYS[1], 'total_requests') or '0')
+local daily = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+local monthly_limit = tonumber(ARGV[2])
+local daily_limit = tonumber(ARGV[3])
+if monthly_limit >= 0 and monthly >= monthly_limit then
+    return {0, monthly, daily}
+end
+if daily_limit >= 0 and daily >= daily_limit then
+    return {-1, monthly, daily}
+end
+for i = 1, 2 do
+    redis.call('HINCRBY', KEYS[i], 'total_requests', 1)
+    redis.call('HSET', KEYS[i], 'last_used', ARGV[4])
+end
+redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[5]))
+redis.call('SADD', KEYS[3], KEYS[1])
+return {1, monthly + 1, daily + 1}
+"""
+
+# KEYS: legacy usage:<api_key> JSON blob, lifetime hash, dirty set
+# ARGV: monthly hash prefix (usage:<api_key>:), month TTL
+# Folds a blob written before the hash counters into them and deletes it, atomically
+MIGRATE_LEGACY_USAGE_SCRIPT = """
+local blob = redis.call('GET', KEYS[1])
+if not blob then
+    return 0
+end
+local usage = cjson.decode(blob)
+for _, field in ipairs({'total_requests', 'successful_requests', 'failed_requests'}) do
+    if type(usage[field]) == 'number' and usage[field] > 0 then
+        redis.call('HINCRBY', KEYS[2], field, usage[field])
+    end
+end
+if type(usage['last_used']) == 'string' then
+    redis.call('HSETNX', KEYS[2], 'last_used', usage['last_used'])
+end
+if type(usage['monthly_usage']) == 'table' then
+    for month, count in pairs(usage['monthly_usage']) do
+        local key = ARGV[1] .. month
+        redis.call('HINCRBY', key, 'total_requests', count)
+        redis.call('EXPIRE', key, tonumber(ARGV[2]))
+        redis.call('SADD', KEYS[3], key)
+    end
+end
+redis.call('DEL', KEYS[1])
+return 1
+"""
+
+USAGE_ROLLUP_DDL = """
+    CREATE TABLE IF NOT EXISTS api_key_usage_monthly (
+        api_key_hash VARCHAR(64) NOT NULL,
+        month VARCHAR(7) NOT NULL,
+        total_requests BIGINT NOT NULL DEFAULT 0,
+        successful_requests BIGINT NOT NULL DEFAULT 0,
+        failed_requests BIGINT NOT NULL DEFAULT 0,
+        daily_requests JSONB NOT NULL DEFAULT '{}',
+        last_used TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (api_key_hash, month)
+    )
+"""
+
+def usage_month_key(api_key: str, month: str) -> str:
+    return f"usage:{api_key}:{month}"
+
+def usage_total_key(api_key: str) -> str:
+    return f"usage:{api_key}:all"
+
+class KeyConfigCache:
+    """
+    Bounded TTL cache of decrypted API key configurations
+    
+    Unknown keys are cached as None for a shorter negative TTL. Entries are
+    dropped on every worker as soon as an invalidation is published. Every
+    invalidation bumps a generation counter; a loader reads generation()
+    before fetching from Redis and put() refuses its entry if an
+    invalidation happened meanwhile, so a slow load cannot re-cache a
+    configuration that was just changed.
+    """
+    
+    def __init__(self, max_entries: int = 50000, ttl_seconds: float = 300, negative_ttl_seconds: float = 5):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+    
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+    
+    def get(self, api_key: str):
+        """Return (hit, entry); entry is None for a cached unknown key"""
+        entry = self._entries.get(api_key)
+        if entry is None or entry[1] < time.monotonic():
+            return False, None
+        return True, entry[0]
+    
+    def put(self, api_key: str, entry, generation: int) -> bool:
+        """Cache entry unless anything was invalidated since generation was read"""
+        ttl = self.ttl_seconds if entry is not None else self.negative_ttl_seconds
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._entries[api_key] = (entry, time.monotonic() + ttl)
+            self._entries.move_to_end(api_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+    
+    def invalidate(self, api_key: str):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(api_key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+# Category -> model name -> implementing class, resolved on first use
+MODEL_CATALOG = {
+    # PROJECT MANAGEMENT MODELS
+    'project_managers': {
+        'healthcare_pm': 'HealthcareProjectManagerModel',
+        'construction_pm': 'ConstructionProjectManagerModel',
+        'software_pm': 'SoftwareProjectManagerModel',
+        'finance_pm': 'FinanceProjectManagerModel',
+        'manufacturing_pm': 'ManufacturingProjectManagerModel',
+        'legal_pm': 'LegalProjectManagerModel',
+        'energy_pm': 'EnergyProjectManagerModel',
+        'aerospace_pm': 'AerospaceProjectManagerModel',
+        'automotive_pm': 'AutomotiveProjectManagerModel',
+        'retail_pm': 'RetailProjectManagerModel'
+    },
+    
+    # SPECIALIZED CONSULTANT MODELS
+    'consultants': {
+        'business_strategy': 'BusinessStrategyConsultantModel',
+        'financial_advisor': 'FinancialAdvisorModel',
+        'marketing_strategist': 'MarketingStrategistModel',
+        'hr_consultant': 'HRConsultantModel',
+        'legal_advisor': 'LegalAdvisorModel',
+        'it_consultant': 'ITConsultantModel',
+        'operations_optimizer': 'OperationsOptimizerModel',
+        'compliance_officer': 'ComplianceOfficerModel',
+        'risk_manager': 'RiskManagerModel',
+        'quality_assurance': 'QualityAssuranceModel'
+    },
+    
+    # INDUSTRY SPECIALIST MODELS
+    'industry_specialists': {
+        'real_estate_agent': 'RealEstateAgentModel',
+        'insurance_agent': 'InsuranceAgentModel',
+        'investment_banker': 'InvestmentBankerModel',
+        'medical_specialist': 'MedicalSpecialistModel',
+        'education_coordinator': 'EducationCoordinatorModel',
+        'hospitality_manager': 'HospitalityManagerModel',
+        'logistics_coordinator': 'LogisticsCoordinatorModel',
+        'agriculture_advisor': 'AgricultureAdvisorModel',
+        'mining_engineer': 'MiningEngineerModel',
+        'pharmaceutical_researcher': 'PharmaceuticalResearcherModel'
+    },
+    
+    # CREATIVE PROFESSIONAL MODELS
+    'creative_professionals': {
+        'content_creator': 'ContentCreatorModel',
+        'graphic_designer': 'GraphicDesignerModel',
+        'video_producer': 'VideoProducerModel',
+        'copywriter': 'CopywriterModel',
+        'social_media_manager': 'SocialMediaManagerModel',
+        'brand_strategist': 'BrandStrategistModel',
+        'advertising_executive': 'AdvertisingExecutiveModel',
+        'pr_specialist': 'PRSpecialistModel',
+        'event_planner': 'EventPlannerModel',
+        'interior_designer': 'InteriorDesignerModel'
+    },
+    
+    # TECHNICAL SPECIALIST MODELS
+    'technical_specialists': {
+        'data_scientist': 'DataScientistModel',
+        'cybersecurity_expert': 'CybersecurityExpertModel',
+        'cloud_architect': 'CloudArchitectModel',
+        'devops_engineer': 'DevOpsEngineerModel',
+        'ai_engineer': 'AIEngineerModel',
+        'blockchain_developer': 'BlockchainDeveloperModel',
+        'iot_specialist': 'IoTSpecialistModel',
+        'automation_engineer': 'AutomationEngineerModel',
+        'systems_analyst': 'SystemsAnalystModel',
+        'database_administrator': 'DatabaseAdministratorModel'
+    },
+    
+    # RESEARCH & ANALYSIS MODELS
+    'researchers': {
+        'market_researcher': 'MarketResearcherModel',
+        'business_analyst': 'BusinessAnalystModel',
+        'financial_analyst': 'FinancialAnalystModel',
+        'data_analyst': 'DataAnalystModel',
+        'competitive_intelligence': 'CompetitiveIntelligenceModel',
+        'trend_analyst': 'TrendAnalystModel',
+        'policy_researcher': 'PolicyResearcherModel',
+        'academic_researcher': 'AcademicResearcherModel',
+        'patent_researcher': 'PatentResearcherModel',
+        'investment_researcher': 'InvestmentResearcherModel'
+    },
+    
+    # SPECIALIZED SERVICE MODELS
+    'service_providers': {
+        'personal_assistant': 'PersonalAssistantModel',
+        'executive_coach': 'ExecutiveCoachModel',
+        'career_counselor': 'CareerCounselorModel',
+        'life_coach': 'LifeCoachModel',
+        'fitness_trainer': 'FitnessTrainerModel',
+        'nutrition_advisor': 'NutritionAdvisorModel',
+        'travel_planner': 'TravelPlannerModel',
+        'financial_planner': 'FinancialPlannerModel',
+        'tax_advisor': 'TaxAdvisorModel',
+        'estate_planner': 'EstatePlannerModel'
+    }
+}
+
+CATEGORY_PRICES = {
+    'project_managers': {
+        'basic': 99,
+        'professional': 299,
+        'enterprise': 999,
+        'unlimited': 2999
+    },
+    'consultants': {
+        'basic': 199,
+        'professional': 599,
+        'enterprise': 1999,
+        'unlimited': 5999
+    },
+    'industry_specialists': {
+        'basic': 149,
+        'professional': 449,
+        'enterprise': 1499,
+        'unlimited': 4499
+    },
+    'creative_professionals': {
+        'basic': 79,
+        'professional': 199,
+        'enterprise': 699,
+        'unlimited': 1999
+    },
+    'technical_specialists': {
+        'basic': 299,
+        'professional': 899,
+        'enterprise': 2999,
+        'unlimited': 8999
+    },
+    'researchers': {
+        'basic': 199,
+        'professional': 599,
+        'enterprise': 1999,
+        'unlimited': 5999
+    },
+    'service_providers': {
+        'basic': 49,
+        'professional': 149,
+        'enterprise': 499,
+        'unlimited': 1499
+    }
+}
+
+class ModelRegistry:
+    """
+    Name, category and pricing lookups for the AI business models
+    
+    All indexes are built once from MODEL_CATALOG; model instances are
+    created on first use. The /api/models/available body is rendered once
+    and served with a content ETag.
+    """
+    
+    def __init__(self, catalog: Dict[str, Dict[str, str]] = MODEL_CATALOG):
+        self.catalog = catalog
+        self.category_of = {
+            model_name: category
+            for category, models in catalog.items()
+            for model_name in models
+        }
+        self.prices = {
+            (category, access_level): {
+                'monthly_price': price,
+                'currency': 'USD',
+                'billing_cycle': 'monthly',
+                'includes_support': access_level in ['professional', 'enterprise', 'unlimited']
+            }
+            for category in catalog
+            for access_level, price in CATEGORY_PRICES.get(category, CATEGORY_PRICES['consultants']).items()
+        }
+        # Bounded: business_model comes from clients, so arbitrary names must not grow it forever
+        self._suffix_match = lru_cache(maxsize=4096)(self._find_suffix_match)
+        self._instances = {}
+        self._lock = threading.Lock()
+        self._available = None
+    
+    def resolve_category(self, business_model: str) -> Optional[str]:
+        """Category for a model name, also matching names that end with a catalog model name"""
+        category = self.category_of.get(business_model)
+        if category is not None:
+            return category
+        return self._suffix_match(business_model)
+    
+    def _find_suffix_match(self, business_model: str) -> Optional[str]:
+        return next(
+            (category for model_name, category in self.category_of.items()
+             if business_model.endswith(model_name)),
+            None
+        )
+    
+    def pricing(self, business_model: str, access_level: str) -> Dict:
+        category = self.resolve_category(business_model)
+        if category is None:
+            return {'monthly_price': 99, 'currency': 'USD', 'billing_cycle': 'monthly'}
+        tier = self.prices.get((category, access_level))
+        if tier is None:
+            return {'monthly_price': 99, 'currency': 'USD', 'billing_cycle': 'monthly', 'includes_support': False}
+        return dict(tier)
+    
+    def has_model(self, category: str, model_name: str) -> bool:
+        return model_name in self.catalog.get(category, ())
+    
+    def get(self, category: str, model_name: str) -> Optional['BaseAIBusinessModel']:
+        """Model instance, created on first request; None if its class is not installed"""
+        key = (category, model_name)
+        instance = self._instances.get(key)
+        if instance is None and self.has_model(category, model_name):
+            with self._lock:
+                instance = self._instances.get(key)
+                if instance is None:
+                    model_class = globals().get(self.catalog[category][model_name])
+                    if model_class is None:
+                        return None
+                    instance = self._instances[key] = model_class()
+        return instance
+    
+    def available(self):
+        """(json body, etag) for every installed model, rendered once"""
+        if self._available is None:
+            models_info = {}
+            for category, models in self.catalog.items():
+                for model_name in models:
+                    instance = self.get(category, model_name)
+                    if instance is None:
+                        continue
+                    models_info.setdefault(category, {})[model_name] = {
+                        'name': instance.model_name,
+                        'expertise_areas': instance.expertise_areas,
+                        'pricing_tiers': self.pricing(model_name, 'professional')
+                    }
+            body = json.dumps({
+                'success': True,
+                'available_models': models_info,
+                'total_categories': len(models_info),
+                'total_models': sum(len(models) for models in models_info.values())
+            })
+            self._available = (body, hashlib.sha256(body.encode()).hexdigest()[:32])
+        return self._available
+    
+    def model_count(self) -> int:
+        return len(self.category_of)
 
 class MitoAIAPIKeyDistributionEngine:
     """
@@ -32,113 +422,79 @@ class MitoAIAPIKeyDistributionEngine:
         self.redis_client = redis.Redis(host='localhost', port=6379, db=0)
         self.encryption_key = Fernet.generate_key()
         self.cipher_suite = Fernet(self.encryption_key)
-        self.business_models = self.initialize_business_models()
+        self.registry = ModelRegistry()
         self.api_key_registry = {}
-        self.usage_analytics = {}
         self.logger = self.setup_logging()
+        self.key_config_cache = KeyConfigCache()
+        self.scheduler = AdmissionScheduler(self.redis_client)
+        self._count_usage = self.redis_client.register_script(COUNT_USAGE_SCRIPT)
+        self._migrate_legacy_usage = self.redis_client.register_script(MIGRATE_LEGACY_USAGE_SCRIPT)
+        self._worker_id = uuid.uuid4().hex
+        self.start_invalidation_listener()
+        try:
+            self.migrate_legacy_usage()
+        except Exception as e:
+            self.logger.error(f"Legacy usage migration failed: {str(e)}")
+        self.usage_db_url = os.environ.get('DATABASE_URL')
+        if self.usage_db_url:
+            self.start_usage_rollup()
+    
+    def start_invalidation_listener(self):
+        """Drop cached key configs when any worker publishes a change"""
+        def listen():
+            while True:
+                try:
+                    pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(KEY_CONFIG_INVALIDATION_CHANNEL)
+                    # Anything cached before (re)subscribing may have missed a message
+                    self.key_config_cache.clear()
+                    for message in pubsub.listen():
+                        self.key_config_cache.invalidate(message['data'].decode())
+                except Exception as e:
+                    self.logger.error(f"Key config invalidation listener failed: {str(e)}")
+                    time.sleep(1)
         
-    def initialize_business_models(self):
-        """Initialize all available AI business models"""
-        return {
-            # PROJECT MANAGEMENT MODELS
-            'project_managers': {
-                'healthcare_pm': HealthcareProjectManagerModel(),
-                'construction_pm': ConstructionProjectManagerModel(),
-                'software_pm': SoftwareProjectManagerModel(),
-                'finance_pm': FinanceProjectManagerModel(),
-                'manufacturing_pm': ManufacturingProjectManagerModel(),
-                'legal_pm': LegalProjectManagerModel(),
-                'energy_pm': EnergyProjectManagerModel(),
-                'aerospace_pm': AerospaceProjectManagerModel(),
-                'automotive_pm': AutomotiveProjectManagerModel(),
-                'retail_pm': RetailProjectManagerModel()
-            },
-            
-            # SPECIALIZED CONSULTANT MODELS
-            'consultants': {
-                'business_strategy': BusinessStrategyConsultantModel(),
-                'financial_advisor': FinancialAdvisorModel(),
-                'marketing_strategist': MarketingStrategistModel(),
-                'hr_consultant': HRConsultantModel(),
-                'legal_advisor': LegalAdvisorModel(),
-                'it_consultant': ITConsultantModel(),
-                'operations_optimizer': OperationsOptimizerModel(),
-                'compliance_officer': ComplianceOfficerModel(),
-                'risk_manager': RiskManagerModel(),
-                'quality_assurance': QualityAssuranceModel()
-            },
-            
-            # INDUSTRY SPECIALIST MODELS
-            'industry_specialists': {
-                'real_estate_agent': RealEstateAgentModel(),
-                'insurance_agent': InsuranceAgentModel(),
-                'investment_banker': InvestmentBankerModel(),
-                'medical_specialist': MedicalSpecialistModel(),
-                'education_coordinator': EducationCoordinatorModel(),
-                'hospitality_manager': HospitalityManagerModel(),
-                'logistics_coordinator': LogisticsCoordinatorModel(),
-                'agriculture_advisor': AgricultureAdvisorModel(),
-                'mining_engineer': MiningEngineerModel(),
-                'pharmaceutical_researcher': PharmaceuticalResearcherModel()
-            },
-            
-            # CREATIVE PROFESSIONAL MODELS
-            'creative_professionals': {
-                'content_creator': ContentCreatorModel(),
-                'graphic_designer': GraphicDesignerModel(),
-                'video_producer': VideoProducerModel(),
-                'copywriter': CopywriterModel(),
-                'social_media_manager': SocialMediaManagerModel(),
-                'brand_strategist': BrandStrategistModel(),
-                'advertising_executive': AdvertisingExecutiveModel(),
-                'pr_specialist': PRSpecialistModel(),
-                'event_planner': EventPlannerModel(),
-                'interior_designer': InteriorDesignerModel()
-            },
-            
-            # TECHNICAL SPECIALIST MODELS
-            'technical_specialists': {
-                'data_scientist': DataScientistModel(),
-                'cybersecurity_expert': CybersecurityExpertModel(),
-                'cloud_architect': CloudArchitectModel(),
-                'devops_engineer': DevOpsEngineerModel(),
-                'ai_engineer': AIEngineerModel(),
-                'blockchain_developer': BlockchainDeveloperModel(),
-                'iot_specialist': IoTSpecialistModel(),
-                'automation_engineer': AutomationEngineerModel(),
-                'systems_analyst': SystemsAnalystModel(),
-                'database_administrator': DatabaseAdministratorModel()
-            },
-            
-            # RESEARCH & ANALYSIS MODELS
-            'researchers': {
-                'market_researcher': MarketResearcherModel(),
-                'business_analyst': BusinessAnalystModel(),
-                'financial_analyst': FinancialAnalystModel(),
-                'data_analyst': DataAnalystModel(),
-                'competitive_intelligence': CompetitiveIntelligenceModel(),
-                'trend_analyst': TrendAnalystModel(),
-                'policy_researcher': PolicyResearcherModel(),
-                'academic_researcher': AcademicResearcherModel(),
-                'patent_researcher': PatentResearcherModel(),
-                'investment_researcher': InvestmentResearcherModel()
-            },
-            
-            # SPECIALIZED SERVICE MODELS
-            'service_providers': {
-                'personal_assistant': PersonalAssistantModel(),
-                'executive_coach': ExecutiveCoachModel(),
-                'career_counselor': CareerCounselorModel(),
-                'life_coach': LifeCoachModel(),
-                'fitness_trainer': FitnessTrainerModel(),
-                'nutrition_advisor': NutritionAdvisorModel(),
-                'travel_planner': TravelPlannerModel(),
-                'financial_planner': FinancialPlannerModel(),
-                'tax_advisor': TaxAdvisorModel(),
-                'estate_planner': EstatePlannerModel()
-            }
-        }
+        threading.Thread(target=listen, name='key-config-invalidation', daemon=True).start()
+    
+    def publish_key_change(self, api_key: str):
+        self.key_config_cache.invalidate(api_key)
+        self.redis_client.publish(KEY_CONFIG_INVALIDATION_CHANNEL, api_key)
     
+    def load_key_config(self, api_key: str):
+        """Cached (key_config, expires_at) for a key, or None if it does not exist"""
+        hit, entry = self.key_config_cache.get(api_key)
+        if hit:
+            return entry
+        
+        generation = self.key_config_cache.generation()
+        encrypted_config = self.redis_client.get(api_key)
+        entry = None
+        if encrypted_config:
+            key_config = json.loads(self.cipher_suite.decrypt(encrypted_config).decode())
+            entry = (key_config, datetime.fromisoformat(key_config['expires_at']))
+        self.key_config_cache.put(api_key, entry, generation)
+        return entry
+    
+    def update_key_config(self, api_key: str, changes: Dict) -> Dict:
+        """Persist changes to a key's configuration and invalidate every worker's cache"""
+        encrypted_config = self.redis_client.get(api_key)
+        if not encrypted_config:
+            return {'success': False, 'error': 'Invalid API key'}
+        
+        key_config = json.loads(self.cipher_suite.decrypt(encrypted_config).decode())
+        key_config.update(changes)
+        ttl = self.redis_client.ttl(api_key)
+        encrypted_config = self.cipher_suite.encrypt(json.dumps(key_config).encode())
+        self.redis_client.setex(api_key, ttl if ttl and ttl > 0 else 31536000, encrypted_config)
+        
+        if api_key in self.api_key_registry:
+            self.api_key_registry[api_key] = key_config
+        self.publish_key_change(api_key)
+        return {'success': True, 'api_key': api_key[:16] + '...', 'updated_fields': list(changes)}
+    
+    def revoke_api_key(self, api_key: str) -> Dict:
+        return self.update_key_config(api_key, {'status': 'revoked'})
+        
     def generate_api_key(self, client_data: Dict, business_model: str, access_level: str) -> Dict:
         """
         Generate secure API key for specific business model access
@@ -176,19 +532,11 @@ class MitoAIAPIKeyDistributionEngine:
             # Encrypt and store key configuration
             encrypted_config = self.cipher_suite.encrypt(json.dumps(key_config).encode())
             self.redis_client.setex(api_key, 31536000, encrypted_config)  # 1 year expiry
+            self.publish_key_change(api_key)  # Clear any negative cache entry
             
             # Store in key registry
             self.api_key_registry[api_key] = key_config
             
-            # Initialize usage tracking
-            self.usage_analytics[api_key] = {
-                'total_requests': 0,
-                'successful_requests': 0,
-                'failed_requests': 0,
-                'last_used': None,
-                'monthly_usage': {}
-            }
-            
             return {
                 'success': True,
                 'api_key': api_key,
@@ -206,23 +554,19 @@ class MitoAIAPIKeyDistributionEngine:
             return {'success': False, 'error': str(e)}
     
     def validate_api_key(self, api_key: str, requested_model: str) -> Dict:
-        """Validate API key and check access permissions"""
+        """Validate API key and check access permissions; an admitted request is counted against its limits"""
         try:
-            # Check if key exists in Redis
-            encrypted_config = self.redis_client.get(api_key)
-            if not encrypted_config:
+            # Decrypted configuration from the in-process cache, Redis on a miss
+            entry = self.load_key_config(api_key)
+            if entry is None:
                 return {'valid': False, 'error': 'Invalid API key'}
-            
-            # Decrypt and parse configuration
-            config_json = self.cipher_suite.decrypt(encrypted_config).decode()
-            key_config = json.loads(config_json)
+            key_config, expires_at = entry
             
             # Check if key is still active
             if key_config['status'] != 'active':
                 return {'valid': False, 'error': 'API key is inactive'}
             
             # Check expiration
-            expires_at = datetime.fromisoformat(key_config['expires_at'])
             if datetime.now() > expires_at:
                 return {'valid': False, 'error': 'API key has expired'}
             
@@ -230,18 +574,27 @@ class MitoAIAPIKeyDistributionEngine:
             if requested_model != key_config['business_model']:
                 return {'valid': False, 'error': 'Model access not authorized'}
             
-            # Check usage limits
-            current_usage = self.get_current_usage(api_key)
+            # Check usage limits and count the request in one atomic call (a limit of -1 means unlimited)
             usage_limits = key_config['usage_limits']
-            
-            if current_usage['monthly_requests'] >= usage_limits['monthly_limit']:
+            now = datetime.now()
+            status, monthly_requests, _ = self._count_usage(
+                keys=[usage_month_key(api_key, now.strftime('%Y-%m')), usage_total_key(api_key), USAGE_DIRTY_SET],
+                args=[f"day:{now.strftime('%d')}", usage_limits['monthly_limit'], usage_limits['daily_limit'],
+                      now.isoformat(), USAGE_MONTH_TTL_SECONDS]
+            )
+            if status == 0:
                 return {'valid': False, 'error': 'Monthly usage limit exceeded'}
             
+            if status == -1:
+                return {'valid': False, 'error': 'Daily usage limit exceeded'}
+            
             return {
                 'valid': True,
                 'client_id': key_config['client_id'],
                 'access_level': key_config['access_level'],
-                'remaining_requests': usage_limits['monthly_limit'] - current_usage['monthly_requests']
+                'concurrent_requests': usage_limits['concurrent_requests'],
+                'remaining_requests': usage_limits['monthly_limit'] - monthly_requests,
+                'counted_at': now
             }
             
         except Exception as e:
@@ -260,15 +613,21 @@ class MitoAIAPIKeyDistributionEngine:
             model_category = model_request.get('category')
             model_name = model_request.get('model')
             
-            if model_category not in self.business_models:
+            if model_category not in self.registry.catalog:
                 return {'success': False, 'error': f'Model category {model_category} not found'}
             
-            if model_name not in self.business_models[model_category]:
+            model_instance = self.registry.get(model_category, model_name)
+            if model_instance is None:
                 return {'success': False, 'error': f'Model {model_name} not found in {model_category}'}
             
-            # Execute the model request
-            model_instance = self.business_models[model_category][model_name]
-            result = model_instance.process_request(model_request['data'])
+            # Execute the model request once admitted for this key and tier
+            try:
+                with self.scheduler.admit(api_key, validation['access_level'], validation['concurrent_requests']):
+                    result = model_instance.process_request(model_request['data'])
+            except AdmissionRejected as e:
+                # Never run, so it gives back the quota validate_api_key charged; the route answers 429
+                self.refund_usage(api_key, validation['counted_at'])
+                return {'success': False, 'error': e.reason, 'retry_after': int(e.retry_after)}
             
             # Track usage
             self.track_usage(api_key, True if result.get('success') else False)
@@ -313,126 +672,177 @@ class MitoAIAPIKeyDistributionEngine:
     
     def get_pricing_tier(self, business_model: str, access_level: str) -> Dict:
         """Get pricing information for business model and access level"""
-        base_prices = {
-            'project_managers': {
-                'basic': 99,
-                'professional': 299,
-                'enterprise': 999,
-                'unlimited': 2999
-            },
-            'consultants': {
-                'basic': 199,
-                'professional': 599,
-                'enterprise': 1999,
-                'unlimited': 5999
-            },
-            'industry_specialists': {
-                'basic': 149,
-                'professional': 449,
-                'enterprise': 1499,
-                'unlimited': 4499
-            },
-            'creative_professionals': {
-                'basic': 79,
-                'professional': 199,
-                'enterprise': 699,
-                'unlimited': 1999
-            },
-            'technical_specialists': {
-                'basic': 299,
-                'professional': 899,
-                'enterprise': 2999,
-                'unlimited': 8999
-            },
-            'researchers': {
-                'basic': 199,
-                'professional': 599,
-                'enterprise': 1999,
-                'unlimited': 5999
-            },
-            'service_providers': {
-                'basic': 49,
-                'professional': 149,
-                'enterprise': 499,
-                'unlimited': 1499
-            }
-        }
-        
-        # Determine category from business model
-        for category, models in self.business_models.items():
-            if any(business_model.endswith(model) for model in models.keys()):
-                category_prices = base_prices.get(category, base_prices['consultants'])
-                return {
-                    'monthly_price': category_prices.get(access_level, 99),
-                    'currency': 'USD',
-                    'billing_cycle': 'monthly',
-                    'includes_support': access_level in ['professional', 'enterprise', 'unlimited']
-                }
-        
-        return {'monthly_price': 99, 'currency': 'USD', 'billing_cycle': 'monthly'}
+        return self.registry.pricing(business_model, access_level)
     
     def track_usage(self, api_key: str, success: bool):
-        """Track API usage for analytics and billing"""
+        """Record the outcome of a request validate_api_key already counted (one round trip)"""
         try:
-            if api_key not in self.usage_analytics:
-                self.usage_analytics[api_key] = {
-                    'total_requests': 0,
-                    'successful_requests': 0,
-                    'failed_requests': 0,
-                    'last_used': None,
-                    'monthly_usage': {}
-                }
-            
-            analytics = self.usage_analytics[api_key]
-            current_month = datetime.now().strftime('%Y-%m')
+            month_key = usage_month_key(api_key, datetime.now().strftime('%Y-%m'))
+            outcome = 'successful_requests' if success else 'failed_requests'
             
-            # Update counters
-            analytics['total_requests'] += 1
-            if success:
-                analytics['successful_requests'] += 1
-            else:
-                analytics['failed_requests'] += 1
-            
-            analytics['last_used'] = datetime.now().isoformat()
-            
-            # Update monthly usage
-            if current_month not in analytics['monthly_usage']:
-                analytics['monthly_usage'][current_month] = 0
-            analytics['monthly_usage'][current_month] += 1
-            
-            # Store in Redis for persistence
-            self.redis_client.setex(
-                f"usage:{api_key}",
-                2592000,  # 30 days
-                json.dumps(analytics)
-            )
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in (month_key, usage_total_key(api_key)):
+                pipe.hincrby(key, outcome, 1)
+            pipe.sadd(USAGE_DIRTY_SET, month_key)
+            pipe.execute()
             
         except Exception as e:
             self.logger.error(f"Usage tracking failed: {str(e)}")
     
+    def refund_usage(self, api_key: str, counted_at: datetime):
+        """Undo the counting validate_api_key did at counted_at, for a request that never ran"""
+        try:
+            month_key = usage_month_key(api_key, counted_at.strftime('%Y-%m'))
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in (month_key, usage_total_key(api_key)):
+                pipe.hincrby(key, 'total_requests', -1)
+            pipe.hincrby(month_key, f"day:{counted_at.strftime('%d')}", -1)
+            pipe.sadd(USAGE_DIRTY_SET, month_key)
+            pipe.execute()
+            
+        except Exception as e:
+            self.logger.error(f"Usage refund failed: {str(e)}")
+    
     def get_current_usage(self, api_key: str) -> Dict:
         """Get current usage statistics for API key"""
         try:
-            if api_key in self.usage_analytics:
-                analytics = self.usage_analytics[api_key]
-                current_month = datetime.now().strftime('%Y-%m')
-                
-                return {
-                    'total_requests': analytics['total_requests'],
-                    'monthly_requests': analytics['monthly_usage'].get(current_month, 0),
-                    'success_rate': (analytics['successful_requests'] / max(analytics['total_requests'], 1)) * 100,
-                    'last_used': analytics['last_used']
-                }
+            now = datetime.now()
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hgetall(usage_total_key(api_key))
+            pipe.hgetall(usage_month_key(api_key, now.strftime('%Y-%m')))
+            totals, month = [
+                {field.decode(): value.decode() for field, value in counters.items()}
+                for counters in pipe.execute()
+            ]
             
-            return {'total_requests': 0, 'monthly_requests': 0, 'success_rate': 0, 'last_used': None}
+            total_requests = int(totals.get('total_requests', 0))
+            return {
+                'total_requests': total_requests,
+                'monthly_requests': int(month.get('total_requests', 0)),
+                'daily_requests': int(month.get(f"day:{now.strftime('%d')}", 0)),
+                'success_rate': (int(totals.get('successful_requests', 0)) / max(total_requests, 1)) * 100,
+                'last_used': totals.get('last_used')
+            }
             
         except Exception as e:
             self.logger.error(f"Usage retrieval failed: {str(e)}")
             return {'total_requests': 0, 'monthly_requests': 0, 'success_rate': 0, 'last_used': None}
+    
+    def migrate_legacy_usage(self) -> int:
+        """Fold usage:<api_key> JSON blobs from before the hash counters into them, once per deployment"""
+        if self.redis_client.exists(USAGE_LEGACY_MIGRATED):
+            return 0
+        migrated = 0
+        for key in self.redis_client.scan_iter(match='usage:mitoai_*', count=1000):
+            name = key.decode()
+            if ':' in name[len('usage:'):]:
+                continue  # usage:<api_key>:<month|all> hashes are already in the new format
+            api_key = name[len('usage:'):]
+            migrated += self._migrate_legacy_usage(
+                keys=[name, usage_total_key(api_key), USAGE_DIRTY_SET],
+                args=[f"usage:{api_key}:", USAGE_MONTH_TTL_SECONDS]
+            )
+        self.redis_client.set(USAGE_LEGACY_MIGRATED, datetime.now().isoformat())
+        if migrated:
+            self.logger.info(f"Migrated {migrated} legacy usage records into hash counters")
+        return migrated
+    
+    def rollup_usage(self) -> int:
+        """
+        Copy the monthly counters changed since the last run into Postgres
+        
+        Only one worker per interval wins the SET NX lock and runs. It reads
+        the dirty set of changed monthly hashes instead of scanning the
+        keyspace; the set is renamed aside first so counts arriving during
+        the rollup are kept for the next one, and it is merged back if the
+        run fails. The upsert is idempotent, so a repeated hash is harmless.
+        """
+        if not self.redis_client.set(USAGE_ROLLUP_LOCK, self._worker_id, nx=True,
+                                     ex=USAGE_ROLLUP_INTERVAL_SECONDS - 1):
+            return 0
+        rolling = f"{USAGE_DIRTY_SET}:rolling"
+        if not self.redis_client.exists(rolling):
+            try:
+                self.redis_client.rename(USAGE_DIRTY_SET, rolling)
+            except redis.ResponseError:
+                return 0  # Nothing changed since the last rollup
+        try:
+            count = self._rollup_keys(sorted(key.decode() for key in self.redis_client.smembers(rolling)))
+        except Exception:
+            self.redis_client.sunionstore(USAGE_DIRTY_SET, [USAGE_DIRTY_SET, rolling])
+            self.redis_client.delete(rolling)
+            raise
+        self.redis_client.delete(rolling)
+        return count
+    
+    def _rollup_keys(self, keys: List[str]) -> int:
+        rows = []
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in batch:
+                pipe.hgetall(key)
+            for key, counters in zip(batch, pipe.execute()):
+                if not counters:
+                    continue  # Expired since it was marked dirty
+                api_key, month = key[len('usage:'):].rsplit(':', 1)
+                counters = {field.decode(): value.decode() for field, value in counters.items()}
+                daily = {field[4:]: int(value) for field, value in counters.items() if field.startswith('day:')}
+                rows.append((
+                    hashlib.sha256(api_key.encode()).hexdigest(),
+                    month,
+                    int(counters.get('total_requests', 0)),
+                    int(counters.get('successful_requests', 0)),
+                    int(counters.get('failed_requests', 0)),
+                    json.dumps(daily),
+                    counters.get('last_used'),
+                ))
+        
+        if not rows:
+            return 0
+        conn = psycopg2.connect(self.usage_db_url)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(USAGE_ROLLUP_DDL)
+            execute_values(cursor, """
+                INSERT INTO api_key_usage_monthly
+                    (api_key_hash, month, total_requests, successful_requests, failed_requests,
+                     daily_requests, last_used)
+                VALUES %s
+                ON CONFLICT (api_key_hash, month) DO UPDATE SET
+                    total_requests = EXCLUDED.total_requests,
+                    successful_requests = EXCLUDED.successful_requests,
+                    failed_requests = EXCLUDED.failed_requests,
+                    daily_requests = EXCLUDED.daily_requests,
+                    last_used = EXCLUDED.last_used,
+                    updated_at = NOW()
+            """, rows, page_size=1000)
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        return len(rows)
+    
+    def start_usage_rollup(self, interval_seconds: int = USAGE_ROLLUP_INTERVAL_SECONDS):
+        """Roll usage counters up to Postgres on a daemon thread"""
+        def loop():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    self.rollup_usage()
+                except Exception as e:
+                    self.logger.error(f"Usage rollup failed: {str(e)}")
+        
+        threading.Thread(target=loop, name='usage-rollup', daemon=True).start()
 
 class BaseAIBusinessModel:
     """Base class for all AI business models"""
     
+    # Shared by every model so prefix-cache statistics cover the whole catalog. The one-line
+    # personas here are far below MIN_CACHEABLE_TOKENS, so these calls gain nothing from prefix
+    # caching and only show up as uncacheable_calls; the project manager prompts are the cached ones.
+    prompt_cache = PromptCache()
+    
     def __init__(self, model_name: str, expertise_areas: List[str]):
         self.model_name = model_name
         self.expertise_areas = expertise_areas
@@ -441,16 +851,16 @@ class BaseAIBusinessModel:
     def process_request(self, request_data: Dict) -> Dict:
         """Process request using this AI business model"""
         try:
-            # Create specialized prompt for this business model
+            # Static system prompt first, in case a model's persona grows long enough to be cached
             system_prompt = self.get_system_prompt()
             user_prompt = self.create_user_prompt(request_data)
             
-            response = self.openai_client.ChatCompletion.create(
+            response = self.prompt_cache.create(
+                self.openai_client,
+                system_prompt,
+                user_prompt,
+                name=self.model_name,
                 model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
                 max_tokens=4000,
                 temperature=0.3
             )
@@ -516,6 +926,20 @@ class DataScientistModel(BaseAIBusinessModel):
 # Flask application for API key distribution
 app = Flask(__name__)
 
+# Key management endpoints are closed unless an admin token is configured
+ADMIN_TOKEN = os.environ.get('MITOAI_ADMIN_TOKEN')
+
+def admin_required(f):
+    """Require the X-MitoAI-Admin-Token header to match MITOAI_ADMIN_TOKEN"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('X-MitoAI-Admin-Token', '')
+        if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({'success': False, 'error': 'Admin privileges required'}), 403
+        return f(*args, **kwargs)
+    
+    return decorated
+
 # Initialize the API distribution engine
 api_engine = MitoAIAPIKeyDistributionEngine()
 
@@ -570,6 +994,9 @@ def execute_model():
             }), 400
         
         result = api_engine.execute_model_request(api_key, data)
+        if result.get('retry_after') is not None:
+            # Not admitted by the scheduler; the request was not counted against the key's quota
+            return jsonify(result), 429, {'Retry-After': str(result['retry_after'])}
         return jsonify(result)
         
     except Exception as e:
@@ -581,23 +1008,26 @@ def execute_model():
 @app.route('/api/models/available', methods=['GET'])
 def get_available_models():
     """Get list of all available AI business models"""
-    models_info = {}
-    
-    for category, models in api_engine.business_models.items():
-        models_info[category] = {}
-        for model_name, model_instance in models.items():
-            models_info[category][model_name] = {
-                'name': model_instance.model_name,
-                'expertise_areas': model_instance.expertise_areas,
-                'pricing_tiers': api_engine.get_pricing_tier(model_name, 'professional')
-            }
-    
-    return jsonify({
-        'success': True,
-        'available_models': models_info,
-        'total_categories': len(models_info),
-        'total_models': sum(len(models) for models in models_info.values())
-    })
+    body, etag = api_engine.registry.available()
+    if etag in request.if_none_match:
+        return '', 304, {'ETag': f'"{etag}"'}
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response
+
+@app.route('/api/keys/<api_key>/revoke', methods=['POST'])
+@admin_required
+def revoke_api_key(api_key):
+    """Revoke an API key; every worker stops accepting it within milliseconds"""
+    try:
+        result = api_engine.revoke_api_key(api_key)
+        return jsonify(result), 200 if result['success'] else 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
 @app.route('/api/keys/<api_key>/usage', methods=['GET'])
 def get_key_usage(api_key):
@@ -625,8 +1055,9 @@ def platform_status():
         'contact': 'guzman.daniel@outlook.com',
         'version': '1.0.0',
         'active_api_keys': len(api_engine.api_key_registry),
-        'available_models': sum(len(models) for models in api_engine.business_models.values()),
-        'model_categories': len(api_engine.business_models),
+        'available_models': api_engine.registry.model_count(),
+        'model_categories': len(api_engine.registry.catalog),
+        'prompt_cache': BaseAIBusinessModel.prompt_cache.stats(),
         'timestamp': datetime.now().isoformat()
     })
 
@@ -635,6 +1066,6 @@ if __name__ == '__main__':
     print("Creator: Daniel Guzman")
     print("Contact: guzman.daniel@outlook.com")
     print("Copyright: 2025 Daniel Guzman - All Rights Reserved")
-    print(f"Supporting {sum(len(models) for models in api_engine.business_models.values())} AI business models")
+    print(f"Supporting {api_engine.registry.model_count()} AI business models")
     
     app.run(host='0.0.0.0', port=8000, debug=False)
\ No newline at end of file
@@ -9,7 +9,7 @@ NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
 Complete API routes for enterprise web application
 """
 
-from flask import Blueprint, request, jsonify, g, current_app
+from flask import Blueprint, request, jsonify, g, current_app, make_response
 from flask_limiter import Limiter # type: ignore
 from flask_limiter.util import get_remote_address
 from functools import wraps
@@ -24,8 +24,13 @@ from models import (
     SubscriptionTier, ProjectStatus, APIKeyStatus
 )
 from ai_services import AIOperatorEngine, get_business_model_instance
+from rate_limiter import MultiWindowRateLimiter
 import os
+import time
 import logging
+import threading
+import redis
+from collections import OrderedDict
 
 # Create blueprints for different API sections
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -47,6 +52,60 @@ ai_engine = AIOperatorEngine()
 # Logging setup
 logger = logging.getLogger(__name__)
 
+# Verified API keys: HMAC of presented key -> (api key id, verified at)
+VERIFIED_KEY_TTL_SECONDS = 60
+VERIFIED_KEY_CACHE_SIZE = 10000
+_verified_keys = OrderedDict()
+_verified_keys_lock = threading.Lock()
+
+def resolve_api_key(api_key):
+    """Return the ACTIVE APIKey row for a presented key, or None"""
+    key_hmac = APIKey.compute_hmac(api_key)
+    with _verified_keys_lock:
+        cached = _verified_keys.get(key_hmac)
+        if cached:
+            _verified_keys.move_to_end(key_hmac)
+    if cached and time.monotonic() - cached[1] < VERIFIED_KEY_TTL_SECONDS:
+        record = db.session.get(APIKey, cached[0])
+        if record and record.status == APIKeyStatus.ACTIVE:
+            return record
+        with _verified_keys_lock:
+            _verified_keys.pop(key_hmac, None)
+    
+    record = APIKey.find_active(api_key)
+    if record:
+        with _verified_keys_lock:
+            _verified_keys[key_hmac] = (record.id, time.monotonic())
+            _verified_keys.move_to_end(key_hmac)
+            while len(_verified_keys) > VERIFIED_KEY_CACHE_SIZE:
+                _verified_keys.popitem(last=False)
+    return record
+
+def api_key_rate_limiter():
+    """This app's MultiWindowRateLimiter, connected to the rate-limit Redis on first use"""
+    rate_limiter = current_app.extensions.get('api_key_rate_limiter')
+    if rate_limiter is None:
+        storage_url = current_app.config.get('RATELIMIT_STORAGE_URL') or current_app.config.get('REDIS_URL')
+        rate_limiter = MultiWindowRateLimiter(redis.Redis.from_url(storage_url or 'redis://localhost:6379'))
+        current_app.extensions['api_key_rate_limiter'] = rate_limiter
+    return rate_limiter
+
+def check_api_key_limits(api_key_record):
+    """Check and charge the key's per-minute/hour/day limits; returns a RateLimitResult.
+    
+    Nothing is counted unless all three windows allow the request, and keys far
+    from their limits are admitted from a short local lease without a Redis call.
+    A configured limit of 0 blocks the key; only an unset one takes the default.
+    """
+    def limit(value, default):
+        return default if value is None else value
+    
+    return api_key_rate_limiter().check(f"api_key:{api_key_record.id}", [
+        (60, limit(api_key_record.rate_limit_per_minute, 60)),
+        (3600, limit(api_key_record.rate_limit_per_hour, 1000)),
+        (86400, limit(api_key_record.rate_limit_per_day, 10000)),
+    ])
+
 # Authentication decorators
 def token_required(f):
     """Decorator to require valid JWT token"""
@@ -84,12 +143,8 @@ def api_key_required(f):
         if not api_key:
             return jsonify({'error': 'API key is required'}), 401
         
-        # Hash the provided key to compare with stored hash
-        api_key_record = None
-        for key_record in APIKey.query.filter_by(status=APIKeyStatus.ACTIVE).all():
-            if key_record.check_key(api_key):
-                api_key_record = key_record
-                break
+        # One indexed lookup by key prefix, then a constant-time HMAC comparison
+        api_key_record = resolve_api_key(api_key)
         
         if not api_key_record:
             return jsonify({'error': 'Invalid API key'}), 401
@@ -98,14 +153,20 @@ def api_key_required(f):
         if api_key_record.expires_at and datetime.utcnow() > api_key_record.expires_at:
             return jsonify({'error': 'API key has expired'}), 401
         
-        # Update usage statistics
-        api_key_record.last_used = datetime.utcnow()
-        api_key_record.total_requests += 1
+        limits = check_api_key_limits(api_key_record)
+        limit_headers = limits.headers()
+        if not limits.allowed:
+            return jsonify({'error': 'Rate limit exceeded'}), 429, limit_headers
         
         g.current_user = api_key_record.user
         g.current_api_key = api_key_record
         
-        return f(*args, **kwargs)
+        response = make_response(f(*args, **kwargs))
+        response.headers.extend(limit_headers)
+        
+        # Usage statistics are written behind, not on the api_keys row per request
+        current_app.extensions['api_key_counters'].record(api_key_record.id, success=response.status_code < 400)
+        return response
     
     return decorated
 
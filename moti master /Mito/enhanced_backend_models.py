@@ -9,14 +9,20 @@ NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
 Complete database models for enterprise web application
 """
 
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_user import UserMixin
 from datetime import datetime, timedelta
 import uuid
 import json
+import hmac
+import hashlib
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from enum import Enum
+from partition_manager import PartitionManager
+from usage_log_writer import UsageLogWriter, APIKeyCounterWriter
 
 db = SQLAlchemy()
 
@@ -146,7 +152,8 @@ class APIKey(db.Model):
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
     key_hash = db.Column(db.String(255), unique=True, nullable=False, index=True)
-    key_prefix = db.Column(db.String(20), nullable=False)  # For display purposes
+    key_prefix = db.Column(db.String(20), nullable=False, index=True)  # Display and lookup identifier
+    key_hmac = db.Column(db.String(64))  # HMAC-SHA256 of the full key; NULL for legacy keys
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     
@@ -173,18 +180,65 @@ class APIKey(db.Model):
     # Relationships
     usage_logs = db.relationship('UsageLog', backref='api_key', lazy='dynamic')
     
-    @staticmethod
-    def generate_key():
-        """Generate a new API key"""
+    @classmethod
+    def generate_key(cls, user_id, name, access_level, **fields):
+        """Add a new API key to the session; returns (plaintext key, APIKey), the key is never stored"""
         import secrets
         key = f"mitoai_{secrets.token_urlsafe(32)}"
-        key_hash = generate_password_hash(key)
-        key_prefix = key[:16] + "..."
-        return key, key_hash, key_prefix
+        api_key = cls(
+            user_id=user_id,
+            name=name,
+            access_level=access_level,
+            key_hash=generate_password_hash(key),
+            key_prefix=cls.prefix_for(key),
+            key_hmac=cls.compute_hmac(key),
+            **fields
+        )
+        db.session.add(api_key)
+        return key, api_key
+    
+    @staticmethod
+    def prefix_for(key):
+        """Identifier derived from the key itself, stored in the indexed key_prefix column"""
+        return key[:16] + "..."
+    
+    @staticmethod
+    def compute_hmac(key):
+        """Keyed SHA-256 of the key; cheap to verify, useless without the server secret"""
+        secret = current_app.config.get('API_KEY_HMAC_SECRET') or current_app.config['SECRET_KEY']
+        return hmac.new(secret.encode(), key.encode(), hashlib.sha256).hexdigest()
     
     def check_key(self, key):
-        """Verify API key"""
-        return check_password_hash(self.key_hash, key)
+        """
+        Verify API key, stamping key_hmac whenever the slow password hash had to decide
+        
+        The password hash is the authority: it is checked for keys issued
+        before key_hmac existed and for keys whose stored HMAC no longer
+        matches because the secret was rotated. The caller commits the new
+        key_hmac, so only the first request after either case pays for it.
+        """
+        key_hmac = self.compute_hmac(key)
+        if self.key_hmac and hmac.compare_digest(self.key_hmac, key_hmac):
+            return True
+        if not check_password_hash(self.key_hash, key):
+            return False
+        self.key_hmac = key_hmac
+        return True
+    
+    @classmethod
+    def find_active(cls, key):
+        """Resolve a presented key with one key_prefix index probe"""
+        candidates = cls.query.filter_by(key_prefix=cls.prefix_for(key), status=APIKeyStatus.ACTIVE).all()
+        for candidate in candidates:
+            if candidate.check_key(key):
+                if candidate in db.session.dirty:
+                    db.session.commit()
+                return candidate
+        return None
+    
+    def usage_between(self, start, end):
+        """Request totals for [start, end) from the daily rollup"""
+        return UsageDaily.totals(start, end, api_key_id=self.id)
     
     def to_dict(self):
         """Convert API key to dictionary for responses"""
@@ -327,6 +381,10 @@ class UsageLog(db.Model):
     """Detailed usage logging for analytics and billing"""
     
     __tablename__ = 'usage_logs'
+    __table_args__ = (
+        db.Index('ix_usage_logs_user_timestamp', 'user_id', 'timestamp'),
+        {'postgresql_partition_by': 'RANGE (timestamp)'}
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
@@ -357,22 +415,74 @@ class UsageLog(db.Model):
     user_agent = db.Column(db.String(500))
     client_location = db.Column(JSONB)  # Country, region, city
     
-    # Metadata
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Metadata (partition key, so part of the primary key)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, primary_key=True)
+    
+    @classmethod
+    def in_window(cls, start, end):
+        """Query bounded to [start, end) so Postgres prunes to the matching partitions"""
+        return cls.query.filter(cls.timestamp >= start, cls.timestamp < end)
     
     @classmethod
     def log_request(cls, user_id, endpoint, method, status_code, success, **kwargs):
-        """Create a new usage log entry"""
-        log_entry = cls(
+        """Queue a usage log entry for the background bulk writer (not part of the request transaction)"""
+        return current_app.extensions['usage_log_writer'].submit(dict(
             user_id=user_id,
             endpoint=endpoint,
             method=method,
             status_code=status_code,
             success=success,
             **kwargs
-        )
-        db.session.add(log_entry)
-        return log_entry
+        ))
+
+class UsageRollupMixin:
+    """
+    Usage totals per user/key/business model per time bucket
+    
+    Maintained by the usage log writer as each batch is flushed. A request
+    without an API key or business model is stored under NO_API_KEY / ''
+    so the natural key can be the primary key.
+    """
+    
+    NO_API_KEY = uuid.UUID(int=0)
+    
+    user_id = db.Column(UUID(as_uuid=True), primary_key=True)
+    api_key_id = db.Column(UUID(as_uuid=True), primary_key=True)
+    business_model = db.Column(db.String(100), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    
+    requests = db.Column(db.BigInteger, nullable=False, default=0)
+    successful_requests = db.Column(db.BigInteger, nullable=False, default=0)
+    failed_requests = db.Column(db.BigInteger, nullable=False, default=0)
+    tokens_used = db.Column(db.BigInteger, nullable=False, default=0)
+    cost_estimate = db.Column(db.Numeric(14, 4), nullable=False, default=0)
+    response_time_ms_total = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    @classmethod
+    def totals(cls, start, end, **filters):
+        """Summed counters over [start, end), optionally filtered by user_id/api_key_id/business_model"""
+        query = db.session.query(
+            db.func.coalesce(db.func.sum(cls.requests), 0),
+            db.func.coalesce(db.func.sum(cls.successful_requests), 0),
+            db.func.coalesce(db.func.sum(cls.failed_requests), 0),
+            db.func.coalesce(db.func.sum(cls.tokens_used), 0),
+            db.func.coalesce(db.func.sum(cls.cost_estimate), 0)
+        ).filter(cls.bucket >= start, cls.bucket < end).filter_by(**filters)
+        requests, successful, failed, tokens, cost = query.one()
+        return {
+            'requests': int(requests),
+            'successful_requests': int(successful),
+            'failed_requests': int(failed),
+            'tokens_used': int(tokens),
+            'cost_estimate': float(cost),
+            'success_rate': (successful / max(requests, 1)) * 100
+        }
+
+class UsageHourly(UsageRollupMixin, db.Model):
+    __tablename__ = 'usage_rollup_hourly'
+
+class UsageDaily(UsageRollupMixin, db.Model):
+    __tablename__ = 'usage_rollup_daily'
 
 class Invoice(db.Model):
     """Billing and invoice management"""
@@ -522,6 +632,13 @@ def init_database(app):
     with app.app_context():
         db.create_all()
         
+        # create_all does not alter existing tables; older api_keys tables lack key_hmac and the
+        # key_prefix index find_active looks keys up by
+        db.session.execute(text("ALTER TABLE api_keys ADD COLUMN IF NOT EXISTS key_hmac VARCHAR(64)"))
+        db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_api_keys_key_prefix ON api_keys (key_prefix)"))
+        db.session.execute(text("DROP INDEX IF EXISTS ix_api_keys_key_hmac"))
+        db.session.commit()
+        
         # Create default system settings
         default_settings = [
             ('api_rate_limit_default', 1000, 'Default API rate limit per hour'),
@@ -533,7 +650,8 @@ def init_database(app):
             ('invoice_due_days', 30, 'Invoice due date in days'),
             ('password_min_length', 8, 'Minimum password length'),
             ('session_timeout_minutes', 60, 'Session timeout in minutes'),
-            ('audit_log_retention_days', 365, 'Audit log retention period')
+            ('audit_log_retention_days', 365, 'Audit log retention period'),
+            ('usage_log_retention_months', 13, 'Usage log partitions kept before being dropped')
         ]
         
         for key, value, description in default_settings:
@@ -542,6 +660,29 @@ def init_database(app):
                 db.session.add(setting)
         
         db.session.commit()
+        
+        # Monthly usage_logs partitions, maintained ahead of time and expired by retention
+        usage_partitions = PartitionManager(
+            connect=db.engine.raw_connection,
+            policies={'usage_logs': {
+                'column': 'timestamp',
+                'retention_months': SystemSettings.get_setting('usage_log_retention_months', 13)
+            }}
+        )
+        # Deployments from before partitioning still have a plain usage_logs table
+        usage_partitions.migrate_to_partitioned(
+            'usage_logs', lambda: UsageLog.__table__.create(bind=db.engine, checkfirst=True)
+        )
+        usage_partitions.run_maintenance()
+        usage_partitions.start_background_maintenance()
+        app.extensions['usage_partitions'] = usage_partitions
+        
+        # Usage events are buffered per worker and bulk inserted off the request path; each
+        # writer starts its flush thread on first use in a process, so it survives a fork
+        app.extensions['usage_log_writer'] = UsageLogWriter(connect=db.engine.raw_connection)
+        
+        # APIKey.total_requests/last_used are accumulated per worker and applied additively
+        app.extensions['api_key_counters'] = APIKeyCounterWriter(connect=db.engine.raw_connection)
 
 def create_sample_data():
     """Create sample data for development and testing"""
@@ -0,0 +1,294 @@
+"""
+MitoAI Platform - Image Generation Jobs
+Creator: Daniel Guzman
+Contact: guzman.daniel@outlook.com
+Copyright: 2025 Daniel Guzman - All Rights Reserved
+
+NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
+
+Asynchronous image generation with a deduplicating, content-addressed local store
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional, Union
+
+try:
+    from PIL import Image
+except ImportError:  # Thumbnails are skipped without Pillow
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STORE_PATH = os.getenv('IMAGE_STORE_PATH', 'generated_images')
+THUMBNAIL_SIZE = (256, 256)
+JOB_RECORD_TTL = 86400
+FINISHED = ('completed', 'failed')
+
+
+class QueueFull(Exception):
+    """Too many image jobs are waiting; the client should retry later"""
+
+
+def prompt_key(prompt: str, variant: str = '') -> str:
+    """Identity of a generation request: whitespace- and case-insensitive prompt plus model/size variant"""
+    normalized = ' '.join(prompt.lower().split())
+    return hashlib.sha256(f"{variant}\n{normalized}".encode()).hexdigest()
+
+
+class ImageStore:
+    """
+    Generated images on local disk, named by the SHA-256 of their bytes
+
+    Identical images are stored once; each prompt key maps to the content
+    hash of its image, so a repeated prompt never calls the provider again.
+    A JPEG thumbnail is written next to every image when Pillow is present.
+    Job records live here too (jobs/<job_id>.json), so every worker process
+    sharing the directory can answer a poll for any job.
+    """
+
+    def __init__(self, root: str = IMAGE_STORE_PATH):
+        self.root = root
+        os.makedirs(os.path.join(root, 'prompts'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'jobs'), exist_ok=True)
+
+    def _prompt_path(self, key: str) -> str:
+        return os.path.join(self.root, 'prompts', key)
+
+    def _job_path(self, job_id: str) -> Optional[str]:
+        try:
+            # Job ids come from URLs; only canonical UUIDs name a file
+            job_id = str(uuid.UUID(job_id))
+        except (TypeError, ValueError):
+            return None
+        return os.path.join(self.root, 'jobs', f"{job_id}.json")
+
+    def _write(self, path: str, text: str):
+        """Write then rename, so readers never see a partial file"""
+        with open(f"{path}.{uuid.uuid4().hex}.tmp", 'w') as handle:
+            handle.write(text)
+            temporary = handle.name
+        os.replace(temporary, path)
+
+    def save_job(self, job: Dict):
+        self._write(self._job_path(job['job_id']), json.dumps(job))
+
+    def load_job(self, job_id: str) -> Optional[Dict]:
+        path = self._job_path(job_id)
+        if path is None:
+            return None
+        try:
+            with open(path) as handle:
+                return json.load(handle)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def delete_job(self, job_id: str):
+        try:
+            os.remove(self._job_path(job_id))
+        except (FileNotFoundError, TypeError):
+            pass
+
+    def prune_jobs(self, max_age: float = JOB_RECORD_TTL) -> int:
+        """Delete job records older than max_age seconds, e.g. left behind by a restarted worker"""
+        cutoff, pruned = time.time() - max_age, 0
+        directory = os.path.join(self.root, 'jobs')
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    pruned += 1
+            except FileNotFoundError:
+                pass
+        return pruned
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        """Stored image for a prompt key, if it was generated before"""
+        try:
+            with open(self._prompt_path(key)) as handle:
+                digest = handle.read().strip()
+        except FileNotFoundError:
+            return None
+        return self.files(digest)
+
+    def files(self, digest: str) -> Optional[Dict]:
+        image = f"{digest}.png"
+        if not os.path.exists(os.path.join(self.root, image)):
+            return None
+        thumbnail = f"{digest}_thumb.jpg"
+        return {'image': image,
+                'thumbnail': thumbnail if os.path.exists(os.path.join(self.root, thumbnail)) else None}
+
+    def put(self, key: str, data: bytes) -> Dict:
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.root, f"{digest}.png")
+        if not os.path.exists(path):
+            # Write then rename, so readers never see a partial file
+            with open(f"{path}.{uuid.uuid4().hex}.tmp", 'wb') as handle:
+                handle.write(data)
+                temporary = handle.name
+            os.replace(temporary, path)
+            self._write_thumbnail(digest, data)
+        self._write(self._prompt_path(key), digest)
+        return self.files(digest)
+
+    def _write_thumbnail(self, digest: str, data: bytes):
+        if Image is None:
+            return
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image = image.convert('RGB')
+                image.thumbnail(THUMBNAIL_SIZE)
+                image.save(os.path.join(self.root, f"{digest}_thumb.jpg"), 'JPEG', quality=85)
+        except Exception as e:
+            logger.warning(f"Thumbnail failed for {digest}: {str(e)}")
+
+
+class ImageJobQueue:
+    """
+    Image generations run on a bounded worker pool instead of in the request
+
+    submit() returns at once with a job: already completed when the same
+    prompt was generated before, the in-flight job when it is being
+    generated right now, otherwise a new queued job. generate(prompt)
+    returns image bytes or a provider URL, which is downloaded once into
+    the store, so clients get stable local URLs rather than expiring ones.
+    Clients poll get() or block in wait() until the job finishes. Every
+    state change is also written to the store, so get() and wait() answer
+    for jobs running in other worker processes; deduplication of
+    in-flight prompts stays per process.
+    """
+
+    def __init__(self, generate: Callable[[str], Union[bytes, str]], store: ImageStore = None,
+                 variant: str = '', url_prefix: str = '/api/images/', workers: int = 4,
+                 max_pending: int = 100, max_jobs: int = 10000):
+        self.generate = generate
+        self.store = store or ImageStore()
+        self.variant = variant
+        self.url_prefix = url_prefix
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-job')
+        self._jobs = OrderedDict()
+        self._inflight: Dict[str, str] = {}
+        self._done: Dict[str, threading.Event] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.store.prune_jobs()
+
+    def _view(self, job: Dict) -> Dict:
+        view = {key: job[key] for key in ('job_id', 'status', 'prompt', 'created_at', 'completed_at', 'error')}
+        files = job.get('files') or {}
+        view['image_url'] = f"{self.url_prefix}{files['image']}" if files.get('image') else None
+        view['thumbnail_url'] = f"{self.url_prefix}{files['thumbnail']}" if files.get('thumbnail') else None
+        return view
+
+    def _new_job(self, prompt: str, status: str, files: Dict = None) -> Dict:
+        job = {'job_id': str(uuid.uuid4()), 'status': status, 'prompt': prompt, 'files': files,
+               'created_at': datetime.now().isoformat(), 'completed_at': None, 'error': None}
+        if status == 'completed':
+            job['completed_at'] = job['created_at']
+        self._jobs[job['job_id']] = job
+        self._done[job['job_id']] = threading.Event()
+        if status == 'completed':
+            self._done[job['job_id']].set()
+        if len(self._jobs) > self.max_jobs:
+            # Oldest finished jobs go first; unfinished ones are skipped, never block eviction
+            for old_id in [old_id for old_id, old in self._jobs.items() if old['status'] in FINISHED]:
+                if len(self._jobs) <= self.max_jobs:
+                    break
+                del self._jobs[old_id]
+                self._done.pop(old_id, None)
+                self.store.delete_job(old_id)
+        return job
+
+    def submit(self, prompt: str) -> Dict:
+        key = prompt_key(prompt, self.variant)
+        files = self.store.lookup(key)
+        with self._lock:
+            if files is not None:
+                job = self._new_job(prompt, 'completed', files)
+                self._save(job)
+                return self._view(job)
+            if key in self._inflight:
+                return self._view(self._jobs[self._inflight[key]])
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"{self._pending} image jobs pending")
+            job = self._new_job(prompt, 'queued')
+            self._inflight[key] = job['job_id']
+            self._pending += 1
+            # Written before the job can start, so a later state is never overwritten by this one
+            self._save(job)
+        self._pool.submit(self._run, job, key)
+        return self._view(job)
+
+    def _run(self, job: Dict, key: str):
+        with self._lock:
+            job['status'] = 'running'
+            snapshot = dict(job)
+        self._save(snapshot)
+        try:
+            result = self.generate(job['prompt'])
+            if isinstance(result, str):
+                with urllib.request.urlopen(result, timeout=60) as response:
+                    result = response.read()
+            files, error, status = self.store.put(key, result), None, 'completed'
+        except Exception as e:
+            logger.error(f"Image job {job['job_id']} failed: {str(e)}")
+            files, error, status = None, str(e), 'failed'
+        with self._lock:
+            job.update(status=status, files=files, error=error, completed_at=datetime.now().isoformat())
+            snapshot = dict(job)
+        # Recorded before the job leaves the in-flight set, so no poll sees it finished without a record
+        self._save(snapshot)
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._pending -= 1
+            done = self._done.get(job['job_id'])
+        if done is not None:
+            done.set()
+
+    def _save(self, job: Dict):
+        try:
+            self.store.save_job(job)
+        except OSError as e:
+            logger.error(f"Image job {job['job_id']} record not written: {str(e)}")
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """A job of this process, or of any other process sharing the store"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return self._view(job)
+        job = self.store.load_job(job_id)
+        return self._view(job) if job is not None else None
+
+    def wait(self, job_id: str, timeout: float = 30, poll_interval: float = 0.25) -> Optional[Dict]:
+        """The job once it has finished, or as it stands after timeout seconds"""
+        with self._lock:
+            done = self._done.get(job_id)
+        if done is not None:
+            done.wait(timeout)
+            return self.get(job_id)
+        # Another process runs it; follow its record
+        deadline = time.monotonic() + timeout
+        job = self.get(job_id)
+        while job is not None and job['status'] not in FINISHED and time.monotonic() < deadline:
+            time.sleep(min(poll_interval, max(deadline - time.monotonic(), 0)))
+            job = self.get(job_id)
+        return job
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'pending': self._pending, 'tracked_jobs': len(self._jobs)}
@@ -0,0 +1,267 @@
+"""
+MitoAI Platform - Local Intent Classifier
+Creator: Daniel Guzman
+Contact: guzman.daniel@outlook.com
+Copyright: 2025 Daniel Guzman - All Rights Reserved
+
+NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
+
+Rule and linear-model intent routing, with the LLM only for ambiguous requests
+"""
+
+import logging
+import math
+import re
+import threading
+import zlib
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WORD = re.compile(r"[a-z0-9']+")
+IMAGE_RULE = re.compile(r"\b(image|images|picture|pictures|illustrat\w*|draw\w*|paint\w*|photo\w*|logo|"
+                        r"poster|artwork|visual\w*|sketch\w*|render\w*|cover art)\b")
+TEXT_RULE = re.compile(r"\b(write|writes|writing|story|stories|article|essay|blog|post|poem|letter|email|"
+                       r"script|summary|summarize|explain|describe|plan|proposal|report|lesson|guide)\b")
+ANALYSIS_RULE = re.compile(r"\b(analy[sz]e|analysis|compare|comparison|evaluate|assess|audit|review|"
+                           r"breakdown|pros and cons)\b")
+WEATHER_RULE = re.compile(r"\b(weather|forecast|rain\w*|snow\w*|sunny|storm\w*|temperature|humid\w*|"
+                          r"outdoor|outside|picnic|hike|hiking|beach|season\w*|today|tomorrow|weekend)\b")
+CONTENT_TYPE_RULES = (
+    ('business', re.compile(r"\b(business|marketing|sales|startup|pitch|proposal|strategy|investor|"
+                            r"revenue|company|brand)\b")),
+    ('educational', re.compile(r"\b(explain|lesson|teach\w*|learn\w*|student\w*|course|tutorial|"
+                               r"homework|guide|how to)\b")),
+    ('article', re.compile(r"\b(article|blog|news|essay|report|post)\b")),
+    ('story', re.compile(r"\b(story|stories|tale|fairy|bedtime|novel|character\w*|adventure)\b")),
+    ('creative', re.compile(r"\b(poem|poetry|song|lyrics|haiku|creative|imaginative)\b")),
+)
+COMPLEXITY_TOKENS = {'simple': 300, 'moderate': 500, 'complex': 1000}
+
+# Seed examples for the linear model; LLM decisions on ambiguous requests are added as they arrive
+SEED_EXAMPLES: List[Tuple[str, str, str]] = [
+    ("write a bedtime story about a dragon", 'content', 'story'),
+    ("tell me a story about pirates", 'content', 'story'),
+    ("write a blog post about remote work", 'content', 'article'),
+    ("an article on electric cars", 'content', 'article'),
+    ("draft a marketing email for our launch", 'content', 'business'),
+    ("business plan for a coffee shop", 'content', 'business'),
+    ("explain photosynthesis for kids", 'content', 'educational'),
+    ("lesson plan on fractions", 'content', 'educational'),
+    ("a poem about the ocean", 'content', 'creative'),
+    ("song lyrics about summer love", 'content', 'creative'),
+    ("draw a cat wearing a hat", 'image', 'creative'),
+    ("picture of a mountain sunset", 'image', 'creative'),
+    ("make a logo for my bakery", 'image', 'business'),
+    ("illustration of the solar system", 'image', 'educational'),
+    ("generate an image of a futuristic city", 'image', 'creative'),
+    ("illustrated children's story about a fox", 'both', 'story'),
+    ("story with pictures about a lost puppy", 'both', 'story'),
+    ("blog post with a header image about hiking", 'both', 'article'),
+    ("product pitch with a visual mockup", 'both', 'business'),
+    ("picture book about counting", 'both', 'educational'),
+    ("analyze my sales numbers", 'analysis', 'business'),
+    ("compare these two job offers", 'analysis', 'business'),
+    ("evaluate the pros and cons of solar panels", 'analysis', 'article'),
+    ("review my essay for mistakes", 'analysis', 'educational'),
+]
+
+
+def normalize_intent(text: str) -> str:
+    """Lower-cased words only, so trivially different phrasings share a cache entry"""
+    return ' '.join(WORD.findall((text or '').lower()))
+
+
+def _features(text: str) -> List[int]:
+    words = text.split()
+    grams = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+    return [zlib.crc32(gram.encode()) for gram in grams]
+
+
+class HashedLinearModel:
+    """
+    Multinomial logistic regression over hashed word and bigram features
+
+    Weights live in sparse dicts keyed by (feature hash % dimensions), so
+    prediction is a few dozen dict lookups and training needs no NumPy.
+    """
+
+    def __init__(self, labels: Tuple[str, ...], dimensions: int = 1 << 18):
+        self.labels = labels
+        self.dimensions = dimensions
+        self.weights = {label: {} for label in labels}
+        self.bias = {label: 0.0 for label in labels}
+
+    def _scores(self, features: List[int]) -> Dict[str, float]:
+        scores = {}
+        for label in self.labels:
+            weights = self.weights[label]
+            scores[label] = self.bias[label] + sum(weights.get(feature % self.dimensions, 0.0)
+                                                   for feature in features)
+        top = max(scores.values())
+        exp = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exp.values())
+        return {label: value / total for label, value in exp.items()}
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        probabilities = self._scores(_features(text))
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+
+    def fit(self, examples: List[Tuple[str, str]], epochs: int = 30, rate: float = 0.5):
+        featurized = [(_features(normalize_intent(text)), label)
+                      for text, label in examples if label in self.labels]
+        for _ in range(epochs):
+            for features, label in featurized:
+                probabilities = self._scores(features)
+                for candidate in self.labels:
+                    gradient = rate * ((candidate == label) - probabilities[candidate])
+                    self.bias[candidate] += gradient * 0.1
+                    weights = self.weights[candidate]
+                    for feature in features:
+                        bucket = feature % self.dimensions
+                        weights[bucket] = weights.get(bucket, 0.0) + gradient
+        return self
+
+
+class IntentClassifier:
+    """
+    Answers confident intent decisions locally and sends only ambiguous ones to the LLM
+
+    Keyword rules and a small linear model each propose a primary action.
+    A rule decides unless the model is at least override sure of something
+    else; with no rule the model decides when it is at least threshold
+    sure. Anything else is ambiguous. Weather need
+    and complexity come from rules alone. Every decision is cached by
+    normalized intent, and LLM answers are kept as training examples so
+    the model is refitted every retrain_every fallbacks. Only the newest
+    max_examples learned examples are kept next to the seeds, and refits
+    run on a background thread while the current model keeps answering.
+    """
+
+    ACTIONS = ('content', 'image', 'both', 'analysis')
+    CONTENT_TYPES = ('story', 'article', 'business', 'educational', 'creative')
+
+    def __init__(self, threshold: float = 0.75, override: float = 0.95, cache_size: int = 10000,
+                 retrain_every: int = 50, max_examples: int = 5000):
+        self.threshold = threshold
+        self.override = override
+        self.cache_size = cache_size
+        self.retrain_every = retrain_every
+        self._examples = deque(maxlen=max_examples)
+        self._new_examples = 0
+        self._refitting = False
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {'cached': 0, 'local': 0, 'llm': 0}
+        self._fit()
+
+    def _fit(self):
+        with self._lock:
+            examples = SEED_EXAMPLES + list(self._examples)
+        action_model = HashedLinearModel(self.ACTIONS).fit([(text, action) for text, action, _ in examples])
+        type_model = HashedLinearModel(self.CONTENT_TYPES).fit([(text, kind) for text, _, kind in examples])
+        self._action_model, self._type_model = action_model, type_model
+
+    @staticmethod
+    def _rule_action(text: str) -> Optional[str]:
+        image, written = IMAGE_RULE.search(text), TEXT_RULE.search(text)
+        if image and written:
+            return 'both'
+        if image:
+            return 'image'
+        if ANALYSIS_RULE.search(text):
+            return 'analysis'
+        if written:
+            return 'content'
+        return None
+
+    def classify(self, text: str) -> Optional[Dict]:
+        """Local decision for an already normalized intent, or None when it is ambiguous"""
+        rule = self._rule_action(text)
+        action, confidence = self._action_model.predict(text)
+        if rule is not None and rule != action:
+            if confidence >= self.override:
+                return None
+            action = rule
+        elif rule is None and confidence < self.threshold:
+            return None
+
+        content_type = next((kind for kind, pattern in CONTENT_TYPE_RULES if pattern.search(text)), None)
+        if content_type is None:
+            content_type, _ = self._type_model.predict(text)
+        words = len(text.split())
+        complexity = 'simple' if words < 12 else 'moderate' if words < 40 else 'complex'
+        return {
+            'primary_action': action,
+            'content_type': content_type,
+            'requires_weather': bool(WEATHER_RULE.search(text)),
+            'complexity': complexity,
+            'estimated_tokens': COMPLEXITY_TOKENS[complexity],
+            'decided_by': 'local'
+        }
+
+    def _remember(self, key: str, decision: Dict):
+        with self._lock:
+            self._cache[key] = decision
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def learn(self, text: str, decision: Dict):
+        """Keep an LLM decision as a training example and refit once enough have arrived"""
+        if decision.get('primary_action') not in self.ACTIONS \
+                or decision.get('content_type') not in self.CONTENT_TYPES:
+            return
+        with self._lock:
+            self._examples.append((text, decision['primary_action'], decision['content_type']))
+            self._new_examples += 1
+            refit = self._new_examples >= self.retrain_every and not self._refitting
+            if refit:
+                self._new_examples = 0
+                self._refitting = True
+        if refit:
+            threading.Thread(target=self._refit, name='intent-refit', daemon=True).start()
+
+    def _refit(self):
+        try:
+            self._fit()
+            logger.info(f"Intent model refitted on {len(SEED_EXAMPLES) + len(self._examples)} examples")
+        except Exception as e:
+            logger.error(f"Intent model refit failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._refitting = False
+
+    def decide(self, user_intent: str, fallback: Callable[[str], Dict]) -> Dict:
+        """Cached, local or (for ambiguous requests) fallback(user_intent) decision"""
+        key = normalize_intent(user_intent)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self._counts['cached'] += 1
+                # Callers may change the decision they get; the cached one stays as it was
+                return dict(cached)
+
+        decision = self.classify(key)
+        if decision is None:
+            decision = dict(fallback(user_intent))
+            decision.setdefault('decided_by', 'llm')
+        with self._lock:
+            self._counts['local' if decision['decided_by'] == 'local' else 'llm'] += 1
+        if decision['decided_by'] != 'local':
+            if decision['decided_by'] != 'llm':
+                # A default used because the LLM answer was unusable is neither cached nor learned
+                return decision
+            self.learn(key, decision)
+        self._remember(key, dict(decision))
+        return decision
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        return dict(counts, llm_rate=round(counts['llm'] / total, 4) if total else 0.0,
+                    examples=len(SEED_EXAMPLES) + len(self._examples))
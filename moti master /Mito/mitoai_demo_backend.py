@@ -10,6 +10,10 @@ import json
 import requests
 from datetime import datetime
 import base64
+from tool_planner import ToolGraph
+from intent_classifier import IntentClassifier
+from weather_service import WeatherService
+from image_jobs import ImageJobQueue
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 CORS(app)
@@ -27,65 +31,103 @@ class AIOperator:
             'voice_tool': self.process_voice,
             'book_tool': self.format_book
         }
+        self.intent_classifier = IntentClassifier()
+        self.weather = WeatherService()
+        self.image_jobs = ImageJobQueue(self.render_image, variant='dall-e-3:1024x1024')
     
     def process_request(self, user_intent, location=None):
         """AI decides which tools to use based on user intent"""
         try:
-            # AI analyzes intent and selects tools
-            analysis_prompt = f"""
-            User Request: "{user_intent}"
-            
-            Available Tools:
-            - content: Create stories, articles, written content
-            - image: Generate illustrations, pictures, visuals
-            - weather: Include weather data (if location provided)
-            - voice: Process audio input/output
-            - book: Format content into publication
-            
-            Determine what the user wants. Respond with JSON only:
-            {{"action": "content|image|both", "needs_weather": true/false, "content_type": "story|article|business|educational"}}
-            """
-            
-            decision = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": analysis_prompt}],
-                max_tokens=100,
-                temperature=0.1
+            # Weather is fetched while the AI decides, and each tool starts as soon as its inputs are ready
+            graph = ToolGraph()
+            graph.add('decision', lambda results: self.decide(user_intent))
+            if location:
+                graph.add('weather', lambda results: self.get_weather_context(location), speculative=True)
+            graph.add(
+                'content',
+                lambda results: self.generate_content(
+                    f"{self._weather_for(results)}\n\nUser request: {user_intent}",
+                    results['decision'].get('content_type', 'story')
+                ),
+                deps=('decision',),
+                extra_deps=lambda results: ('weather',) if results['decision'].get('needs_weather') else (),
+                when=lambda results: results['decision']['action'] in ['content', 'both']
             )
+            # The image prompt only uses the request, so it runs alongside content generation
+            graph.add(
+                'image',
+                lambda results: self.generate_image(user_intent),
+                deps=('decision',),
+                when=lambda results: results['decision']['action'] in ['image', 'both']
+            )
+            results = graph.run()
             
-            try:
-                ai_decision = json.loads(decision.choices[0].message.content)
-            except:
-                # Fallback if JSON parsing fails
-                ai_decision = {"action": "content", "needs_weather": False, "content_type": "story"}
-            
-            # Execute based on AI decision
-            result = {}
-            
-            # Get weather context if needed
-            weather_context = ""
-            if ai_decision.get('needs_weather') and location:
-                weather_context = self.get_weather_context(location)
-            
-            # Generate content
-            if ai_decision['action'] in ['content', 'both']:
-                enhanced_prompt = f"{weather_context}\n\nUser request: {user_intent}"
-                result['content'] = self.generate_content(enhanced_prompt, ai_decision.get('content_type', 'story'))
-            
-            # Generate image
-            if ai_decision['action'] in ['image', 'both']:
-                result['image'] = self.generate_image(user_intent)
+            result = {tool: results[tool] for tool in ('content', 'image') if tool in results}
+            if isinstance(result.get('image'), dict):
+                # 'image' stays a URL (None until the job finishes); the job is there to poll
+                result['image_job'] = result['image']
+                result['image'] = result['image_job']['image_url']
             
             return {
                 'success': True,
-                'ai_decision': ai_decision,
+                'ai_decision': results['decision'],
                 'result': result,
-                'weather_used': bool(weather_context)
+                'weather_used': bool(self._weather_for(results))
             }
             
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def decide(self, user_intent):
+        """Local classifier picks the tools; the AI is asked only when the request is ambiguous"""
+        decision = self.intent_classifier.decide(user_intent, self.ask_ai)
+        return {
+            "action": "content" if decision['primary_action'] == 'analysis' else decision['primary_action'],
+            "needs_weather": decision['requires_weather'],
+            "content_type": decision['content_type']
+        }
+    
+    def ask_ai(self, user_intent):
+        """AI analyzes intent and selects tools"""
+        analysis_prompt = f"""
+        User Request: "{user_intent}"
+        
+        Available Tools:
+        - content: Create stories, articles, written content
+        - image: Generate illustrations, pictures, visuals
+        - weather: Include weather data (if location provided)
+        - voice: Process audio input/output
+        - book: Format content into publication
+        
+        Determine what the user wants. Respond with JSON only:
+        {{"action": "content|image|both", "needs_weather": true/false, "content_type": "story|article|business|educational"}}
+        """
+        
+        decision = openai.ChatCompletion.create(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": analysis_prompt}],
+            max_tokens=100,
+            temperature=0.1
+        )
+        
+        try:
+            ai_decision = json.loads(decision.choices[0].message.content)
+            return {
+                "primary_action": ai_decision.get('action', 'content'),
+                "requires_weather": bool(ai_decision.get('needs_weather')),
+                "content_type": ai_decision.get('content_type', 'story')
+            }
+        except:
+            # Fallback if JSON parsing fails
+            return {"primary_action": "content", "requires_weather": False, "content_type": "story",
+                    "decided_by": "fallback"}
+    
+    @staticmethod
+    def _weather_for(results):
+        if results['decision'].get('needs_weather'):
+            return results.get('weather', "")
+        return ""
+    
     def generate_content(self, prompt, content_type='story'):
         """Generate content using OpenAI"""
         try:
@@ -112,47 +154,30 @@ class AIOperator:
             return f"Content generation error: {str(e)}"
     
     def generate_image(self, prompt):
-        """Generate image using DALL-E"""
+        """Queue image generation; returns the job to poll (completed at once for a repeated prompt)"""
         try:
             # Enhance prompt for better results
             enhanced_prompt = f"Professional, high-quality illustration: {prompt}. Digital art style, detailed, vibrant colors."
             
-            response = openai.Image.create(
-                prompt=enhanced_prompt,
-                n=1,
-                size="1024x1024",
-                model="dall-e-3"
-            )
-            
-            return response.data[0].url
+            return self.image_jobs.submit(enhanced_prompt)
             
         except Exception as e:
             return f"Image generation error: {str(e)}"
     
+    def render_image(self, prompt):
+        """Generate image using DALL-E; the job queue downloads the URL into the local store"""
+        response = openai.Image.create(
+            prompt=prompt,
+            n=1,
+            size="1024x1024",
+            model="dall-e-3"
+        )
+        
+        return response.data[0].url
+    
     def get_weather_context(self, location):
-        """Get weather data from NOAA (free API)"""
-        try:
-            # Simple weather context - you can enhance this
-            lat, lon = location.get('lat', 40.7128), location.get('lon', -74.0060)  # Default to NYC
-            
-            # NOAA API call
-            points_url = f"https://api.weather.gov/points/{lat},{lon}"
-            points_response = requests.get(points_url)
-            
-            if points_response.status_code == 200:
-                forecast_url = points_response.json()['properties']['forecast']
-                weather_response = requests.get(forecast_url)
-                
-                if weather_response.status_code == 200:
-                    weather_data = weather_response.json()
-                    current_weather = weather_data['properties']['periods'][0]
-                    
-                    return f"Current weather: {current_weather['shortForecast']}, {current_weather['temperature']}°F. "
-            
-            return ""
-            
-        except:
-            return ""
+        """Get weather data from NOAA (free API), cached per grid cell"""
+        return self.weather.context_for(location)
     
     def process_voice(self, audio_data):
         """Process voice input using Whisper"""
@@ -160,7 +185,9 @@ class AIOperator:
         return "Voice processing not implemented in demo"
     
     def format_book(self, content, images=None):
-        """Format content into book layout"""
+        """Format content into book layout; images is an image URL or an image job"""
+        if isinstance(images, dict):
+            images = images.get('image_url')
         # Simple book formatting
         formatted = f"""
         <div class="book-preview">
@@ -215,11 +242,27 @@ def generate_image():
     prompt = data.get('prompt', '')
     
     try:
-        image_url = ai_operator.generate_image(prompt)
-        return jsonify({'success': True, 'image_url': image_url})
+        job = ai_operator.generate_image(prompt)
+        if not isinstance(job, dict):
+            return jsonify({'success': False, 'error': job})
+        return jsonify({'success': True, 'job': job, 'image_url': job['image_url']})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/image-jobs/<job_id>', methods=['GET'])
+def image_job_status(job_id):
+    """Poll an image job; ?wait=N waits up to N seconds (max 30) for it to finish"""
+    wait = min(request.args.get('wait', 0, type=float), 30)
+    job = ai_operator.image_jobs.wait(job_id, wait) if wait > 0 else ai_operator.image_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Image job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/images/<path:filename>')
+def generated_image(filename):
+    """Serve generated images and thumbnails from the local store"""
+    return send_from_directory(ai_operator.image_jobs.store.root, filename, max_age=31536000)
+
 @app.route('/api/weather-story', methods=['POST'])
 def weather_story():
     """Weather-enhanced content generation"""
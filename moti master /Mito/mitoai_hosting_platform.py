@@ -17,9 +17,16 @@ import json
 import uuid
 import os
 from datetime import datetime, timedelta
+from decimal import Decimal
 import psycopg2
 from redis import Redis
 import logging
+import argparse
+import hmac
+import sys
+from functools import wraps
+from concurrent.futures import ProcessPoolExecutor
+from partition_manager import PartitionManager, month_bounds
 
 class MitoAICloudPlatform:
     """
@@ -350,18 +357,147 @@ class BillingManager:
     Manages subscription billing and usage tracking
     """
     
-    def __init__(self, database_url):
+    USAGE_RETENTION_MONTHS = 24
+    ROLLUP_TABLES = {'usage_hourly': 'bucket_hour', 'usage_daily': 'bucket_day'}
+    # Decimal, like the NUMERIC quantities and fees they are multiplied with
+    USAGE_RATES = {
+        'starter': {'api_call': Decimal('0.01'), 'storage_gb': Decimal('0.10')},
+        'professional': {'api_call': Decimal('0.008'), 'storage_gb': Decimal('0.08')},
+        'business': {'api_call': Decimal('0.005'), 'storage_gb': Decimal('0.05')},
+        'enterprise': {'api_call': Decimal('0.002'), 'storage_gb': Decimal('0.02')}
+    }
+    BILLING_BATCH_SIZE = 1000
+    MAX_BILLING_WORKERS = int(os.getenv('MAX_BILLING_WORKERS', '8'))
+    
+    def __init__(self, database_url, initialize=True):
         self.db_url = database_url
+        self.partitions = PartitionManager(
+            connect=lambda: psycopg2.connect(self.db_url),
+            policies={'usage_tracking': {'column': 'timestamp', 'retention_months': self.USAGE_RETENTION_MONTHS}}
+        )
+        if initialize:
+            # Every worker constructs one at import (gunicorn never runs __main__)
+            self.initialize_storage()
+    
+    def initialize_storage(self):
+        """Usage and billing tables, one process at a time; every step is idempotent"""
+        conn = psycopg2.connect(self.db_url)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_advisory_lock(hashtext('mitoai_billing_storage'))")
+            try:
+                self.initialize_usage_storage()
+                self.initialize_billing_storage()
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(hashtext('mitoai_billing_storage'))")
+                cursor.close()
+        finally:
+            conn.close()
+        
+    def _create_usage_tracking(self):
+        conn = psycopg2.connect(self.db_url)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS usage_tracking (
+                id BIGSERIAL,
+                tenant_id VARCHAR(255) NOT NULL,
+                usage_type VARCHAR(100) NOT NULL,
+                quantity NUMERIC NOT NULL,
+                timestamp TIMESTAMP NOT NULL,
+                billing_period VARCHAR(7) NOT NULL,
+                PRIMARY KEY (id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_usage_tracking_tenant_time
+            ON usage_tracking (tenant_id, timestamp)
+        """)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        
+    def initialize_usage_storage(self):
+        """Create the monthly-partitioned usage_tracking table and its partitions"""
+        # Deployments from before partitioning still have a plain usage_tracking table
+        self.partitions.migrate_to_partitioned('usage_tracking', self._create_usage_tracking)
+        self._create_usage_tracking()
+        conn = psycopg2.connect(self.db_url)
+        cursor = conn.cursor()
+        # Rollups kept in step with usage_tracking; billing and dashboards read these
+        for table, bucket_column in self.ROLLUP_TABLES.items():
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    tenant_id VARCHAR(255) NOT NULL,
+                    usage_type VARCHAR(100) NOT NULL,
+                    {bucket_column} TIMESTAMP NOT NULL,
+                    quantity NUMERIC NOT NULL DEFAULT 0,
+                    events BIGINT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (tenant_id, {bucket_column}, usage_type)
+                )
+            """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS usage_backfills (
+                name VARCHAR(100) PRIMARY KEY,
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+        """)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        self.partitions.run_maintenance()
+        self.backfill_rollups()
+        self.partitions.start_background_maintenance()
+        
+    def backfill_rollups(self):
+        """
+        Rebuild usage_hourly/usage_daily from usage_tracking, once per deployment
+        
+        Rows tracked before the rollups existed are otherwise invisible to
+        billing. The backfill is claimed by inserting its name into
+        usage_backfills in the same transaction, so concurrent workers wait
+        for the first one and then skip it. Recomputing from the raw rows is
+        exact because track_usage has always written both in one transaction.
+        """
+        conn = psycopg2.connect(self.db_url)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO usage_backfills (name) VALUES ('usage_rollups')
+                ON CONFLICT (name) DO NOTHING RETURNING name
+            """)
+            if cursor.fetchone() is None:
+                conn.rollback()
+                return False
+            # Holds off track_usage until the rebuilt totals are committed
+            cursor.execute("LOCK TABLE usage_tracking IN SHARE MODE")
+            for table, bucket_column in self.ROLLUP_TABLES.items():
+                unit = 'hour' if table == 'usage_hourly' else 'day'
+                cursor.execute(f"""
+                    INSERT INTO {table} (tenant_id, usage_type, {bucket_column}, quantity, events)
+                    SELECT tenant_id, usage_type, date_trunc('{unit}', timestamp), SUM(quantity), COUNT(*)
+                    FROM usage_tracking
+                    GROUP BY tenant_id, usage_type, date_trunc('{unit}', timestamp)
+                    ON CONFLICT (tenant_id, {bucket_column}, usage_type) DO UPDATE SET
+                        quantity = EXCLUDED.quantity,
+                        events = EXCLUDED.events
+                """)
+                logging.info(f"Backfilled {cursor.rowcount} {table} buckets from usage_tracking")
+            conn.commit()
+            cursor.close()
+            return True
+        finally:
+            conn.close()
         
     def track_usage(self, tenant_id, usage_type, quantity):
         """Track tenant usage for billing"""
         try:
+            now = datetime.now()
             usage_record = {
                 'tenant_id': tenant_id,
                 'usage_type': usage_type,
                 'quantity': quantity,
-                'timestamp': datetime.now().isoformat(),
-                'billing_period': datetime.now().strftime('%Y-%m')
+                'timestamp': now.isoformat(),
+                'billing_period': now.strftime('%Y-%m')
             }
             
             conn = psycopg2.connect(self.db_url)
@@ -381,6 +517,20 @@ class BillingManager:
                 usage_record['billing_period']
             ))
             
+            # Same transaction, so the rollups never drift from the raw rows
+            buckets = {
+                'usage_hourly': now.replace(minute=0, second=0, microsecond=0),
+                'usage_daily': now.replace(hour=0, minute=0, second=0, microsecond=0)
+            }
+            for table, bucket_column in self.ROLLUP_TABLES.items():
+                cursor.execute(f"""
+                    INSERT INTO {table} (tenant_id, usage_type, {bucket_column}, quantity, events)
+                    VALUES (%s, %s, %s, %s, 1)
+                    ON CONFLICT (tenant_id, {bucket_column}, usage_type) DO UPDATE SET
+                        quantity = {table}.quantity + EXCLUDED.quantity,
+                        events = {table}.events + 1
+                """, (tenant_id, usage_type, buckets[table], quantity))
+            
             conn.commit()
             cursor.close()
             conn.close()
@@ -398,19 +548,20 @@ class BillingManager:
             cursor.execute("SELECT * FROM tenants WHERE tenant_id = %s", (tenant_id,))
             tenant = cursor.fetchone()
             
-            # Get usage data for current month
+            # Get usage data for current month from the daily rollup (one row per day and type)
             current_month = datetime.now().strftime('%Y-%m')
+            period_start, period_end = month_bounds(current_month)
             cursor.execute("""
                 SELECT usage_type, SUM(quantity) as total_usage
-                FROM usage_tracking 
-                WHERE tenant_id = %s AND billing_period = %s
+                FROM usage_daily
+                WHERE tenant_id = %s AND bucket_day >= %s AND bucket_day < %s
                 GROUP BY usage_type
-            """, (tenant_id, current_month))
+            """, (tenant_id, period_start, period_end))
             
             usage_data = cursor.fetchall()
             
             # Calculate charges
-            base_fee = tenant[10]  # monthly_fee column
+            base_fee = Decimal(str(tenant[10] or 0))  # monthly_fee column
             usage_charges = self.calculate_usage_charges(usage_data, tenant[9])  # plan column
             
             total_amount = base_fee + usage_charges
@@ -454,24 +605,198 @@ class BillingManager:
             logging.error(f"Invoice generation failed: {str(e)}")
             return None
     
+    def get_usage_summary(self, tenant_id, start, end, granularity='day'):
+        """Usage per bucket and type for dashboards and quota checks, read from the rollups"""
+        table = 'usage_hourly' if granularity == 'hour' else 'usage_daily'
+        bucket_column = self.ROLLUP_TABLES[table]
+        conn = psycopg2.connect(self.db_url)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {bucket_column}, usage_type, quantity, events
+                FROM {table}
+                WHERE tenant_id = %s AND {bucket_column} >= %s AND {bucket_column} < %s
+                ORDER BY {bucket_column}, usage_type
+            """, (tenant_id, start, end))
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+        return [
+            {'bucket': bucket.isoformat(), 'usage_type': usage_type,
+             'quantity': float(quantity), 'events': events}
+            for bucket, usage_type, quantity, events in rows
+        ]
+    
+    def initialize_billing_storage(self):
+        """One invoice per tenant per period, plus per-shard checkpoints for bulk runs"""
+        conn = psycopg2.connect(self.db_url)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_invoices_tenant_period
+            ON invoices (tenant_id, billing_period)
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS billing_runs (
+                billing_period VARCHAR(7) NOT NULL,
+                shard INTEGER NOT NULL,
+                shards INTEGER NOT NULL,
+                last_tenant_id VARCHAR(255) NOT NULL DEFAULT '',
+                invoices_created INTEGER NOT NULL DEFAULT 0,
+                started_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                completed_at TIMESTAMP,
+                PRIMARY KEY (billing_period, shard, shards)
+            )
+        """)
+        conn.commit()
+        cursor.close()
+        conn.close()
+    
+    def _rates_sql(self):
+        return ', '.join(
+            f"('{plan}', '{usage_type}', {rate})"
+            for plan, rates in self.USAGE_RATES.items()
+            for usage_type, rate in rates.items()
+        )
+    
+    def bill_shard(self, billing_period, shard=0, shards=1):
+        """
+        Invoice every tenant in one hash shard for a period, a batch of tenants per transaction
+        
+        Charges are computed set-based from usage_daily. Each batch's invoices and the
+        shard checkpoint commit together, so an interrupted run resumes after the last
+        committed tenant, and the (tenant_id, billing_period) index makes reruns no-ops.
+        """
+        period_start, period_end = month_bounds(billing_period)
+        plans = ', '.join(f"'{plan}'" for plan in self.USAGE_RATES)
+        conn = psycopg2.connect(self.db_url)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO billing_runs (billing_period, shard, shards) VALUES (%s, %s, %s)
+                ON CONFLICT (billing_period, shard, shards) DO NOTHING
+            """, (billing_period, shard, shards))
+            cursor.execute("""
+                SELECT last_tenant_id, invoices_created, completed_at FROM billing_runs
+                WHERE billing_period = %s AND shard = %s AND shards = %s
+            """, (billing_period, shard, shards))
+            after, created, completed_at = cursor.fetchone()
+            conn.commit()
+            if completed_at:
+                return created
+            
+            while True:
+                now = datetime.now()
+                cursor.execute(f"""
+                    WITH batch AS (
+                        SELECT tenant_id, monthly_fee,
+                               CASE WHEN plan IN ({plans}) THEN plan ELSE 'professional' END AS rate_plan
+                        FROM tenants
+                        WHERE tenant_id > %(after)s AND mod(hashtext(tenant_id) & 2147483647, %(shards)s) = %(shard)s
+                        ORDER BY tenant_id
+                        LIMIT %(limit)s
+                    ),
+                    rates (plan, usage_type, rate) AS (VALUES {self._rates_sql()}),
+                    usage AS (
+                        SELECT d.tenant_id, d.usage_type, SUM(d.quantity) AS quantity
+                        FROM usage_daily d JOIN batch b ON b.tenant_id = d.tenant_id
+                        WHERE d.bucket_day >= %(start)s AND d.bucket_day < %(end)s
+                        GROUP BY d.tenant_id, d.usage_type
+                    ),
+                    charges AS (
+                        SELECT b.tenant_id, b.monthly_fee AS base_fee,
+                               COALESCE(SUM(u.quantity * r.rate), 0) AS usage_charges
+                        FROM batch b
+                        LEFT JOIN usage u ON u.tenant_id = b.tenant_id
+                        LEFT JOIN rates r ON r.plan = b.rate_plan AND r.usage_type = u.usage_type
+                        GROUP BY b.tenant_id, b.monthly_fee
+                    ),
+                    inserted AS (
+                        INSERT INTO invoices (
+                            invoice_id, tenant_id, billing_period, base_fee,
+                            usage_charges, total_amount, due_date, status, created_at
+                        )
+                        SELECT gen_random_uuid()::text, tenant_id, %(period)s, base_fee,
+                               usage_charges, base_fee + usage_charges, %(due)s, 'pending', %(now)s
+                        FROM charges
+                        ON CONFLICT (tenant_id, billing_period) DO NOTHING
+                        RETURNING tenant_id
+                    )
+                    SELECT (SELECT MAX(tenant_id) FROM batch), (SELECT COUNT(*) FROM inserted)
+                """, {
+                    'after': after, 'shards': shards, 'shard': shard, 'limit': self.BILLING_BATCH_SIZE,
+                    'start': period_start, 'end': period_end, 'period': billing_period,
+                    'due': now + timedelta(days=30), 'now': now
+                })
+                last_tenant_id, inserted = cursor.fetchone()
+                if last_tenant_id is None:
+                    cursor.execute("""
+                        UPDATE billing_runs SET completed_at = NOW()
+                        WHERE billing_period = %s AND shard = %s AND shards = %s
+                    """, (billing_period, shard, shards))
+                    conn.commit()
+                    return created
+                
+                cursor.execute("""
+                    UPDATE billing_runs SET last_tenant_id = %s, invoices_created = invoices_created + %s
+                    WHERE billing_period = %s AND shard = %s AND shards = %s
+                """, (last_tenant_id, inserted, billing_period, shard, shards))
+                conn.commit()
+                after = last_tenant_id
+                created += inserted
+        finally:
+            conn.close()
+    
+    def run_monthly_billing(self, billing_period=None, workers=1):
+        """Bulk month-end close: every tenant invoiced once, sharded across worker processes"""
+        billing_period = billing_period or datetime.now().strftime('%Y-%m')
+        workers = max(1, min(int(workers), self.MAX_BILLING_WORKERS))
+        self.initialize_billing_storage()
+        if workers <= 1:
+            created = self.bill_shard(billing_period)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                created = sum(pool.map(
+                    _bill_shard, [(self.db_url, billing_period, shard, workers) for shard in range(workers)]
+                ))
+        logging.info(f"Billing run {billing_period} created {created} invoices across {workers} shards")
+        return {'billing_period': billing_period, 'invoices_created': created, 'shards': workers}
+    
+    def billing_status(self, billing_period):
+        """Per-shard progress of the billing runs for a period, from their checkpoints"""
+        conn = psycopg2.connect(self.db_url)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT shard, shards, invoices_created, started_at, completed_at FROM billing_runs
+                WHERE billing_period = %s ORDER BY shards, shard
+            """, (billing_period,))
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+        return [
+            {'shard': shard, 'shards': shards, 'invoices_created': created,
+             'started_at': started_at.isoformat(), 'completed_at': completed_at.isoformat() if completed_at else None}
+            for shard, shards, created, started_at, completed_at in rows
+        ]
+    
     def calculate_usage_charges(self, usage_data, plan):
         """Calculate usage-based charges"""
-        usage_rates = {
-            'starter': {'api_call': 0.01, 'storage_gb': 0.10},
-            'professional': {'api_call': 0.008, 'storage_gb': 0.08},
-            'business': {'api_call': 0.005, 'storage_gb': 0.05},
-            'enterprise': {'api_call': 0.002, 'storage_gb': 0.02}
-        }
-        
-        rates = usage_rates.get(plan, usage_rates['professional'])
-        total_charges = 0
+        rates = self.USAGE_RATES.get(plan, self.USAGE_RATES['professional'])
+        total_charges = Decimal(0)
         
         for usage_type, quantity in usage_data:
-            rate = rates.get(usage_type, 0)
-            total_charges += quantity * rate
+            rate = rates.get(usage_type, Decimal(0))
+            total_charges += Decimal(str(quantity)) * rate
         
         return total_charges
 
+def _bill_shard(args):
+    """Worker-process entry point for BillingManager.run_monthly_billing"""
+    database_url, billing_period, shard, shards = args
+    return BillingManager(database_url, initialize=False).bill_shard(billing_period, shard, shards)
+
 class MonitoringManager:
     """
     Monitors tenant instances and platform health
@@ -576,6 +901,20 @@ monitoring_manager = MonitoringManager(
     redis_client=Redis(host='localhost', port=6379, db=0)
 )
 
+# Operator endpoints are closed unless an admin token is configured
+ADMIN_TOKEN = os.getenv('MITOAI_ADMIN_TOKEN')
+
+def admin_required(f):
+    """Require the X-MitoAI-Admin-Token header to match MITOAI_ADMIN_TOKEN"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('X-MitoAI-Admin-Token', '')
+        if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({'error': 'Admin privileges required'}), 403
+        return f(*args, **kwargs)
+    
+    return decorated
+
 @app.route('/api/hosting/create-tenant', methods=['POST'])
 def create_tenant():
     """Create new tenant instance"""
@@ -623,6 +962,48 @@ def generate_tenant_invoice(tenant_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/hosting/billing/run', methods=['POST'])
+@admin_required
+def run_billing():
+    """Start a billing run for a period as a separate CLI process (resumable; safe to re-run)"""
+    try:
+        data = request.json or {}
+        billing_period = data.get('billing_period') or datetime.now().strftime('%Y-%m')
+        month_bounds(billing_period)  # Rejects malformed periods before anything is started
+        workers = max(1, min(int(data.get('workers', 1)), BillingManager.MAX_BILLING_WORKERS))
+        # Never fork the web worker: billing runs in its own session and survives worker restarts
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), 'bill', '--period', billing_period, '--workers', str(workers)],
+            start_new_session=True, stdin=subprocess.DEVNULL
+        )
+        return jsonify({'billing_period': billing_period, 'shards': workers, 'pid': process.pid,
+                        'status_url': f"/api/hosting/billing/runs/{billing_period}"}), 202
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/hosting/billing/runs/<billing_period>', methods=['GET'])
+@admin_required
+def get_billing_status(billing_period):
+    """Progress of the billing runs for a period"""
+    try:
+        return jsonify({'billing_period': billing_period, 'shards': billing_manager.billing_status(billing_period)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/hosting/tenant/<tenant_id>/usage', methods=['GET'])
+def get_tenant_usage(tenant_id):
+    """Hourly or daily usage for a tenant (defaults to the current month, daily)"""
+    try:
+        period_start, period_end = month_bounds(request.args.get('period', datetime.now().strftime('%Y-%m')))
+        usage = billing_manager.get_usage_summary(
+            tenant_id, period_start, period_end, request.args.get('granularity', 'day')
+        )
+        return jsonify({'tenant_id': tenant_id, 'usage': usage})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/hosting/platform-status', methods=['GET'])
 def platform_status():
     """Get overall hosting platform status"""
@@ -635,7 +1016,18 @@ def platform_status():
         'timestamp': datetime.now().isoformat()
     })
 
-if __name__ == '__main__':
+def billing_cli(argv):
+    """python mitoai_hosting_platform.py bill [--period YYYY-MM] [--workers N]"""
+    parser = argparse.ArgumentParser(prog='mitoai_hosting_platform.py bill')
+    parser.add_argument('--period', help='billing period as YYYY-MM (default: current month)')
+    parser.add_argument('--workers', type=int, default=1, help='shards billed in parallel processes')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(billing_manager.run_monthly_billing(args.period, args.workers)))
+
+if __name__ == '__main__' and sys.argv[1:2] == ['bill']:
+    billing_cli(sys.argv[2:])
+elif __name__ == '__main__':
     print("MitoAI Cloud Hosting Platform")
     print("Creator: Daniel Guzman")
     print("Contact: guzman.daniel@outlook.com")
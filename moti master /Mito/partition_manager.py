@@ -0,0 +1,248 @@
+"""
+MitoAI Platform - Time Partition Manager
+Creator: Daniel Guzman
+Contact: guzman.daniel@outlook.com
+Copyright: 2025 Daniel Guzman - All Rights Reserved
+
+NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
+
+Monthly range partition maintenance for append-only usage tables
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(moment: datetime, months: int) -> datetime:
+    index = moment.year * 12 + (moment.month - 1) + months
+    return moment.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def month_bounds(billing_period: str) -> Tuple[datetime, datetime]:
+    """Half-open [start, end) range for a 'YYYY-MM' period, for partition pruning"""
+    start = datetime.strptime(billing_period, '%Y-%m')
+    return start, add_months(start, 1)
+
+
+class PartitionManager:
+    """
+    Keeps monthly RANGE partitions ahead of the write head and retires old ones
+
+    Each policy maps a partitioned parent table to its partition column
+    (default 'timestamp'), its retention in months and whether expired
+    partitions are dropped or only detached. Partitions are named <table>_yYYYYmMM; a DEFAULT
+    partition catches rows that fall outside the pre-created range. Such
+    rows are moved into a month's partition when it is created, and are
+    deleted from DEFAULT once they fall past retention.
+    """
+
+    def __init__(self, connect: Callable, policies: Dict[str, Dict], months_ahead: int = 3):
+        self.connect = connect
+        self.policies = policies
+        self.months_ahead = months_ahead
+        self._maintenance_thread = None
+
+    @staticmethod
+    def partition_name(table: str, start: datetime) -> str:
+        return f"{table}_y{start.year:04d}m{start.month:02d}"
+
+    def column(self, table: str) -> str:
+        return self.policies.get(table, {}).get('column', 'timestamp')
+
+    def _create_partition(self, cursor, table: str, start: datetime) -> bool:
+        """
+        Add the month partition starting at start, unless it exists
+
+        Postgres refuses to create a partition while DEFAULT holds rows in
+        its range, so the partition is built detached, those rows are moved
+        into it, and only then is it attached.
+        """
+        name = self.partition_name(table, start)
+        cursor.execute("SELECT to_regclass(%s)", (name,))
+        if cursor.fetchone()[0] is not None:
+            return False
+        end = add_months(start, 1)
+        column = self.column(table)
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {table}_default WHERE {column} >= %s AND {column} < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """, (start, end))
+        if cursor.rowcount:
+            logger.info(f"Moved {cursor.rowcount} rows of {table}_default into {name}")
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+        return True
+
+    def ensure_partitions(self, table: str, now: datetime = None):
+        """Create this month's partition and the next months_ahead ones"""
+        first = month_start(now or datetime.utcnow())
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+            for offset in range(self.months_ahead + 1):
+                self._create_partition(cursor, table, add_months(first, offset))
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+    def migrate_to_partitioned(self, table: str, create_parent: Callable[[], None]) -> bool:
+        """
+        Convert a table created before partitioning into a partitioned one
+
+        The plain table (and its indexes) is renamed to <table>_legacy,
+        create_parent() creates the partitioned table under the original
+        name, and the legacy rows are copied into month partitions before
+        the legacy table is dropped. An interrupted migration resumes from
+        the leftover legacy table on the next run. Returns whether rows
+        were migrated.
+        """
+        legacy = f"{table}_legacy"
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s AND relkind IN ('r', 'p')", (table,))
+            row = cursor.fetchone()
+            if row is not None and row[0] == 'r':
+                cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+                cursor.execute("""
+                    SELECT idx.relname FROM pg_index
+                    JOIN pg_class idx ON idx.oid = pg_index.indexrelid
+                    WHERE pg_index.indrelid = %s::regclass
+                """, (legacy,))
+                for (index,) in cursor.fetchall():
+                    cursor.execute(f"ALTER INDEX {index} RENAME TO {index}_legacy")
+                conn.commit()
+                logger.info(f"Renamed unpartitioned {table} to {legacy} for migration")
+            cursor.execute("SELECT to_regclass(%s)", (legacy,))
+            pending = cursor.fetchone()[0] is not None
+            cursor.close()
+        finally:
+            conn.close()
+        if not pending:
+            return False
+
+        create_parent()
+        column = self.column(table)
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+            cursor.execute(f"SELECT DISTINCT date_trunc('month', {column}) FROM {legacy} WHERE {column} IS NOT NULL")
+            for (start,) in cursor.fetchall():
+                self._create_partition(cursor, table, start)
+            cursor.execute("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_name = %s AND column_name IN (
+                    SELECT column_name FROM information_schema.columns WHERE table_name = %s
+                )
+                ORDER BY ordinal_position
+            """, (legacy, table))
+            names = [name for (name,) in cursor.fetchall()]
+            # Legacy rows may predate the partition key becoming NOT NULL
+            values = [f"COALESCE({name}, CURRENT_TIMESTAMP)" if name == column else name for name in names]
+            cursor.execute(f"INSERT INTO {table} ({', '.join(names)}) SELECT {', '.join(values)} FROM {legacy}")
+            copied = cursor.rowcount
+            # Copied serial ids must not be handed out again
+            cursor.execute("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_name = %s AND column_default LIKE 'nextval%%'
+            """, (table,))
+            for (serial,) in cursor.fetchall():
+                cursor.execute(f"""
+                    SELECT setval(pg_get_serial_sequence(%s, %s), GREATEST((SELECT MAX({serial}) FROM {table}), 1))
+                """, (table, serial))
+            cursor.execute(f"DROP TABLE {legacy}")
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        logger.info(f"Migrated {copied} rows of {table} into monthly partitions")
+        return True
+
+    def list_partitions(self, table: str) -> List[str]:
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = %s
+            """, (table,))
+            names = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+            return names
+        finally:
+            conn.close()
+
+    def enforce_retention(self, table: str, retention_months: int, drop: bool = True,
+                          now: datetime = None) -> List[str]:
+        """Detach (and by default drop) partitions that end before the retention cutoff"""
+        cutoff = add_months(month_start(now or datetime.utcnow()), -retention_months)
+        prefix = f"{table}_y"
+        expired = []
+        for name in self.list_partitions(table):
+            if not name.startswith(prefix):
+                continue
+            try:
+                start = datetime.strptime(name[len(prefix):], '%Ym%m')
+            except ValueError:
+                continue
+            if add_months(start, 1) <= cutoff:
+                expired.append(name)
+
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            # Out-of-range rows in DEFAULT expire on the same schedule as the partitions
+            column = self.column(table)
+            cursor.execute(f"DELETE FROM {table}_default WHERE {column} < %s", (cutoff,))
+            for name in sorted(expired):
+                cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                if drop:
+                    cursor.execute(f"DROP TABLE {name}")
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        if expired:
+            logger.info(f"Retired {len(expired)} partitions of {table}: {', '.join(sorted(expired))}")
+        return expired
+
+    def run_maintenance(self, now: datetime = None):
+        for table, policy in self.policies.items():
+            try:
+                self.ensure_partitions(table, now)
+                if policy.get('retention_months'):
+                    self.enforce_retention(table, policy['retention_months'],
+                                           drop=policy.get('drop', True), now=now)
+            except Exception as e:
+                logger.error(f"Partition maintenance failed for {table}: {str(e)}")
+
+    def start_background_maintenance(self, interval_seconds: int = 3600):
+        """Repeat maintenance every interval on a daemon thread"""
+        if self._maintenance_thread is not None:
+            return self._maintenance_thread
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval_seconds):
+                self.run_maintenance()
+
+        self._maintenance_thread = threading.Thread(target=loop, name='partition-maintenance', daemon=True)
+        self._maintenance_thread.stop = stop
+        self._maintenance_thread.start()
+        return self._maintenance_thread
@@ -0,0 +1,221 @@
+"""
+MitoAI Platform - Phase Executor
+Creator: Daniel Guzman
+Contact: guzman.daniel@outlook.com
+Copyright: 2025 Daniel Guzman - All Rights Reserved
+
+NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
+
+Dependency-ordered, concurrent execution of project plan phases
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PlanError(Exception):
+    """The plan's phase graph is malformed (unknown dependency or a cycle)"""
+
+
+def normalize_phases(project_plan: Dict) -> List[Dict]:
+    """
+    Phases with an id and an explicit depends_on list
+
+    A phase without depends_on is assumed to follow the phase before it, so
+    older sequential plans keep their order; an explicit empty list marks a
+    phase as independent.
+    """
+    phases = []
+    previous = None
+    for index, phase in enumerate(project_plan.get('phases', [])):
+        if not isinstance(phase, dict):
+            phase = {'name': str(phase)}
+        phase_id = str(phase.get('id') or phase.get('name') or f"phase_{index + 1}")
+        depends_on = phase.get('depends_on')
+        if depends_on is None:
+            depends_on = [previous] if previous else []
+        phases.append(dict(phase, id=phase_id, depends_on=[str(dep) for dep in depends_on]))
+        previous = phase_id
+
+    ids = {phase['id'] for phase in phases}
+    if len(ids) != len(phases):
+        raise PlanError('Phase ids must be unique')
+    for phase in phases:
+        unknown = set(phase['depends_on']) - ids
+        if unknown:
+            raise PlanError(f"Phase {phase['id']} depends on unknown phases: {', '.join(sorted(unknown))}")
+
+    # Kahn's algorithm; anything left over is on a cycle
+    remaining = {phase['id']: set(phase['depends_on']) for phase in phases}
+    ready = [phase_id for phase_id, deps in remaining.items() if not deps]
+    while ready:
+        done = ready.pop()
+        del remaining[done]
+        for phase_id, deps in remaining.items():
+            if done in deps:
+                deps.discard(done)
+                if not deps:
+                    ready.append(phase_id)
+    if remaining:
+        raise PlanError(f"Dependency cycle between phases: {', '.join(sorted(remaining))}")
+    return phases
+
+
+def phase_instructions(phase: Dict) -> Dict:
+    """A phase's instructions as a dict; plain-text instructions become the description"""
+    instructions = phase.get('instructions')
+    if isinstance(instructions, dict):
+        return instructions
+    return {'description': str(instructions)} if instructions else {}
+
+
+def find_phase(phases: List[Dict], requested) -> Optional[Dict]:
+    """The normalized phase a caller refers to by id, name or 1-based position"""
+    if requested is None or requested == '':
+        return None
+    for phase in phases:
+        if str(requested) in (phase['id'], str(phase.get('name'))):
+            return phase
+    if isinstance(requested, int) and 0 < requested <= len(phases):
+        return phases[requested - 1]
+    return None
+
+
+class PhaseExecutor:
+    """
+    Runs a project's phases as a DAG
+
+    Phases whose dependencies have completed run concurrently, at most
+    per_project at a time for one project and max_workers across all
+    projects. Each phase result is saved to the project store as soon as it
+    arrives, so a failed or interrupted run resumes with only the phases
+    that have not completed. run() yields progress events as they happen.
+    Only one run per project at a time: run() holds the store's run lock,
+    renewed every lease_seconds / 3 while phases are in flight.
+    """
+
+    def __init__(self, store, context, max_workers: int = 16, per_project: int = 4,
+                 lease_seconds: int = 300):
+        self.store = store
+        self.context = context
+        self.per_project = per_project
+        self.lease_seconds = lease_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='phase')
+
+    @staticmethod
+    def _event(event: str, **fields) -> Dict:
+        return dict(fields, event=event, timestamp=datetime.now().isoformat())
+
+    def run(self, project_id: str, manager) -> Iterator[Dict]:
+        project = self.store.get(project_id)
+        if project is None:
+            yield self._event('run_failed', project_id=project_id, error='Project not found')
+            return
+        try:
+            phases = normalize_phases(project['project_plan'])
+        except PlanError as e:
+            yield self._event('run_failed', project_id=project_id, error=str(e))
+            return
+
+        token = self.store.acquire_run_lock(project_id, self.lease_seconds)
+        if token is None:
+            yield self._event('run_failed', project_id=project_id, error='Project is already running')
+            return
+        try:
+            yield from self._run_phases(project_id, project, phases, manager, token)
+        finally:
+            self.store.release_run_lock(project_id, token)
+
+    def _run_phases(self, project_id: str, project: Dict, phases: List[Dict], manager,
+                    token: str) -> Iterator[Dict]:
+        # Re-read under the lease, so results saved by a run that just finished are not redone
+        project = self.store.get(project_id) or project
+        results = dict(project.get('phase_results') or {})
+        completed = {phase_id for phase_id, result in results.items() if result.get('status') == 'completed'}
+        failed = set()
+        pending = {phase['id']: phase for phase in phases if phase['id'] not in completed}
+        running = {}
+        lease_lost = False
+        renew_at = time.monotonic() + self.lease_seconds / 3
+        yield self._event('run_started', project_id=project_id, total_phases=len(phases),
+                          already_completed=len(completed))
+
+        def blocked(phase):
+            return any(dep in failed for dep in phase['depends_on'])
+
+        while pending or running:
+            ready = [phase for phase in pending.values()
+                     if set(phase['depends_on']) <= completed and not blocked(phase)]
+            for phase in ([] if lease_lost else ready[:max(self.per_project - len(running), 0)]):
+                del pending[phase['id']]
+                instructions = dict(
+                    phase_instructions(phase),
+                    phase=phase,
+                    phase_summaries={phase_id: result['summary'] for phase_id, result in results.items()
+                                     if result.get('status') == 'completed' and result.get('summary')}
+                )
+                future = self._pool.submit(manager.execute_phase, project['project_data'],
+                                           project['project_plan'], instructions)
+                running[future] = phase
+                yield self._event('phase_started', project_id=project_id, phase=phase['id'])
+
+            # Phases downstream of a failure cannot run in this pass
+            for phase_id in [phase_id for phase_id, phase in pending.items() if blocked(phase)]:
+                failed.add(phase_id)
+                del pending[phase_id]
+                yield self._event('phase_skipped', project_id=project_id, phase=phase_id)
+
+            if not running:
+                break
+            done, _ = wait(running, timeout=max(renew_at - time.monotonic(), 0),
+                           return_when=FIRST_COMPLETED)
+            if time.monotonic() >= renew_at:
+                renew_at = time.monotonic() + self.lease_seconds / 3
+                if not lease_lost and not self.store.refresh_run_lock(project_id, token, self.lease_seconds):
+                    # Another worker may own the project now; finish what is running, start nothing new
+                    lease_lost = True
+                    logger.error(f"Run lock of project {project_id} expired; not starting further phases")
+            for future in done:
+                phase = running.pop(future)
+                try:
+                    output = future.result()
+                    error = output.get('error') if isinstance(output, dict) else None
+                except Exception as e:
+                    output, error = None, str(e)
+
+                if error:
+                    failed.add(phase['id'])
+                    results[phase['id']] = {'status': 'failed', 'error': error,
+                                            'finished_at': datetime.now().isoformat()}
+                else:
+                    completed.add(phase['id'])
+                    results[phase['id']] = {'status': 'completed', 'output': output,
+                                            'summary': self.context.summarize(output),
+                                            'finished_at': datetime.now().isoformat()}
+                project = self.store.save(dict(
+                    project,
+                    phase_results=results,
+                    project_plan=dict(project['project_plan'],
+                                      progress_percentage=round(100 * len(completed) / max(len(phases), 1)))
+                ))
+                if error:
+                    logger.error(f"Phase {phase['id']} of project {project_id} failed: {error}")
+                    yield self._event('phase_failed', project_id=project_id, phase=phase['id'], error=error)
+                else:
+                    yield self._event('phase_completed', project_id=project_id, phase=phase['id'],
+                                      result=output)
+
+        if lease_lost:
+            yield self._event('run_failed', project_id=project_id, completed=len(completed),
+                              failed=sorted(failed), error='Run lock lost')
+        elif failed:
+            yield self._event('run_failed', project_id=project_id, completed=len(completed),
+                              failed=sorted(failed))
+        else:
+            project = self.store.save(dict(project, status='completed'))
+            yield self._event('run_completed', project_id=project_id, completed=len(completed))
@@ -0,0 +1,201 @@
+"""
+MitoAI Platform - Plan Retrieval Index
+Creator: Daniel Guzman
+Contact: guzman.daniel@outlook.com
+Copyright: 2025 Daniel Guzman - All Rights Reserved
+
+NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
+
+Local similarity search over earlier project plans and phase summaries
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN = re.compile(r"[a-z0-9]{2,}")
+
+
+class HashingVectorizer:
+    """
+    Stateless text embedding: signed feature hashing of words and word bigrams
+
+    Needs no fitting or model download, so every worker produces identical
+    vectors. Rows are L2-normalised, making a dot product the cosine similarity.
+    """
+
+    def __init__(self, dimensions: int = 1024):
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> List[str]:
+        words = TOKEN.findall(text.lower())
+        return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+    def transform(self, texts: Iterable[str]) -> np.ndarray:
+        texts = list(texts)
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'little')
+                matrix[row, digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+def plan_chunks(project: Dict) -> List[Dict]:
+    """Overview, phases and completed-phase summaries of a stored project, as searchable chunks"""
+    plan = project.get('project_plan') or {}
+    project_data = project.get('project_data') or {}
+    meta = {'project_id': project['project_id'], 'industry': project.get('industry')}
+    overview = {key: value for key, value in plan.items() if key not in ('phases', 'current_phase')}
+    overview['project'] = {key: project_data.get(key) for key in ('project_name', 'project_description')
+                           if project_data.get(key)}
+    chunks = [dict(meta, kind='overview', text=json.dumps(overview, default=str))]
+    for phase in plan.get('phases') or []:
+        chunks.append(dict(meta, kind='phase', text=json.dumps(phase, default=str)))
+    for phase_id, result in (project.get('phase_results') or {}).items():
+        if result.get('status') == 'completed' and result.get('summary'):
+            chunks.append(dict(meta, kind='phase_result', phase=phase_id, text=result['summary']))
+    return chunks
+
+
+class PlanIndex:
+    """
+    Brute-force cosine search over plan chunks held in one NumPy matrix
+
+    A few thousand projects are tens of thousands of chunks, which a single
+    matrix-vector product scans in milliseconds. add() appends new projects
+    into spare rows, doubling the matrix when it is full, so loading n
+    projects one at a time costs O(n) copies rather than O(n^2); a
+    re-added project's old rows are blanked and reclaimed once they make
+    up half the matrix. rebuild() reloads everything from the store and
+    swaps the matrix in atomically.
+    """
+
+    def __init__(self, vectorizer: HashingVectorizer = None, max_chunk_chars: int = 1500):
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.max_chunk_chars = max_chunk_chars
+        self._chunks: List[Optional[Dict]] = []
+        self._matrix = np.zeros((0, self.vectorizer.dimensions), dtype=np.float32)
+        self._rows: Dict[str, List[int]] = {}
+        self._removed = 0
+        self._refresh_thread = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._chunks) - self._removed
+
+    def _prepare(self, projects: Iterable[Dict]):
+        chunks = []
+        for project in projects:
+            for chunk in plan_chunks(project):
+                chunk['text'] = chunk['text'][:self.max_chunk_chars]
+                chunks.append(chunk)
+        return chunks, self.vectorizer.transform(chunk['text'] for chunk in chunks)
+
+    def _append(self, chunks: List[Dict], matrix: np.ndarray):
+        size = len(self._chunks)
+        needed = size + len(chunks)
+        if needed > len(self._matrix):
+            grown = np.zeros((max(needed, 2 * len(self._matrix), 256), self.vectorizer.dimensions),
+                             dtype=np.float32)
+            grown[:size] = self._matrix[:size]
+            self._matrix = grown
+        # Rows past a searcher's snapshot size are never read by it, so filling them in place is safe
+        self._matrix[size:needed] = matrix
+        for row, chunk in enumerate(chunks, start=size):
+            self._rows.setdefault(chunk['project_id'], []).append(row)
+        self._chunks.extend(chunks)
+
+    def _compact(self):
+        live = [row for row, chunk in enumerate(self._chunks) if chunk is not None]
+        # New objects rather than in-place moves, so running searches keep a consistent snapshot
+        self._chunks = [self._chunks[row] for row in live]
+        self._matrix = self._matrix[live]
+        self._rows = {}
+        for row, chunk in enumerate(self._chunks):
+            self._rows.setdefault(chunk['project_id'], []).append(row)
+        self._removed = 0
+
+    def add(self, projects: Iterable[Dict]):
+        chunks, matrix = self._prepare(projects)
+        if not chunks:
+            return
+        with self._lock:
+            for project_id in {chunk['project_id'] for chunk in chunks}:
+                for row in self._rows.pop(project_id, ()):
+                    self._chunks[row] = None
+                    self._matrix[row] = 0.0
+                    self._removed += 1
+            if self._removed > len(self._chunks) // 2:
+                self._compact()
+            self._append(chunks, matrix)
+
+    def rebuild(self, projects: Iterable[Dict]):
+        chunks, matrix = self._prepare(projects)
+        rows = {}
+        for row, chunk in enumerate(chunks):
+            rows.setdefault(chunk['project_id'], []).append(row)
+        with self._lock:
+            self._chunks, self._matrix, self._rows, self._removed = chunks, matrix, rows, 0
+        logger.info(f"Plan index rebuilt with {len(chunks)} chunks")
+
+    def search(self, query: str, k: int = 3, industry: Optional[str] = None,
+               exclude_project: Optional[str] = None, min_score: float = 0.1) -> List[Dict]:
+        """Top-k chunks by cosine similarity, at most one per project"""
+        with self._lock:
+            size = len(self._chunks)
+            chunks, matrix = self._chunks[:size], self._matrix[:size]
+        if not size:
+            return []
+        scores = matrix @ self.vectorizer.transform([query])[0]
+        # Rows of replaced projects (None) never match
+        scores = np.where([chunk is not None and (industry is None or chunk['industry'] == industry)
+                           for chunk in chunks], scores, -1.0)
+        candidates = min(size, k * 8)
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+
+        results, seen = [], set()
+        for index in top[np.argsort(-scores[top])]:
+            chunk, score = chunks[index], float(scores[index])
+            if score < min_score or chunk is None:
+                break
+            if chunk['project_id'] in seen or chunk['project_id'] == exclude_project:
+                continue
+            seen.add(chunk['project_id'])
+            results.append(dict(chunk, score=round(score, 4)))
+            if len(results) == k:
+                break
+        return results
+
+    def start_background_refresh(self, load_projects, interval_seconds: int = 3600):
+        """Rebuild from load_projects() now and then every interval, on a daemon thread (one per index)"""
+        with self._lock:
+            if self._refresh_thread is not None:
+                return self._refresh_thread
+
+        def loop():
+            while True:
+                try:
+                    self.rebuild(load_projects())
+                except Exception as e:
+                    logger.error(f"Plan index rebuild failed: {str(e)}")
+                stop.wait(interval_seconds)
+
+        stop = threading.Event()
+        thread = threading.Thread(target=loop, name='plan-index-refresh', daemon=True)
+        thread.stop = stop
+        with self._lock:
+            if self._refresh_thread is not None:
+                return self._refresh_thread
+            self._refresh_thread = thread
+        thread.start()
+        return thread
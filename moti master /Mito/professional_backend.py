@@ -12,10 +12,16 @@ from flask_cors import CORS
 import openai
 import os
 import json
+import base64
 import requests
 from datetime import datetime
 import logging
 from werkzeug.middleware.proxy_fix import ProxyFix
+from streaming_json import parse_tolerant
+from tool_planner import ToolGraph
+from intent_classifier import IntentClassifier
+from weather_service import WeatherService
+from image_jobs import ImageJobQueue, QueueFull
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -55,6 +61,9 @@ class AIOperatorEngine:
             'voice_processing': self.process_voice_input,
             'document_formatting': self.format_document
         }
+        self.intent_classifier = IntentClassifier()
+        self.weather = WeatherService()
+        self.image_jobs = ImageJobQueue(self._render_image, variant='dall-e-3:1024x1024')
         
     def process_user_request(self, user_intent, location=None, preferences=None):
         """
@@ -69,18 +78,22 @@ class AIOperatorEngine:
             dict: Processing results with AI decisions and outputs
         """
         try:
-            # AI intent analysis
-            intent_analysis = self._analyze_user_intent(user_intent)
+            graph = ToolGraph()
+            graph.add('intent', lambda results: self._analyze_user_intent(user_intent))
+            if location:
+                # Fetched alongside intent analysis; used only if the intent calls for it
+                graph.add('weather', lambda results: self.integrate_weather_data(location), speculative=True)
+            self._plan_tools(graph, user_intent, preferences)
+            results = graph.run()
             
-            # Weather context if location provided
-            weather_context = ""
-            if location and intent_analysis.get('requires_weather', False):
-                weather_context = self.integrate_weather_data(location)
-            
-            # Execute selected tools
-            execution_results = self._execute_tool_sequence(
-                intent_analysis, user_intent, weather_context, preferences
-            )
+            intent_analysis = results['intent']
+            weather_context = self._weather_for(results)
+            execution_results = {tool: results[tool] for tool in ('content', 'image') if tool in results}
+            if 'image' in execution_results:
+                # 'image' stays a URL (None until the job finishes); the job is there to poll
+                job = execution_results['image']
+                execution_results['image_job'] = job
+                execution_results['image'] = job['image_url'] if job else None
             
             return {
                 'success': True,
@@ -99,6 +112,10 @@ class AIOperatorEngine:
             }
     
     def _analyze_user_intent(self, user_intent):
+        """Analyze user intent locally, asking OpenAI only when the request is ambiguous"""
+        return self.intent_classifier.decide(user_intent, self._analyze_intent_with_llm)
+    
+    def _analyze_intent_with_llm(self, user_intent):
         """Analyze user intent using OpenAI"""
         analysis_prompt = f"""
         Analyze this user request and determine the appropriate response strategy:
@@ -121,41 +138,67 @@ class AIOperatorEngine:
         }}
         """
         
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": analysis_prompt}],
-                max_tokens=150,
-                temperature=0.1
-            )
-            
-            return json.loads(response.choices[0].message.content.strip())
-            
-        except json.JSONDecodeError:
-            # Fallback analysis
-            return {
-                "primary_action": "content",
-                "content_type": "story",
-                "requires_weather": False,
-                "complexity": "moderate",
-                "estimated_tokens": 500
-            }
-    
-    def _execute_tool_sequence(self, analysis, user_intent, weather_context, preferences):
-        """Execute the determined sequence of AI tools"""
-        results = {}
+        # Fallback analysis
+        fallback = {
+            "primary_action": "content",
+            "content_type": "story",
+            "requires_weather": False,
+            "complexity": "moderate",
+            "estimated_tokens": 500
+        }
         
-        # Content generation
-        if analysis['primary_action'] in ['content', 'both']:
-            enhanced_prompt = self._enhance_prompt(user_intent, weather_context, preferences)
-            results['content'] = self.generate_content(enhanced_prompt, analysis['content_type'])
+        response = openai.ChatCompletion.create(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": analysis_prompt}],
+            max_tokens=150,
+            temperature=0.1
+        )
+        
+        # Fenced, truncated or slightly malformed JSON is repaired rather than discarded
+        analysis = parse_tolerant(response.choices[0].message.content.strip())
+        if not isinstance(analysis, dict):
+            return dict(fallback, decided_by='fallback')
+        return dict(fallback, **analysis)
+    
+    @staticmethod
+    def _weather_for(results):
+        if results['intent'].get('requires_weather', False):
+            return results.get('weather', "")
+        return ""
+    
+    def _plan_tools(self, graph, user_intent, preferences):
+        """
+        Add the AI tools selected by the intent analysis to the tool graph
         
-        # Image generation
-        if analysis['primary_action'] in ['image', 'both']:
-            image_prompt = self._create_image_prompt(user_intent, results.get('content'))
-            results['image'] = self.generate_image(image_prompt)
+        Content waits for weather only when the intent needs it. The image
+        prompt does not use the generated text, so for "both" the image job
+        is queued alongside content generation rather than after it; the
+        response carries the job for the client to poll.
+        """
+        def action(results):
+            # Analysis requests are answered as written content
+            primary = results['intent']['primary_action']
+            return 'content' if primary == 'analysis' else primary
         
-        return results
+        graph.add(
+            'content',
+            lambda results: self.generate_content(
+                self._enhance_prompt(user_intent, self._weather_for(results), preferences),
+                results['intent']['content_type']
+            ),
+            deps=('intent',),
+            extra_deps=lambda results: ('weather',) if results['intent'].get('requires_weather', False) else (),
+            when=lambda results: action(results) in ['content', 'both']
+        )
+        graph.add(
+            'image',
+            lambda results: self._queue_image(
+                self._create_image_prompt(user_intent, with_content=action(results) == 'both')
+            ),
+            deps=('intent',),
+            when=lambda results: action(results) in ['image', 'both']
+        )
+        return graph
     
     def _enhance_prompt(self, base_prompt, weather_context, preferences):
         """Enhance user prompt with context and preferences"""
@@ -170,10 +213,10 @@ class AIOperatorEngine:
         
         return enhanced
     
-    def _create_image_prompt(self, user_intent, generated_content=None):
+    def _create_image_prompt(self, user_intent, with_content=False):
         """Create optimized prompt for image generation"""
-        if generated_content:
-            # Extract key visual elements from generated content
+        if with_content:
+            # Illustration accompanying generated content
             visual_prompt = f"Create professional illustration based on: {user_intent}. Style: high-quality digital art, detailed, professional composition."
         else:
             visual_prompt = f"Professional illustration: {user_intent}. High-quality digital art style, detailed composition, vibrant colors."
@@ -210,46 +253,32 @@ class AIOperatorEngine:
             return f"Content generation temporarily unavailable. Error: {str(e)}"
     
     def generate_image(self, prompt):
-        """Generate images using OpenAI DALL-E"""
+        """Queue image generation; returns the job, already completed for a previously seen prompt"""
+        return self.image_jobs.submit(prompt)
+    
+    def _queue_image(self, prompt):
+        """Image job for the AI operator; no image rather than a failed request when the queue is full"""
         try:
-            response = openai.Image.create(
-                prompt=prompt,
-                n=1,
-                size="1024x1024",
-                model="dall-e-3"
-            )
-            
-            return response.data[0].url
-            
-        except Exception as e:
-            logger.error(f"Image generation error: {str(e)}")
+            return self.generate_image(prompt)
+        except QueueFull as e:
+            logger.warning(f"Image generation skipped: {str(e)}")
             return None
     
+    def _render_image(self, prompt):
+        """Generate images using OpenAI DALL-E (runs on an image job worker)"""
+        response = openai.Image.create(
+            prompt=prompt,
+            n=1,
+            size="1024x1024",
+            model="dall-e-3",
+            response_format="b64_json"
+        )
+        
+        return base64.b64decode(response.data[0].b64_json)
+    
     def integrate_weather_data(self, location):
-        """Integrate weather data from NOAA API"""
-        try:
-            lat = location.get('lat', 40.7128)
-            lon = location.get('lon', -74.0060)
-            
-            # NOAA Weather API integration
-            points_url = f"https://api.weather.gov/points/{lat},{lon}"
-            points_response = requests.get(points_url, timeout=10)
-            
-            if points_response.status_code == 200:
-                forecast_url = points_response.json()['properties']['forecast']
-                weather_response = requests.get(forecast_url, timeout=10)
-                
-                if weather_response.status_code == 200:
-                    weather_data = weather_response.json()
-                    current_period = weather_data['properties']['periods'][0]
-                    
-                    return f"Current weather: {current_period['shortForecast']}, {current_period['temperature']}°F. "
-            
-            return ""
-            
-        except Exception as e:
-            logger.error(f"Weather integration error: {str(e)}")
-            return ""
+        """Integrate weather data from NOAA API (grid and forecast lookups are cached)"""
+        return self.weather.context_for(location)
     
     def process_voice_input(self, audio_data):
         """Process voice input using OpenAI Whisper"""
@@ -354,14 +383,20 @@ def generate_image_endpoint():
                 'error': 'Image prompt required'
             }), 400
         
-        image_url = ai_operator.generate_image(prompt)
+        job = ai_operator.generate_image(prompt)
         
         return jsonify({
             'success': True,
-            'image_url': image_url,
+            'job': job,
+            'image_url': job['image_url'],
             'timestamp': datetime.now().isoformat()
-        })
+        }), 200 if job['status'] == 'completed' else 202
         
+    except QueueFull as e:
+        return jsonify({
+            'success': False,
+            'error': 'Image generation is busy, please retry shortly'
+        }), 429
     except Exception as e:
         logger.error(f"Image generation endpoint error: {str(e)}")
         return jsonify({
@@ -369,6 +404,23 @@ def generate_image_endpoint():
             'error': 'Image generation failed'
         }), 500
 
+@app.route('/api/image-jobs/<job_id>', methods=['GET'])
+def image_job_status(job_id):
+    """Image job status; ?wait=N blocks up to N seconds (max 30) for the job to finish"""
+    wait = min(request.args.get('wait', 0, type=float), 30)
+    job = ai_operator.image_jobs.wait(job_id, wait) if wait > 0 else ai_operator.image_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Image job not found'
+        }), 404
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/images/<path:filename>')
+def generated_image(filename):
+    """Serve a generated image or thumbnail from the local image store"""
+    return send_from_directory(ai_operator.image_jobs.store.root, filename, max_age=31536000)
+
 @app.route('/api/weather-enhanced-content', methods=['POST'])
 def weather_enhanced_content():
     """Weather-enhanced content generation"""
@@ -419,7 +471,8 @@ def platform_status():
             'content_generation': 'active',
             'image_generation': 'active',
             'weather_integration': 'active'
-        }
+        },
+        'intent_routing': ai_operator.intent_classifier.stats()
     })
 
 # Error Handlers
@@ -0,0 +1,162 @@
+"""
+MitoAI Platform - Project Context Compaction
+Creator: Daniel Guzman
+Contact: guzman.daniel@outlook.com
+Copyright: 2025 Daniel Guzman - All Rights Reserved
+
+NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
+
+Budgeted phase prompts built from rolling summaries and relevant plan sections
+"""
+
+import json
+import re
+from typing import Dict, List, Optional
+
+PROJECT_BRIEF_FIELDS = ('project_name', 'project_description', 'industry', 'timeline', 'budget',
+                        'objectives', 'constraints', 'stakeholders')
+SUMMARY_FIELDS = ('summary', 'key_decisions', 'decisions', 'deliverables', 'risks',
+                  'open_issues', 'next_phase', 'next_steps')
+WORD = re.compile(r"[a-z0-9]{3,}")
+# Fixed instructions, sent with the system prompt so they share its cached prefix
+PHASE_INSTRUCTIONS = """Execute the project phase given by the user.
+
+INPUT
+The user message holds, in order of importance: PHASE INSTRUCTIONS (what this
+phase must produce), CURRENT PHASE (its id, name, depends_on and planned
+deliverables), PROJECT BRIEF, COMPLETED DEPENDENCY sections with summaries of the
+phases this one builds on, PLAN sections relevant to this phase, and EARLIER PHASE
+summaries of other finished work. Earlier phases are given only as summaries; treat
+their decisions as settled unless this phase's instructions explicitly reopen them.
+
+WORKING RULES
+- Stay inside the scope of the current phase. Work that belongs to a later phase is
+  named in next_phase or risks, not carried out here.
+- Make every deliverable concrete: a document outline with its sections, a schedule
+  with dates or week numbers, a budget with line items and amounts, a checklist with
+  owners. Avoid generic advice that would fit any project.
+- Respect the brief's constraints (timeline, budget, regulation, stakeholders). When
+  an instruction conflicts with a constraint, follow the constraint and record the
+  conflict under risks.
+- State assumptions you had to make in key_decisions, with the reason, so later
+  phases can rely on them.
+- Use the units and currency of the brief; default to weeks and USD.
+- If the information given is not enough to finish the phase, deliver what can be
+  done, and list what is missing under risks with severity "high".
+
+OUTPUT
+Respond with a single JSON object and nothing else: no prose before or after it and
+no code fences. Use exactly these keys:
+- "summary": three to five sentences on what the phase produced and decided, written
+  so that a later phase can rely on it without seeing the full output.
+- "deliverables": list of objects {"name", "description", "content"}, where content
+  holds the deliverable itself (text, or nested objects and lists for tables).
+- "key_decisions": list of objects {"decision", "rationale", "owner"}.
+- "risks": list of objects {"risk", "severity" ("low", "medium" or "high"),
+  "likelihood" ("low", "medium" or "high"), "mitigation"}.
+- "next_phase": the id of the phase that should follow, or null when the plan is
+  complete.
+- "status": "completed", or "blocked" when missing information prevented the phase's
+  main deliverable.
+Strings use plain text without markdown. Numbers are JSON numbers, not strings.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) good enough for budgeting"""
+    return len(text) // 4 + 1
+
+
+def compact_json(value) -> str:
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    limit = tokens * 4
+    return text if len(text) <= limit else text[:max(limit - 3, 0)] + '...'
+
+
+class ProjectContext:
+    """
+    Builds a phase prompt that stays near budget_tokens however far a project has progressed
+
+    Completed phases are carried as short summaries (written once when the
+    phase finishes) rather than full outputs, and only the plan sections
+    that mention the current phase's terms are included. Sections are added
+    in priority order until the budget is spent: instructions, current
+    phase, project brief, dependency summaries, relevant plan sections,
+    then the most recent other summaries.
+    """
+
+    def __init__(self, budget_tokens: int = 3000, summary_tokens: int = 150, brief_tokens: int = 400):
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.brief_tokens = brief_tokens
+
+    def summarize(self, output) -> str:
+        """Short digest of a phase result, kept with the project and reused by later phases"""
+        if isinstance(output, dict):
+            content = output.get('result', output)
+            if isinstance(content, dict):
+                picked = {field: content[field] for field in SUMMARY_FIELDS if content.get(field)}
+                text = compact_json(picked or content)
+            else:
+                text = str(content)
+        else:
+            text = str(output)
+        return truncate_to_tokens(' '.join(text.split()), self.summary_tokens)
+
+    @staticmethod
+    def _terms(value) -> set:
+        return set(WORD.findall(compact_json(value).lower()))
+
+    def relevant_sections(self, project_plan: Dict, phase: Dict, skip: List[str] = ()) -> List[tuple]:
+        """Plan sections (other than phases) ranked by term overlap with the current phase"""
+        phase_terms = self._terms(phase)
+        ranked = []
+        for name, section in project_plan.items():
+            if name in skip or name == 'phases' or section in (None, '', [], {}):
+                continue
+            overlap = len(phase_terms & self._terms({name: section}))
+            if overlap:
+                ranked.append((overlap, name, section))
+        ranked.sort(key=lambda item: -item[0])
+        return [(name, section) for _, name, section in ranked]
+
+    def build_phase_prompt(self, project_data: Dict, project_plan: Dict, phase_instructions: Dict,
+                           phase_summaries: Optional[Dict[str, str]] = None) -> str:
+        instructions = {key: value for key, value in phase_instructions.items()
+                        if key not in ('phase', 'dependency_results', 'phase_summaries')}
+        phase = phase_instructions.get('phase') or {
+            'id': project_plan.get('current_phase'), 'instructions': instructions
+        }
+        summaries = dict(phase_summaries or phase_instructions.get('phase_summaries') or {})
+        dependencies = phase.get('depends_on') or []
+
+        sections = [
+            ('PHASE INSTRUCTIONS', compact_json(instructions)),
+            ('CURRENT PHASE', compact_json({key: value for key, value in phase.items() if key != 'instructions'})),
+            ('PROJECT BRIEF', truncate_to_tokens(compact_json(
+                {field: project_data[field] for field in PROJECT_BRIEF_FIELDS if field in project_data}
+            ), self.brief_tokens)),
+        ]
+        for dep in dependencies:
+            if dep in summaries:
+                sections.append((f'COMPLETED DEPENDENCY {dep}', summaries.pop(dep)))
+        for name, section in self.relevant_sections(project_plan, phase, skip=('current_phase',)):
+            sections.append((f'PLAN: {name}', compact_json(section)))
+        for phase_id in reversed(list(summaries)):
+            sections.append((f'EARLIER PHASE {phase_id}', summaries[phase_id]))
+
+        parts, used = [], 0
+        for title, body in sections:
+            block = f"{title}:\n{body}"
+            cost = estimate_tokens(block)
+            if used + cost > self.budget_tokens:
+                if parts:
+                    continue
+                block, cost = truncate_to_tokens(block, self.budget_tokens), self.budget_tokens
+            parts.append(block)
+            used += cost
+
+        return "\n\n".join(parts)
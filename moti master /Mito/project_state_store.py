@@ -0,0 +1,242 @@
+"""
+MitoAI Platform - Project State Store
+Creator: Daniel Guzman
+Contact: guzman.daniel@outlook.com
+Copyright: 2025 Daniel Guzman - All Rights Reserved
+
+NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
+
+Shared project state for the AI project manager engine
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+import psycopg2
+from psycopg2.extras import Json
+
+logger = logging.getLogger(__name__)
+
+PROJECTS_DDL = """
+    CREATE TABLE IF NOT EXISTS pm_projects (
+        project_id VARCHAR(36) PRIMARY KEY,
+        industry VARCHAR(100) NOT NULL,
+        status VARCHAR(50) NOT NULL,
+        project_data JSONB NOT NULL,
+        project_plan JSONB NOT NULL,
+        phase_results JSONB NOT NULL DEFAULT '{}',
+        created_at TIMESTAMP NOT NULL,
+        last_updated TIMESTAMP NOT NULL
+    )
+"""
+# Deletes the run lock only if this runner still holds it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+# Extends the run lock only if this runner still holds it
+REFRESH_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+PROJECT_FIELDS = ('project_id', 'industry', 'status', 'project_data', 'project_plan',
+                  'phase_results', 'created_at', 'last_updated')
+
+
+class ProjectStateStore:
+    """
+    Project records shared by every worker
+
+    Postgres is the source of truth. Each save also writes the serialized
+    record to Redis, and the worker keeps a bounded LRU of recently used
+    records for hot_ttl seconds, so a status read is normally one local hit
+    and at worst one Redis GET. Records are plain JSON, shared between
+    readers, so callers copy before changing them; the engine looks the
+    manager up by industry. Saves merge phase_results by phase id instead
+    of replacing them, so concurrent writers of different phases keep
+    each other's results. The table is created on construction. A Redis
+    lease per project (acquire_run_lock) keeps two workers from running
+    the same project's phases at once.
+    """
+
+    def __init__(self, database_url: str, redis_client, hot_size: int = 1000,
+                 hot_ttl: float = 2.0, redis_ttl: int = 86400):
+        self.database_url = database_url
+        self.redis = redis_client
+        self.hot_size = hot_size
+        self.hot_ttl = hot_ttl
+        self.redis_ttl = redis_ttl
+        self._hot = OrderedDict()
+        self._lock = threading.Lock()
+        self._release_lock = redis_client.register_script(RELEASE_LOCK_SCRIPT)
+        self._refresh_lock = redis_client.register_script(REFRESH_LOCK_SCRIPT)
+        self.initialize()
+
+    def initialize(self):
+        conn = psycopg2.connect(self.database_url)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(PROJECTS_DDL)
+            cursor.execute("ALTER TABLE pm_projects ADD COLUMN IF NOT EXISTS phase_results JSONB NOT NULL DEFAULT '{}'")
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _from_row(row) -> Dict:
+        record = dict(zip(PROJECT_FIELDS, row))
+        record['created_at'] = record['created_at'].isoformat()
+        record['last_updated'] = record['last_updated'].isoformat()
+        return record
+
+    @staticmethod
+    def cache_key(project_id: str) -> str:
+        return f"pm:project:{project_id}"
+
+    @staticmethod
+    def run_lock_key(project_id: str) -> str:
+        return f"pm:run-lock:{project_id}"
+
+    def acquire_run_lock(self, project_id: str, ttl: int = 300) -> Optional[str]:
+        """Lease the project for one run; returns the lease token, or None when another run holds it"""
+        token = uuid.uuid4().hex
+        if self.redis.set(self.run_lock_key(project_id), token, nx=True, ex=ttl):
+            return token
+        return None
+
+    def refresh_run_lock(self, project_id: str, token: str, ttl: int = 300) -> bool:
+        """Extend a held lease; False when it expired and may belong to another run now"""
+        return bool(self._refresh_lock(keys=[self.run_lock_key(project_id)], args=[token, ttl]))
+
+    def release_run_lock(self, project_id: str, token: str):
+        try:
+            self._release_lock(keys=[self.run_lock_key(project_id)], args=[token])
+        except Exception as e:
+            # The lease expires on its own after ttl seconds
+            logger.warning(f"Run lock release failed for {project_id}: {str(e)}")
+
+    def _remember(self, record: Dict):
+        with self._lock:
+            self._hot[record['project_id']] = (record, time.monotonic() + self.hot_ttl)
+            self._hot.move_to_end(record['project_id'])
+            while len(self._hot) > self.hot_size:
+                self._hot.popitem(last=False)
+
+    def save(self, record: Dict) -> Dict:
+        """Upsert a project record and refresh both cache layers; returns it with the merged phase_results"""
+        record = dict(record, last_updated=datetime.now().isoformat())
+        conn = psycopg2.connect(self.database_url)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO pm_projects (project_id, industry, status, project_data, project_plan,
+                                         phase_results, created_at, last_updated)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (project_id) DO UPDATE SET
+                    status = EXCLUDED.status,
+                    project_data = EXCLUDED.project_data,
+                    project_plan = EXCLUDED.project_plan,
+                    phase_results = pm_projects.phase_results || EXCLUDED.phase_results,
+                    last_updated = EXCLUDED.last_updated
+                RETURNING phase_results
+            """, (record['project_id'], record['industry'], record['status'],
+                  Json(record['project_data']), Json(record['project_plan']),
+                  Json(record.get('phase_results') or {}), record['created_at'], record['last_updated']))
+            record['phase_results'] = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+
+        try:
+            self.redis.set(self.cache_key(record['project_id']), json.dumps(record), ex=self.redis_ttl)
+        except Exception as e:
+            logger.warning(f"Project cache write failed for {record['project_id']}: {str(e)}")
+            try:
+                # Without a cached copy other workers read the new row from Postgres
+                self.redis.delete(self.cache_key(record['project_id']))
+            except Exception:
+                pass
+        self._remember(record)
+        return record
+
+    def get(self, project_id: str) -> Optional[Dict]:
+        """Project record from the hot set, Redis or Postgres, in that order"""
+        with self._lock:
+            entry = self._hot.get(project_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._hot.move_to_end(project_id)
+                return entry[0]
+
+        try:
+            cached = self.redis.get(self.cache_key(project_id))
+        except Exception as e:
+            logger.warning(f"Project cache read failed for {project_id}: {str(e)}")
+            cached = None
+        if cached:
+            record = json.loads(cached)
+            self._remember(record)
+            return record
+
+        conn = psycopg2.connect(self.database_url)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {', '.join(PROJECT_FIELDS)} FROM pm_projects WHERE project_id = %s",
+                           (project_id,))
+            row = cursor.fetchone()
+            cursor.close()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+
+        record = self._from_row(row)
+        try:
+            self.redis.set(self.cache_key(project_id), json.dumps(record), ex=self.redis_ttl)
+        except Exception:
+            pass
+        self._remember(record)
+        return record
+
+    def iter_projects(self, batch_size: int = 500) -> Iterator[Dict]:
+        """Every stored project, in the same shape as get(), read in keyset-paginated batches from Postgres"""
+        last_id = ''
+        while True:
+            conn = psycopg2.connect(self.database_url)
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT {', '.join(PROJECT_FIELDS)} FROM pm_projects
+                    WHERE project_id > %s ORDER BY project_id LIMIT %s
+                """, (last_id, batch_size))
+                rows = cursor.fetchall()
+                cursor.close()
+            finally:
+                conn.close()
+            for row in rows:
+                yield self._from_row(row)
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    def count_active(self) -> int:
+        conn = psycopg2.connect(self.database_url)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM pm_projects WHERE status = 'active'")
+            count = cursor.fetchone()[0]
+            cursor.close()
+            return count
+        finally:
+            conn.close()
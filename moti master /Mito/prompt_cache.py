@@ -0,0 +1,147 @@
+"""
+MitoAI Platform - Prompt Prefix Caching
+Creator: Daniel Guzman
+Contact: guzman.daniel@outlook.com
+Copyright: 2025 Daniel Guzman - All Rights Reserved
+
+NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
+
+Static-prefix-first chat requests with provider prompt caching and hit tracking
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Providers reuse a cached prefix only when it is byte-identical and at least this long
+MIN_CACHEABLE_TOKENS = 1024
+
+
+def _field(value, key):
+    return value.get(key) if hasattr(value, 'get') else getattr(value, key, None)
+
+
+def _usage_field(usage, *path):
+    for key in path:
+        if usage is None:
+            return 0
+        usage = _field(usage, key)
+    return usage or 0
+
+
+class PromptCache:
+    """
+    Sends chat completions as [static system prefix, dynamic user suffix] and tracks cache hits
+
+    The static part (persona plus fixed task instructions) always comes
+    first and is byte-identical between calls, so OpenAI can serve it from
+    its automatic prefix cache and bill only the dynamic suffix;
+    prompt_cache_key routes calls sharing a prefix to the same cache.
+    Prefixes shorter than MIN_CACHEABLE_TOKENS are never cached, so they
+    are sent plainly and only counted, not tracked. Per cacheable prefix we
+    record calls, prompt and cached tokens, and latency split by hit and
+    miss; for streamed calls latency is the time to the first chunk and
+    usage comes from the final usage chunk.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, Dict] = {}
+        self._uncacheable_calls = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def prefix_key(static_prompt: str) -> str:
+        return hashlib.sha256(static_prompt.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def messages(static_prompt: str, dynamic_prompt: str) -> List[Dict]:
+        return [{'role': 'system', 'content': static_prompt}, {'role': 'user', 'content': dynamic_prompt}]
+
+    def create(self, client, static_prompt: str, dynamic_prompt: str, name: str = None, **params):
+        """ChatCompletion.create with the static prefix first"""
+        prefix_tokens = len(static_prompt) // 4
+        if prefix_tokens < MIN_CACHEABLE_TOKENS:
+            with self._lock:
+                self._uncacheable_calls += 1
+            return client.ChatCompletion.create(messages=self.messages(static_prompt, dynamic_prompt), **params)
+
+        key = self.prefix_key(static_prompt)
+        params.setdefault('prompt_cache_key', key)
+        if params.get('stream'):
+            params.setdefault('stream_options', {'include_usage': True})
+        started = time.monotonic()
+        response = client.ChatCompletion.create(messages=self.messages(static_prompt, dynamic_prompt), **params)
+        if params.get('stream'):
+            return self._recorded_stream(response, key, name, prefix_tokens, started)
+        self._record_usage(key, name, prefix_tokens, time.monotonic() - started, _field(response, 'usage'))
+        return response
+
+    def _recorded_stream(self, response, key: str, name: str, prefix_tokens: int, started: float):
+        """Pass the stream through, recording it once its usage chunk arrives"""
+        latency = None
+        for chunk in response:
+            if latency is None:
+                latency = time.monotonic() - started
+            usage = _field(chunk, 'usage')
+            if usage:
+                self._record_usage(key, name, prefix_tokens, latency, usage)
+            # The usage chunk carries no choices, which callers index into
+            if _field(chunk, 'choices'):
+                yield chunk
+
+    def _record_usage(self, key: str, name: str, prefix_tokens: int, latency: float, usage):
+        self.record(key, name, prefix_tokens, latency, _usage_field(usage, 'prompt_tokens'),
+                    _usage_field(usage, 'prompt_tokens_details', 'cached_tokens'))
+
+    def record(self, key: str, name: str, prefix_tokens: int, latency: float, prompt_tokens: int,
+               cached_tokens: int):
+        with self._lock:
+            stats = self._stats.setdefault(key, {
+                'name': name, 'prefix_tokens': prefix_tokens, 'calls': 0, 'hits': 0,
+                'prompt_tokens': 0, 'cached_tokens': 0, 'hit_latency': 0.0, 'miss_latency': 0.0
+            })
+            stats['calls'] += 1
+            stats['prompt_tokens'] += prompt_tokens
+            stats['cached_tokens'] += cached_tokens
+            if cached_tokens:
+                stats['hits'] += 1
+                stats['hit_latency'] += latency
+            else:
+                stats['miss_latency'] += latency
+
+    def stats(self) -> Dict:
+        """Hit rates and estimated latency saved, per prefix and overall"""
+        with self._lock:
+            snapshot = {key: dict(stats) for key, stats in self._stats.items()}
+
+        prefixes, totals = [], {'calls': 0, 'hits': 0, 'prompt_tokens': 0, 'cached_tokens': 0,
+                                'latency_saved_seconds': 0.0}
+        for key, stats in snapshot.items():
+            misses = stats['calls'] - stats['hits']
+            hit_avg = stats['hit_latency'] / stats['hits'] if stats['hits'] else None
+            miss_avg = stats['miss_latency'] / misses if misses else None
+            saved = (miss_avg - hit_avg) * stats['hits'] if hit_avg is not None and miss_avg is not None else 0.0
+            prefixes.append({
+                'prefix': key,
+                'name': stats['name'],
+                'calls': stats['calls'],
+                'hit_rate': round(stats['hits'] / stats['calls'], 4),
+                'cached_token_ratio': round(stats['cached_tokens'] / max(stats['prompt_tokens'], 1), 4),
+                'avg_hit_latency_ms': round(hit_avg * 1000, 1) if hit_avg is not None else None,
+                'avg_miss_latency_ms': round(miss_avg * 1000, 1) if miss_avg is not None else None,
+                'latency_saved_seconds': round(saved, 3)
+            })
+            for field in ('calls', 'hits', 'prompt_tokens', 'cached_tokens'):
+                totals[field] += stats[field]
+            totals['latency_saved_seconds'] += saved
+
+        totals['hit_rate'] = round(totals['hits'] / max(totals['calls'], 1), 4)
+        totals['latency_saved_seconds'] = round(totals['latency_saved_seconds'], 3)
+        with self._lock:
+            totals['uncacheable_calls'] = self._uncacheable_calls
+        return {'totals': totals,
+                'prefixes': sorted(prefixes, key=lambda item: -item['calls'])}
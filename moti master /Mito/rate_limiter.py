@@ -0,0 +1 @@
+../mito_final/rate_limiter.py
\ No newline at end of file
@@ -8,11 +8,12 @@ SIMPLIFIED VERSION FOR 5 WEEKS CODING EXPERIENCE
 This is much easier to understand and implement
 """
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, send_from_directory
 import openai
 import os
 from datetime import datetime
 import json
+from image_jobs import ImageJobQueue
 
 # Simple Flask app setup
 app = Flask(__name__)
@@ -59,18 +60,19 @@ class SimpleAI:
                 "error": str(e)
             }
     
+    def __init__(self):
+        # Images are made in the background; the same prompt twice reuses the saved image
+        self.image_jobs = ImageJobQueue(self.draw_image, variant="1024x1024")
+    
     def generate_image(self, prompt):
-        """Generate image using DALL-E"""
+        """Start making an image - returns a job you can check on"""
         try:
-            response = openai.Image.create(
-                prompt=f"Professional, high-quality: {prompt}",
-                n=1,
-                size="1024x1024"
-            )
+            job = self.image_jobs.submit(f"Professional, high-quality: {prompt}")
             
             return {
                 "success": True,
-                "image_url": response.data[0].url
+                "job": job,
+                "image_url": job["image_url"]  # Already filled in if this prompt was used before
             }
             
         except Exception as e:
@@ -78,6 +80,16 @@ class SimpleAI:
                 "success": False,
                 "error": str(e)
             }
+    
+    def draw_image(self, prompt):
+        """Generate image using DALL-E (the job queue saves it locally)"""
+        response = openai.Image.create(
+            prompt=prompt,
+            n=1,
+            size="1024x1024"
+        )
+        
+        return response.data[0].url
 
 # Create AI helper
 ai_helper = SimpleAI()
@@ -136,6 +148,21 @@ def generate_image():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/image-jobs/<job_id>', methods=['GET'])
+def image_job_status(job_id):
+    """Check if an image is ready - SIMPLE VERSION"""
+    job = ai_helper.image_jobs.get(job_id)
+    
+    if job is None:
+        return jsonify({"error": "Image job not found"}), 404
+    
+    return jsonify({"success": True, "job": job})
+
+@app.route('/api/images/<path:filename>')
+def generated_image(filename):
+    """Show a saved image"""
+    return send_from_directory(ai_helper.image_jobs.store.root, filename)
+
 @app.route('/api/create-business-plan', methods=['POST'])
 def create_business_plan():
     """Create business plan - SIMPLE VERSION"""
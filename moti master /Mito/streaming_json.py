@@ -0,0 +1,206 @@
+"""
+MitoAI Platform - Streaming JSON Parsing
+Creator: Daniel Guzman
+Contact: guzman.daniel@outlook.com
+Copyright: 2025 Daniel Guzman - All Rights Reserved
+
+NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
+
+Incremental, tolerant parsing of model output that is meant to be JSON
+"""
+
+import json
+import logging
+import re
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSERS = {'{': '}', '[': ']'}
+TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+# A string literal (possibly cut off) is matched whole, so literals are only replaced outside strings
+PYTHON_LITERALS = re.compile(r'"(?:[^"\\]|\\.)*"?|\b(True|False|None)\b')
+LITERAL_FIX = {'True': 'true', 'False': 'false', 'None': 'null'}
+
+
+def _scan(text: str):
+    """Open containers and whether a string is unterminated at the end of text"""
+    stack = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in CLOSERS:
+            stack.append(char)
+        elif char in '}]' and stack:
+            stack.pop()
+    return stack, in_string
+
+
+def repair_json(text: str) -> str:
+    """
+    Best-effort fix-up of almost-JSON from a model
+
+    Drops prose and code fences around the payload, Python literals,
+    trailing commas, and closes an unterminated string and any containers
+    left open by a truncated completion.
+    """
+    starts = [index for index in (text.find('{'), text.find('[')) if index >= 0]
+    if not starts:
+        return text.strip()
+    text = text[min(starts):]
+    fence = text.rfind('```')
+    if fence > 0:
+        text = text[:fence]
+    text = PYTHON_LITERALS.sub(lambda match: LITERAL_FIX.get(match.group(1), match.group(0)), text).rstrip()
+
+    stack, in_string = _scan(text)
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(',')
+    if text.endswith(':'):
+        text += ' null'
+    text += ''.join(CLOSERS[opener] for opener in reversed(stack))
+    return TRAILING_COMMA.sub(r'\1', text)
+
+
+def parse_tolerant(text: str, default=None):
+    """json.loads, then json.loads after repair_json, then default"""
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return json.loads(repair_json(text))
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Unparseable model JSON ({len(text or '')} chars): {str(e)}")
+        return default
+
+
+def _is_section(value) -> bool:
+    return isinstance(value, str) and bool(value.strip()) or isinstance(value, dict) and bool(value)
+
+
+class _Frame:
+    __slots__ = ('opener', 'start', 'key', 'pending_key', 'expect_key', 'index', 'item_start', 'watched')
+
+    def __init__(self, opener: str, start: int, key, watched: Optional[str]):
+        self.opener = opener
+        self.start = start
+        self.key = key
+        self.pending_key = None
+        self.expect_key = opener == '{'
+        self.index = 0
+        self.item_start = None
+        self.watched = watched
+
+
+class IncrementalJSONParser:
+    """
+    Consumes a JSON document chunk by chunk and reports watched array items as soon as each closes
+
+    sections maps a top-level key (e.g. 'phases') to the name reported for
+    its items (e.g. 'phase'). Every item that passes its validator (by
+    default: a non-empty object or string) is returned from feed() as
+    {'section', 'index', 'value'}. Text before the first '{' or '[' is
+    ignored, so prose or a code fence ahead of the payload is harmless.
+    finish() parses the whole buffer with repair_json.
+    """
+
+    def __init__(self, sections: Dict[str, str], validators: Dict[str, Callable] = None):
+        self.sections = sections
+        self.validators = validators or {}
+        self.buffer = ''
+        self._position = 0
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+
+    def _emit(self, frame: _Frame, end: int, events: List[Dict]):
+        if frame.item_start is None:
+            return
+        raw = self.buffer[frame.item_start:end].strip()
+        frame.item_start = None
+        index, frame.index = frame.index, frame.index + 1
+        if not raw:
+            return
+        value = parse_tolerant(raw)
+        validator = self.validators.get(frame.watched, _is_section)
+        if value is not None and validator(value):
+            events.append({'section': frame.watched, 'index': index, 'value': value})
+        else:
+            logger.warning(f"Discarding invalid {frame.watched} item {index}")
+
+    def feed(self, chunk: str) -> List[Dict]:
+        events = []
+        self.buffer += chunk
+        text = self.buffer
+        for position in range(self._position, len(text)):
+            char = text[position]
+            if not self._started:
+                if char not in CLOSERS:
+                    continue
+                self._started = True
+
+            frame = self._stack[-1] if self._stack else None
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if frame is not None and frame.opener == '{' and frame.expect_key:
+                        frame.pending_key = text[self._string_start + 1:position]
+                continue
+            if char.isspace():
+                continue
+
+            if frame is not None and frame.opener == '[' and frame.watched and frame.item_start is None \
+                    and char not in ',]':
+                frame.item_start = position
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = position
+            elif char in CLOSERS:
+                key = None
+                if frame is not None:
+                    key = frame.pending_key if frame.opener == '{' else frame.index
+                watched = self.sections.get(key) if len(self._stack) == 1 and char == '[' else None
+                self._stack.append(_Frame(char, position, key, watched))
+            elif char in '}]':
+                if frame is None:
+                    continue
+                if frame.watched:
+                    self._emit(frame, position, events)
+                self._stack.pop()
+                parent = self._stack[-1] if self._stack else None
+                if parent is not None and parent.watched and parent.item_start == frame.start:
+                    # A container item is reported at its own closing bracket
+                    self._emit(parent, position + 1, events)
+            elif char == ':' and frame is not None and frame.opener == '{':
+                frame.expect_key = False
+            elif char == ',' and frame is not None:
+                if frame.opener == '{':
+                    frame.expect_key = True
+                    frame.pending_key = None
+                elif frame.watched:
+                    self._emit(frame, position, events)
+                else:
+                    frame.index += 1
+        self._position = len(text)
+        return events
+
+    def finish(self, default=None):
+        """The complete document, repaired if the stream ended early or malformed"""
+        return parse_tolerant(self.buffer, default)
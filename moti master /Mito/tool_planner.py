@@ -0,0 +1,86 @@
+"""
+MitoAI Platform - Tool Planner
+Creator: Daniel Guzman
+Contact: guzman.daniel@outlook.com
+Copyright: 2025 Daniel Guzman - All Rights Reserved
+
+NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
+
+Concurrent execution of AI operator tool calls as a dependency graph
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, Optional
+
+# Shared by every request; tool calls are network-bound, so threads are plenty
+TOOL_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix='tool')
+
+
+class _Task:
+    __slots__ = ('fn', 'deps', 'extra_deps', 'when', 'speculative')
+
+    def __init__(self, fn, deps, extra_deps, when, speculative):
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.extra_deps = extra_deps
+        self.when = when
+        self.speculative = speculative
+
+
+class ToolGraph:
+    """
+    Tool calls started as soon as the results they depend on are in
+
+    Each task is fn(results) -> value, where results holds every finished
+    task's value. deps are known up front; extra_deps(results) can add more
+    once deps are done (e.g. wait for weather only if the intent needs it).
+    A task whose when(results) is false is skipped and counts as done for
+    its dependants. A speculative task is not waited for once nothing
+    left to run depends on it. run() returns the results of the tasks that
+    finished and re-raises the first exception raised by a task.
+    """
+
+    def __init__(self, pool: ThreadPoolExecutor = TOOL_POOL):
+        self.pool = pool
+        self._tasks: Dict[str, _Task] = {}
+
+    def add(self, name: str, fn: Callable[[Dict], object], deps: Iterable[str] = (),
+            extra_deps: Optional[Callable[[Dict], Iterable[str]]] = None,
+            when: Optional[Callable[[Dict], bool]] = None, speculative: bool = False) -> 'ToolGraph':
+        self._tasks[name] = _Task(fn, deps, extra_deps, when, speculative)
+        return self
+
+    def run(self) -> Dict:
+        results, skipped, running = {}, set(), {}
+        pending = dict(self._tasks)
+
+        def settled(names):
+            # A dependency on a task that was never added is already satisfied
+            return all(name in results or name in skipped or name not in self._tasks for name in names)
+
+        while pending or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for name, task in list(pending.items()):
+                    if not settled(task.deps):
+                        continue
+                    if task.extra_deps is not None and not settled(task.extra_deps(results)):
+                        continue
+                    del pending[name]
+                    progressed = True
+                    if task.when is not None and not task.when(results):
+                        skipped.add(name)
+                    else:
+                        running[self.pool.submit(task.fn, dict(results))] = name
+
+            if not pending and all(self._tasks[name].speculative for name in running.values()):
+                break
+            if not running:
+                if pending:
+                    raise ValueError(f"Unresolvable tool dependencies: {', '.join(sorted(pending))}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+        return results
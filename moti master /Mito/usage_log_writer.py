@@ -0,0 +1,328 @@
+"""
+MitoAI Platform - Usage Log Writer
+Creator: Daniel Guzman
+Contact: guzman.daniel@outlook.com
+Copyright: 2025 Daniel Guzman - All Rights Reserved
+
+NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
+
+Buffered usage events and API key counters written off the request path
+"""
+
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict
+
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+USAGE_LOG_COLUMNS = (
+    'id', 'user_id', 'api_key_id', 'project_id', 'endpoint', 'method', 'business_model',
+    'request_data', 'response_data', 'response_time_ms', 'tokens_used', 'cost_estimate',
+    'status_code', 'success', 'error_message', 'ip_address', 'user_agent', 'client_location',
+    'timestamp'
+)
+JSON_COLUMNS = {'request_data', 'response_data', 'client_location'}
+NO_API_KEY = str(uuid.UUID(int=0))
+
+# Rollup table -> bucket truncation, upserted in the same transaction as the raw rows they were flushed with
+ROLLUP_TABLES = {
+    'usage_rollup_hourly': lambda moment: moment.replace(minute=0, second=0, microsecond=0),
+    'usage_rollup_daily': lambda moment: moment.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+ROLLUP_COUNTERS = ('requests', 'successful_requests', 'failed_requests', 'tokens_used',
+                   'cost_estimate', 'response_time_ms_total')
+
+
+class UsageLogWriter:
+    """
+    Per-worker buffer of usage events flushed to usage_logs in bulk
+
+    submit() never touches the database. A daemon thread flushes every
+    flush_interval seconds, or sooner once batch_size events are waiting.
+    Above sample_above (a fraction of capacity) successful events are kept
+    with probability sample_rate; when the buffer is full new events are
+    dropped. Rollup counters are accumulated for every submitted event
+    before sampling or dropping, so the hourly and daily totals stay exact
+    when raw rows are shed. At most `capacity` events can be lost on a
+    crash, and the buffer is flushed on interpreter shutdown. The flush
+    thread starts with the first event in each process, so a writer
+    created before gunicorn forks its workers still flushes in every one;
+    a forked child drops the buffer it inherited, which the parent writes.
+    """
+
+    def __init__(self, connect: Callable, capacity: int = 50000, batch_size: int = 1000,
+                 flush_interval: float = 2.0, sample_above: float = 0.8, sample_rate: float = 0.1):
+        self.connect = connect
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_above = sample_above
+        self.sample_rate = sample_rate
+        self.stats = {'written': 0, 'dropped': 0, 'sampled_out': 0, 'failed_flushes': 0}
+        self._buffer = deque()
+        self._rollups = {table: {} for table in ROLLUP_TABLES}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Locks may have been held by a parent thread that does not exist here
+        self._buffer = deque()
+        self._rollups = {table: {} for table in ROLLUP_TABLES}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, event: Dict) -> bool:
+        """Queue one event; returns False if it was dropped or sampled out"""
+        if self._pid != os.getpid():
+            self.start()
+        event.setdefault('id', uuid.uuid4())
+        event.setdefault('timestamp', datetime.utcnow())
+        with self._lock:
+            self._count(event)
+            depth = len(self._buffer)
+            if depth >= self.capacity:
+                self.stats['dropped'] += 1
+                return False
+            if (depth >= self.capacity * self.sample_above and event.get('success')
+                    and random.random() >= self.sample_rate):
+                self.stats['sampled_out'] += 1
+                return False
+            self._buffer.append(event)
+            depth += 1
+        if depth >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def _row(self, event: Dict):
+        row = []
+        for column in USAGE_LOG_COLUMNS:
+            value = event.get(column)
+            if column in JSON_COLUMNS and value is not None:
+                value = json.dumps(value, default=str)
+            elif isinstance(value, uuid.UUID):
+                value = str(value)
+            row.append(value)
+        return tuple(row)
+
+    def _count(self, event: Dict):
+        """Add one event to the pending rollup counters; caller holds _lock"""
+        for table, truncate in ROLLUP_TABLES.items():
+            key = (
+                str(event['user_id']),
+                str(event.get('api_key_id') or NO_API_KEY),
+                event.get('business_model') or '',
+                truncate(event['timestamp'])
+            )
+            counters = self._rollups[table].setdefault(key, [0, 0, 0, 0, 0, 0])
+            counters[0] += 1
+            counters[1 if event.get('success') else 2] += 1
+            counters[3] += event.get('tokens_used') or 0
+            counters[4] += event.get('cost_estimate') or 0
+            counters[5] += event.get('response_time_ms') or 0
+
+    def _write_rollups(self, cursor, rollups):
+        updates = ', '.join(f"{column} = {{table}}.{column} + EXCLUDED.{column}" for column in ROLLUP_COUNTERS)
+        for table, totals in rollups.items():
+            if not totals:
+                continue
+            execute_values(
+                cursor,
+                f"INSERT INTO {table} (user_id, api_key_id, business_model, bucket, {', '.join(ROLLUP_COUNTERS)}) "
+                f"VALUES %s ON CONFLICT (user_id, api_key_id, business_model, bucket) "
+                f"DO UPDATE SET {updates.format(table=table)}",
+                [(*key, *counters) for key, counters in sorted(totals.items())],
+                page_size=self.batch_size
+            )
+
+    def _restore_rollups(self, rollups):
+        """Merge unwritten rollup deltas back; they are additive, so order does not matter"""
+        with self._lock:
+            for table, totals in rollups.items():
+                pending = self._rollups[table]
+                for key, counters in totals.items():
+                    merged = pending.setdefault(key, [0, 0, 0, 0, 0, 0])
+                    for index, value in enumerate(counters):
+                        merged[index] += value
+
+    def flush(self) -> int:
+        """Write everything buffered so far; failed batches are requeued while there is room"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                    rollups, self._rollups = self._rollups, {table: {} for table in ROLLUP_TABLES}
+                if not batch and not any(rollups.values()):
+                    return written
+                try:
+                    conn = self.connect()
+                    try:
+                        cursor = conn.cursor()
+                        if batch:
+                            execute_values(
+                                cursor,
+                                f"INSERT INTO usage_logs ({', '.join(USAGE_LOG_COLUMNS)}) VALUES %s",
+                                [self._row(event) for event in batch],
+                                page_size=self.batch_size
+                            )
+                        self._write_rollups(cursor, rollups)
+                        conn.commit()
+                        cursor.close()
+                    finally:
+                        conn.close()
+                except Exception as e:
+                    self.stats['failed_flushes'] += 1
+                    self._restore_rollups(rollups)
+                    with self._lock:
+                        room = self.capacity - len(self._buffer)
+                        requeue = batch[:max(room, 0)]
+                        self._buffer.extendleft(reversed(requeue))
+                        self.stats['dropped'] += len(batch) - len(requeue)
+                    logger.error(f"Usage log flush failed ({len(batch)} events): {str(e)}")
+                    return written
+                written += len(batch)
+                self.stats['written'] += len(batch)
+
+    def start(self):
+        """Start this process's flush thread; submit() calls it on first use"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return self._thread
+            self._pid = os.getpid()
+
+        def loop():
+            while not self._stop.is_set():
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                self.flush()
+
+        self._thread = threading.Thread(target=loop, name='usage-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self._thread
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the flush thread and write out what is left"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+
+class APIKeyCounterWriter:
+    """
+    Write-behind request counters for api_keys rows
+
+    record() only bumps an in-process accumulator. Every flush_interval
+    seconds the accumulated deltas are applied with one additive UPDATE,
+    so a busy key's row is written once per interval per worker instead of
+    once per request. Like UsageLogWriter, the flush thread starts on first
+    use in each process and a forked child starts with no pending deltas.
+    """
+
+    def __init__(self, connect: Callable, flush_interval: float = 10.0):
+        self.connect = connect
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def record(self, api_key_id, success: bool = True, when: datetime = None):
+        if self._pid != os.getpid():
+            self.start()
+        when = when or datetime.utcnow()
+        with self._lock:
+            counts = self._pending.get(api_key_id)
+            if counts is None:
+                counts = self._pending[api_key_id] = [0, 0, 0, when]
+            counts[0] += 1
+            counts[1 if success else 2] += 1
+            if when > counts[3]:
+                counts[3] = when
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        # Sorted so concurrent workers lock rows in the same order
+        rows = [(str(key_id), *counts) for key_id, counts in sorted(pending.items(), key=lambda item: str(item[0]))]
+        try:
+            conn = self.connect()
+            try:
+                cursor = conn.cursor()
+                execute_values(cursor, """
+                    UPDATE api_keys SET
+                        total_requests = COALESCE(total_requests, 0) + delta.total,
+                        successful_requests = COALESCE(successful_requests, 0) + delta.successful,
+                        failed_requests = COALESCE(failed_requests, 0) + delta.failed,
+                        last_used = GREATEST(last_used, delta.last_used)
+                    FROM (VALUES %s) AS delta (id, total, successful, failed, last_used)
+                    WHERE api_keys.id = delta.id::uuid
+                """, rows, template='(%s, %s, %s, %s, %s::timestamp)')
+                conn.commit()
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            # Deltas are additive, so merge them back for the next attempt
+            with self._lock:
+                for key_id, counts in pending.items():
+                    merged = self._pending.setdefault(key_id, [0, 0, 0, counts[3]])
+                    for index in range(3):
+                        merged[index] += counts[index]
+                    merged[3] = max(merged[3], counts[3])
+            logger.error(f"API key counter flush failed ({len(rows)} keys): {str(e)}")
+            return 0
+        return len(rows)
+
+    def start(self):
+        """Start this process's flush thread; record() calls it on first use"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return self._thread
+            self._pid = os.getpid()
+
+        def loop():
+            while not self._stop.wait(self.flush_interval):
+                self.flush()
+
+        self._thread = threading.Thread(target=loop, name='api-key-counters', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self._thread
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
@@ -0,0 +1,178 @@
+"""
+MitoAI Platform - Weather Service
+Creator: Daniel Guzman
+Contact: guzman.daniel@outlook.com
+Copyright: 2025 Daniel Guzman - All Rights Reserved
+
+NO ONE IS AUTHORIZED TO ALTER THIS SOFTWARE UNLESS AUTHORIZED BY DANIEL GUZMAN
+
+Cached NOAA forecast lookups for weather-enhanced requests
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+NOAA_API_BASE_URL = 'https://api.weather.gov'
+WEATHER_CACHE_TIMEOUT = 1800  # 30 minutes
+WEATHER_STALE_TIMEOUT = 6 * 3600
+DEFAULT_LOCATION = (40.7128, -74.0060)
+
+
+class WeatherService:
+    """
+    NOAA forecasts with a two-level cache
+
+    Coordinates are rounded to precision decimal places (0.01 degrees is
+    about 1 km, finer than NOAA's 2.5 km forecast grid), and the bucket's
+    /points lookup is cached for good because the grid mapping never
+    changes. Forecasts are cached per grid for forecast_ttl seconds; up to
+    stale_ttl they are still served while one background refresh runs.
+    Concurrent misses for the same key share a single upstream request,
+    and all requests go through one pooled keep-alive session. Both caches
+    are LRUs bounded by max_grids and max_forecasts, and forecasts older
+    than stale_ttl are dropped when they are next looked up.
+    """
+
+    def __init__(self, base_url: str = NOAA_API_BASE_URL, precision: int = 2,
+                 forecast_ttl: int = WEATHER_CACHE_TIMEOUT, stale_ttl: int = WEATHER_STALE_TIMEOUT,
+                 timeout: int = 10, user_agent: str = 'MitoAI Platform (guzman.daniel@outlook.com)',
+                 max_grids: int = 50000, max_forecasts: int = 10000):
+        self.base_url = base_url
+        self.precision = precision
+        self.forecast_ttl = forecast_ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.max_grids = max_grids
+        self.max_forecasts = max_forecasts
+        self.session = requests.Session()
+        # NOAA rejects requests without an identifying User-Agent
+        self.session.headers.update({'User-Agent': user_agent, 'Accept': 'application/geo+json'})
+        self.session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=1))
+        self._grids: Dict[Tuple[float, float], Optional[str]] = OrderedDict()
+        self._forecasts: Dict[str, Tuple[Dict, float]] = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=16, thread_name_prefix='weather')
+
+    def bucket(self, lat: float, lon: float) -> Tuple[float, float]:
+        return round(float(lat), self.precision), round(float(lon), self.precision)
+
+    def _cache_get(self, cache: OrderedDict, key):
+        with self._lock:
+            if key not in cache:
+                raise KeyError(key)
+            cache.move_to_end(key)
+            return cache[key]
+
+    def _cache_put(self, cache: OrderedDict, key, value, limit: int):
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > limit:
+                cache.popitem(last=False)
+
+    def _single_flight(self, key, fetch):
+        """Run fetch() once for concurrent callers asking for the same key"""
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = self._refresher.submit(fetch)
+        try:
+            return future.result()
+        finally:
+            if owner:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+    def _fetch_json(self, url: str) -> Dict:
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def forecast_url(self, lat: float, lon: float) -> Optional[str]:
+        """Forecast URL of the grid cell covering a location; None outside NOAA coverage"""
+        key = self.bucket(lat, lon)
+        try:
+            return self._cache_get(self._grids, key)
+        except KeyError:
+            pass
+        try:
+            points = self._single_flight(
+                ('points', key), lambda: self._fetch_json(f"{self.base_url}/points/{key[0]},{key[1]}")
+            )
+            url = points['properties']['forecast']
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 404:
+                raise
+            url = None
+        self._cache_put(self._grids, key, url, self.max_grids)
+        return url
+
+    def _refresh(self, url: str) -> Dict:
+        period = self._fetch_json(url)['properties']['periods'][0]
+        self._cache_put(self._forecasts, url, (period, time.monotonic()), self.max_forecasts)
+        return period
+
+    def _refresh_in_background(self, url: str):
+        with self._lock:
+            if ('forecast', url) in self._inflight:
+                return
+            future = self._inflight[('forecast', url)] = self._refresher.submit(self._refresh, url)
+
+        def done(finished):
+            with self._lock:
+                self._inflight.pop(('forecast', url), None)
+            if finished.exception() is not None:
+                logger.warning(f"Weather refresh failed for {url}: {str(finished.exception())}")
+        future.add_done_callback(done)
+
+    def current_period(self, lat: float, lon: float) -> Optional[Dict]:
+        """The current NOAA forecast period for a location, from cache where possible"""
+        url = self.forecast_url(lat, lon)
+        if url is None:
+            return None
+        try:
+            cached = self._cache_get(self._forecasts, url)
+        except KeyError:
+            cached = None
+        if cached is not None and time.monotonic() - cached[1] >= self.stale_ttl:
+            with self._lock:
+                if self._forecasts.get(url) is cached:
+                    del self._forecasts[url]
+        if cached is not None:
+            period, fetched_at = cached
+            age = time.monotonic() - fetched_at
+            if age < self.forecast_ttl:
+                return period
+            if age < self.stale_ttl:
+                self._refresh_in_background(url)
+                return period
+        try:
+            return self._single_flight(('forecast', url), lambda: self._refresh(url))
+        except Exception:
+            if cached is not None:
+                return cached[0]
+            raise
+
+    def context_for(self, location: Optional[Dict]) -> str:
+        """Weather sentence for prompt enhancement, or "" when NOAA has nothing for the location"""
+        location = location or {}
+        try:
+            period = self.current_period(location.get('lat', DEFAULT_LOCATION[0]),
+                                         location.get('lon', DEFAULT_LOCATION[1]))
+        except Exception as e:
+            logger.error(f"Weather integration error: {str(e)}")
+            return ""
+        if not period:
+            return ""
+        return f"Current weather: {period['shortForecast']}, {period['temperature']}°F. "
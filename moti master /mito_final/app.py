@@ -1,7 +1,9 @@
 import os
+import threading
 from pathlib import Path
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template
+from functools import wraps
+from flask import Flask, Response, g, request, session, jsonify, make_response, render_template, stream_with_context
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -19,6 +21,8 @@ from project_managers import (
 from file_processor import AdvancedFileProcessor
 from security import AdvancedSecurityManager
 from database import db_manager
+import replicas
+from pagination import clamp_limit, decode_cursor, stream_ndjson
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = config.SECRET_KEY
@@ -27,7 +31,7 @@ app.config["UPLOAD_FOLDER"] = config.UPLOAD_FOLDER
 CORS(app, origins=["*"])
 limiter = Limiter(app, key_func=get_remote_address, default_limits=[config.RATELIMIT_DEFAULT], storage_uri=config.REDIS_URL)
 cache = Cache(app, config={
-    'CACHE_TYPE': config.CACHE_TYPE,
+    'CACHE_TYPE': "SimpleCache" if config.REDIS_URL.startswith("memory://") else config.CACHE_TYPE,
     'CACHE_REDIS_URL': config.REDIS_URL,
     'CACHE_DEFAULT_TIMEOUT': config.CACHE_DEFAULT_TIMEOUT
 })
@@ -40,6 +44,50 @@ finance_manager = FinanceProjectManager()
 file_processor = AdvancedFileProcessor()
 security_manager = AdvancedSecurityManager()
 
+@app.before_request
+def route_reads_for_session():
+    replicas.begin_request(session.get("db_primary_until", 0.0))
+
+@app.after_request
+def remember_session_writes(response):
+    pinned_until = replicas.primary_pinned_until()
+    if pinned_until > session.get("db_primary_until", 0.0):
+        session["db_primary_until"] = pinned_until
+    return response
+
+def run_log_partition_maintenance(interval_seconds: int = 6 * 3600):
+    """Roll system_logs partitions forward for long-lived workers"""
+    stop = threading.Event()
+    while not stop.wait(interval_seconds):
+        try:
+            db_manager.maintain_log_partitions()
+        except Exception as e:
+            logger.error("log_partition_maintenance_failed", error=str(e))
+
+threading.Thread(target=run_log_partition_maintenance, name="log-partitions", daemon=True).start()
+
+@cache.memoize(timeout=300)
+def cached_project_count() -> int:
+    """Project total for the landing page, counted at most every five minutes"""
+    return db_manager.count_rows("projects")
+
+def require_user(view):
+    """Reject requests without a valid bearer token or over the user's rate limits; the token's user is g.current_user"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        header = request.headers.get("Authorization", "")
+        payload = security_manager.verify_jwt_token(header[7:]) if header.startswith("Bearer ") else {}
+        if not payload.get("user_id"):
+            return jsonify({"error": "Authentication required"}), 401
+        limits = security_manager.check_user_limits(payload["user_id"])
+        if not limits.allowed:
+            return jsonify({"error": "Rate limit exceeded"}), 429, limits.headers()
+        g.current_user = payload
+        response = make_response(view(*args, **kwargs))
+        response.headers.extend(limits.headers())
+        return response
+    return wrapper
+
 @app.route("/")
 def home():
     platform_info = {
@@ -49,7 +97,7 @@ def home():
         "contact": config.PLATFORM_CONTACT,
         "copyright": f"2025 {config.PLATFORM_CREATOR} - All Rights Reserved"
     }
-    projects = []  # Would load from DB in production
+    project_count = cached_project_count()
     features = [
         "AI Project Management", "Advanced File Processing", "Multi-Industry Support",
         "Real-time Analytics", "Secure Authentication"
@@ -59,7 +107,7 @@ def home():
     ]
     return render_template("index.html",
         platform_info=platform_info,
-        project_count=len(projects),
+        project_count=project_count,
         features_count=len(features),
         industries=industries
     )
@@ -108,6 +156,33 @@ def api_auth_login():
         security_manager.log_auth_attempt(user_id, False)
         return jsonify({"error": "Invalid credentials"}), 401
 
+def stream_listing(table: str):
+    """The current user's rows of a table, one keyset page as NDJSON"""
+    try:
+        limit = clamp_limit(request.args.get("limit"))
+        after = decode_cursor(request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    sort_field = db_manager.LISTINGS[table][1]
+    records = db_manager.iter_page(table, owner=g.current_user["user_id"], after=after, limit=limit)
+    return Response(stream_with_context(stream_ndjson(records, sort_field, limit)),
+                    mimetype="application/x-ndjson")
+
+@app.route("/api/projects")
+@require_user
+def api_list_projects():
+    return stream_listing("projects")
+
+@app.route("/api/files")
+@require_user
+def api_list_files():
+    return stream_listing("files")
+
+@app.route("/api/api-keys")
+@require_user
+def api_list_api_keys():
+    return stream_listing("api_keys")
+
 @app.route("/api/ping")
 def api_ping():
     return jsonify({"pong": True, "timestamp": datetime.utcnow().isoformat()})
@@ -1,4 +1,5 @@
 import os
+import secrets
 
 class AdvancedConfig:
     LLAMA_API_KEY = os.getenv("LLAMA_API_KEY")
@@ -7,4 +8,31 @@ class AdvancedConfig:
     CLAUDE_API_KEY = os.getenv("CLAUDE_API_KEY")
     CLAUDE_MODEL_NAME = os.getenv("CLAUDE_MODEL_NAME", "claude-3-opus-20240229")
     MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "llama")  # or "claude"
-    # ...rest of your config as before
\ No newline at end of file
+    DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost:5432/mito")  # or "sqlite:///mito.db"
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")  # or "memory://"
+    DATABASE_READ_URLS = [url for url in os.getenv("DATABASE_READ_URLS", "").split(",") if url]
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+    READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+    LOG_RETENTION_MONTHS = int(os.getenv("LOG_RETENTION_MONTHS", "6"))
+    LOG_PARTITIONS_AHEAD = int(os.getenv("LOG_PARTITIONS_AHEAD", "2"))
+    # Web app
+    SECRET_KEY = os.getenv("SECRET_KEY") or secrets.token_hex(32)  # set it when running several workers
+    DEBUG = os.getenv("FLASK_DEBUG", "0") == "1"
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(50 * 1024 * 1024)))
+    UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
+    RATELIMIT_DEFAULT = os.getenv("RATELIMIT_DEFAULT", "200 per hour")
+    CACHE_TYPE = os.getenv("CACHE_TYPE", "RedisCache")
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv("CACHE_DEFAULT_TIMEOUT", "300"))
+    # Security
+    TOKEN_EXPIRY_HOURS = int(os.getenv("TOKEN_EXPIRY_HOURS", "24"))
+    API_KEY_LENGTH = int(os.getenv("API_KEY_LENGTH", "64"))
+    USER_LIMIT_PER_MINUTE = int(os.getenv("USER_LIMIT_PER_MINUTE", "60"))
+    USER_LIMIT_PER_HOUR = int(os.getenv("USER_LIMIT_PER_HOUR", "1000"))
+    USER_LIMIT_PER_DAY = int(os.getenv("USER_LIMIT_PER_DAY", "10000"))
+    # Platform
+    PLATFORM_NAME = "MitoAI Platform"
+    PLATFORM_VERSION = "1.0.0"
+    PLATFORM_CREATOR = "Daniel Guzman"
+    PLATFORM_CONTACT = "guzman.daniel@outlook.com"
+
+config = AdvancedConfig()
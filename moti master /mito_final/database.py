@@ -2,77 +2,275 @@
 DATABASE MODELS & MANAGEMENT
 """
 
-import redis
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Tuple, Type
 import bcrypt
 import json
 
 from config import config
 from logging_setup import logger
+from records import Record, RowMapper, User, Project, FileRecord, APIKeyRecord
+from memory_redis import InMemoryRedis
+from replicas import ReplicaRouter, pin_reads_to_primary
 
-@dataclass
-class User:
-    id: str
-    email: str
-    password_hash: str
-    role: str
-    permissions: List[str]
-    created_at: datetime
-    last_login: Optional[datetime] = None
-    is_active: bool = True
-    login_attempts: int = 0
-    locked_until: Optional[datetime] = None
-
-@dataclass
-class Project:
-    id: str
-    name: str
-    description: str
-    industry: str
-    manager_type: str
-    status: str
-    created_by: str
-    created_at: datetime
-    updated_at: datetime
-    metadata: Dict[str, Any]
-
-@dataclass
-class FileRecord:
-    id: str
-    filename: str
-    original_name: str
-    file_type: str
-    file_size: int
-    mime_type: str
-    uploaded_by: str
-    uploaded_at: datetime
-    processed: bool = False
-    processing_results: Optional[Dict] = None
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+    from psycopg2.extras import RealDictCursor, register_default_jsonb
+except ImportError:
+    psycopg2 = None
+    RealDictCursor = None
 
 class DatabaseManager:
     """Advanced database management with connection pooling"""
 
-    def __init__(self):
+    # Composite indexes backing keyset pagination, newest first
+    KEYSET_INDEXES = (
+        "CREATE INDEX IF NOT EXISTS idx_projects_created ON projects (created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_projects_owner_created ON projects (created_by, created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_files_uploaded ON files (uploaded_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_files_owner_uploaded ON files (uploaded_by, uploaded_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_api_keys_created ON api_keys (created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_api_keys_owner_created ON api_keys (user_id, created_at DESC, id DESC)",
+    )
+
+    # Range-partitioned by month; see maintain_log_partitions
+    SYSTEM_LOGS_DDL = """
+        CREATE TABLE IF NOT EXISTS system_logs (
+            id BIGSERIAL,
+            level VARCHAR(50) NOT NULL,
+            message TEXT NOT NULL,
+            module VARCHAR(200),
+            user_id VARCHAR(255),
+            metadata JSONB DEFAULT '{}',
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """
+
+    # table -> (record class, sort column, owner column)
+    LISTINGS = {
+        "projects": (Project, "created_at", "created_by"),
+        "files": (FileRecord, "uploaded_at", "uploaded_by"),
+        "api_keys": (APIKeyRecord, "created_at", "user_id"),
+    }
+
+    def __init__(self, database_url: str = None, redis_client=None, reader_urls: List[str] = None):
+        self.database_url = database_url or config.DATABASE_URL
         self.connection_pool = []
         self.max_connections = 20
-        self.redis_client = redis.from_url(config.REDIS_URL)
+        self.redis_client = redis_client or create_redis_client(config.REDIS_URL)
+        self.replicas = ReplicaRouter(
+            reader_urls if reader_urls is not None else config.DATABASE_READ_URLS,
+            connect=self._connect_url,
+            max_lag_seconds=config.REPLICA_MAX_LAG_SECONDS
+        )
         self.initialize_database()
 
-    def get_connection(self):
-        """Get database connection from pool"""
+    def _connect_url(self, url: str):
+        if psycopg2 is None:
+            raise ImportError("psycopg2 package not installed")
+        return psycopg2.connect(url, cursor_factory=RealDictCursor)
+
+    def get_connection(self, intent: str = "write"):
+        """Get a connection: "read" may go to a caught-up replica, anything else to the primary"""
+        url = self.replicas.choose() if intent == "read" else None
+        if url is None:
+            url = self.database_url
+            if intent != "read":
+                pin_reads_to_primary(config.READ_YOUR_WRITES_SECONDS)
         try:
-            return psycopg2.connect(
-                config.DATABASE_URL,
-                cursor_factory=RealDictCursor
-            )
+            return self._connect_url(url)
         except Exception as e:
-            logger.error("database_connection_failed", error=str(e))
+            logger.error("database_connection_failed", intent=intent, error=str(e))
             raise
 
+    def tuple_cursor(self, conn):
+        """Cursor yielding plain tuples with JSONB left as undecoded text"""
+        cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+        register_default_jsonb(cursor, loads=lambda raw: raw)
+        return cursor
+
+    def fetch_records(self, record_cls: Type[Record], query: str, params=(), intent: str = "read") -> List[Record]:
+        """Run a query and materialize every row as a slotted record"""
+        conn = self.get_connection(intent)
+        try:
+            cursor = self.tuple_cursor(conn)
+            cursor.execute(query, params)
+            records = RowMapper(record_cls, cursor.description).map_all(cursor.fetchall())
+            cursor.close()
+            return records
+        finally:
+            conn.close()
+
+    def iter_records(self, record_cls: Type[Record], query: str, params=(), batch_size: int = 500,
+                     intent: str = "read") -> Iterator[Record]:
+        """Yield records batch by batch without holding the whole result set"""
+        conn = self.get_connection(intent)
+        try:
+            cursor = self.tuple_cursor(conn)
+            cursor.execute(query, params)
+            mapper = RowMapper(record_cls, cursor.description)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield mapper(row)
+            cursor.close()
+        finally:
+            conn.close()
+
+    def iter_page(self, table: str, owner: Optional[str] = None,
+                  after: Optional[Tuple] = None, limit: int = 100) -> Iterator[Record]:
+        """Keyset page over (sort column, id), newest first; cost does not grow with page depth"""
+        record_cls, sort_column, owner_column = self.LISTINGS[table]
+        clauses = []
+        params = []
+        if owner is not None:
+            clauses.append(f"{owner_column} = %s")
+            params.append(owner)
+        if after is not None:
+            clauses.append(f"({sort_column}, id) < (%s, %s)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = f"SELECT * FROM {table} {where} ORDER BY {sort_column} DESC, id DESC LIMIT %s"
+        params.append(limit)
+        return self.iter_records(record_cls, query, tuple(params), batch_size=min(limit, 500))
+
+    def _create_log_partition(self, cursor, start: datetime) -> bool:
+        """Attach the month partition starting at start, moving its rows out of DEFAULT first"""
+        name = f"system_logs_{start:y%Ym%m}"
+        cursor.execute("SELECT to_regclass(%s) AS existing", (name,))
+        if cursor.fetchone()["existing"] is not None:
+            return False
+        end = _shift_month(start, 1)
+        # Postgres rejects a new partition while DEFAULT holds rows in its range
+        cursor.execute(f"CREATE TABLE {name} (LIKE system_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM system_logs_default WHERE created_at >= %s AND created_at < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """, (start, end))
+        moved = cursor.rowcount
+        cursor.execute(f"ALTER TABLE system_logs ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+        logger.info("log_partition_created", partition=name, moved_from_default=moved)
+        return True
+
+    def migrate_legacy_logs(self):
+        """
+        Convert a system_logs table created before partitioning
+
+        The plain table is renamed to system_logs_legacy, the partitioned
+        parent takes its name, and the legacy rows are copied into month
+        partitions before the legacy table is dropped. A migration that
+        was interrupted resumes from the leftover legacy table.
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT relkind FROM pg_class WHERE relname = 'system_logs' AND relkind IN ('r', 'p')")
+            row = cursor.fetchone()
+            if row is not None and row["relkind"] == "r":
+                cursor.execute("ALTER TABLE system_logs RENAME TO system_logs_legacy")
+                cursor.execute("ALTER INDEX IF EXISTS system_logs_pkey RENAME TO system_logs_legacy_pkey")
+                cursor.execute("ALTER SEQUENCE IF EXISTS system_logs_id_seq RENAME TO system_logs_legacy_id_seq")
+            cursor.execute("SELECT to_regclass('system_logs_legacy') AS legacy")
+            if cursor.fetchone()["legacy"] is None:
+                conn.commit()
+                cursor.close()
+                return
+            cursor.execute(self.SYSTEM_LOGS_DDL)
+            cursor.execute("CREATE TABLE IF NOT EXISTS system_logs_default PARTITION OF system_logs DEFAULT")
+            cursor.execute("""
+                SELECT DISTINCT date_trunc('month', created_at) AS month
+                FROM system_logs_legacy WHERE created_at IS NOT NULL
+            """)
+            for row in cursor.fetchall():
+                self._create_log_partition(cursor, row["month"])
+            cursor.execute("""
+                INSERT INTO system_logs (id, level, message, module, user_id, metadata, created_at)
+                SELECT id, level, message, module, user_id, COALESCE(metadata, '{}'),
+                       COALESCE(created_at, CURRENT_TIMESTAMP)
+                FROM system_logs_legacy
+            """)
+            migrated = cursor.rowcount
+            cursor.execute("""
+                SELECT setval(pg_get_serial_sequence('system_logs', 'id'),
+                              GREATEST((SELECT MAX(id) FROM system_logs), 1))
+            """)
+            cursor.execute("DROP TABLE system_logs_legacy")
+            conn.commit()
+            cursor.close()
+            logger.info("legacy_logs_migrated", rows=migrated)
+        finally:
+            conn.close()
+
+    def maintain_log_partitions(self, now: Optional[datetime] = None) -> List[str]:
+        """
+        Create system_logs partitions ahead of time and drop those past retention
+
+        Every worker runs this, so it holds a transaction-level advisory
+        lock; a worker that finds the lock taken skips this round.
+        """
+        first = (now or datetime.utcnow()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        months = [_shift_month(first, offset) for offset in range(config.LOG_PARTITIONS_AHEAD + 1)]
+        cutoff = _shift_month(first, -config.LOG_RETENTION_MONTHS)
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext('system_logs_maintenance')) AS locked")
+            if not cursor.fetchone()["locked"]:
+                conn.rollback()
+                cursor.close()
+                logger.info("log_partitions_maintenance_skipped", reason="held by another worker")
+                return []
+            cursor.execute("CREATE TABLE IF NOT EXISTS system_logs_default PARTITION OF system_logs DEFAULT")
+            for start in months:
+                self._create_log_partition(cursor, start)
+            # Rows that landed in DEFAULT expire with the partitions of their month
+            cursor.execute("DELETE FROM system_logs_default WHERE created_at < %s", (cutoff,))
+            cursor.execute("""
+                SELECT child.relname FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = 'system_logs'
+            """)
+            expired = []
+            for row in cursor.fetchall():
+                name = row["relname"]
+                try:
+                    start = datetime.strptime(name, "system_logs_y%Ym%m")
+                except ValueError:
+                    continue
+                if _shift_month(start, 1) <= cutoff:
+                    cursor.execute(f"ALTER TABLE system_logs DETACH PARTITION {name}")
+                    cursor.execute(f"DROP TABLE {name}")
+                    expired.append(name)
+            conn.commit()
+            cursor.close()
+            logger.info("log_partitions_maintained", created_through=months[-1].isoformat(), dropped=expired)
+            return expired
+        finally:
+            conn.close()
+
+    def count_rows(self, table: str) -> int:
+        conn = self.get_connection("read")
+        try:
+            cursor = self.tuple_cursor(conn)
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            count = cursor.fetchone()[0]
+            cursor.close()
+            return count
+        finally:
+            conn.close()
+
     def initialize_database(self):
         """Initialize database tables"""
         try:
@@ -133,21 +331,20 @@ class DatabaseManager:
                     expires_at TIMESTAMP
                 )
             """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS system_logs (
-                    id SERIAL PRIMARY KEY,
-                    level VARCHAR(50) NOT NULL,
-                    message TEXT NOT NULL,
-                    module VARCHAR(200),
-                    user_id VARCHAR(255),
-                    metadata JSONB DEFAULT '{}',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
             conn.commit()
             cursor.close()
             conn.close()
-            logger.info("database_initialized", tables_created=5)
+            self.migrate_legacy_logs()
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(self.SYSTEM_LOGS_DDL)
+            for statement in self.KEYSET_INDEXES:
+                cursor.execute(statement)
+            conn.commit()
+            cursor.close()
+            conn.close()
+            logger.info("database_initialized", tables_created=5, indexes_created=len(self.KEYSET_INDEXES))
+            self.maintain_log_partitions()
         except Exception as e:
             logger.error("database_initialization_failed", error=str(e))
             raise
@@ -178,5 +375,29 @@ class DatabaseManager:
         except Exception as e:
             logger.error("default_admin_creation_failed", error=str(e))
 
-db_manager = DatabaseManager()
+def _shift_month(moment: datetime, months: int) -> datetime:
+    index = moment.year * 12 + moment.month - 1 + months
+    return moment.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+_memory_redis = None
+
+def create_redis_client(redis_url: str):
+    """Connect to Redis, or share one in-process stand-in for memory:// URLs"""
+    global _memory_redis
+    if redis_url.startswith("memory://"):
+        if _memory_redis is None:
+            _memory_redis = InMemoryRedis()
+        return _memory_redis
+    if redis is None:
+        raise ImportError("redis package not installed")
+    return redis.from_url(redis_url)
+
+def create_database_manager() -> DatabaseManager:
+    """Pick the storage backend from DATABASE_URL (sqlite:// runs embedded)"""
+    if config.DATABASE_URL.startswith("sqlite:"):
+        from sqlite_backend import SQLiteDatabaseManager
+        return SQLiteDatabaseManager(config.DATABASE_URL)
+    return DatabaseManager()
+
+db_manager = create_database_manager()
 db_manager.create_default_admin()
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+STRUCTURED LOGGING
+"""
+
+import logging
+import os
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s",
+)
+
+try:
+    import structlog
+except ImportError:
+    structlog = None
+
+
+class KeyValueLogger:
+    """logger.info("event", key=value) on top of stdlib logging when structlog is not installed"""
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(name)
+
+    def _log(self, level: int, event: str, **fields):
+        if self._logger.isEnabledFor(level):
+            pairs = " ".join(f"{key}={value!r}" for key, value in fields.items())
+            self._logger.log(level, f"{event} {pairs}" if pairs else event)
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields):
+        self._log(logging.ERROR, event, **fields)
+
+
+if structlog is not None:
+    structlog.configure(logger_factory=structlog.stdlib.LoggerFactory())
+    logger = structlog.get_logger("mito")
+else:
+    logger = KeyValueLogger("mito")
@@ -0,0 +1,192 @@
+"""
+IN-MEMORY REDIS STAND-IN
+"""
+
+import fnmatch
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+def _encode(value: Any) -> bytes:
+    """Store values as bytes, matching what redis-py hands back"""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, bool):
+        value = int(value)
+    return str(value).encode("utf-8")
+
+
+class InMemoryRedis:
+    """Process-local subset of the redis-py client API.
+
+    Covers the commands the platform uses (strings, counters, hashes,
+    expiry, pipelines) so single-node deployments and load tests can run
+    without a Redis server. Values are returned as bytes like redis-py.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def _alive(self, key: str) -> bool:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def atomic(self):
+        """Lock held across several commands, standing in for a server-side script"""
+        return self._lock
+
+    def ping(self) -> bool:
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if not self._alive(key):
+                return None
+            return self._data[key]
+
+    def set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        with self._lock:
+            if nx and self._alive(key):
+                return None
+            self._data[key] = _encode(value)
+            self._expires.pop(key, None)
+            if ex is not None:
+                self._expires[key] = time.monotonic() + ex
+            return True
+
+    def setex(self, key: str, seconds: int, value: Any) -> bool:
+        return self.set(key, value, ex=seconds)
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    removed += 1
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+    def exists(self, *keys: str) -> int:
+        with self._lock:
+            return sum(1 for key in keys if self._alive(key))
+
+    def keys(self, pattern: str = "*") -> List[bytes]:
+        with self._lock:
+            return [key.encode("utf-8") for key in list(self._data)
+                    if self._alive(key) and fnmatch.fnmatchcase(key, pattern)]
+
+    def incrby(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            current = int(self._data[key]) if self._alive(key) else 0
+            current += amount
+            self._data[key] = _encode(current)
+            return current
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        return self.incrby(key, amount)
+
+    def expire(self, key: str, seconds: int) -> bool:
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expires[key] = time.monotonic() + seconds
+            return True
+
+    def ttl(self, key: str) -> int:
+        with self._lock:
+            if not self._alive(key):
+                return -2
+            deadline = self._expires.get(key)
+            if deadline is None:
+                return -1
+            return max(int(deadline - time.monotonic()), 0)
+
+    def hset(self, key: str, field: Optional[str] = None, value: Any = None,
+             mapping: Optional[Dict[str, Any]] = None) -> int:
+        with self._lock:
+            if not self._alive(key):
+                self._data[key] = {}
+            bucket = self._data[key]
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            added = 0
+            for name, item in items.items():
+                name = _encode(name)
+                if name not in bucket:
+                    added += 1
+                bucket[name] = _encode(item)
+            return added
+
+    def hget(self, key: str, field: str) -> Optional[bytes]:
+        with self._lock:
+            if not self._alive(key):
+                return None
+            return self._data[key].get(_encode(field))
+
+    def hgetall(self, key: str) -> Dict[bytes, bytes]:
+        with self._lock:
+            if not self._alive(key):
+                return {}
+            return dict(self._data[key])
+
+    def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        with self._lock:
+            if not self._alive(key):
+                self._data[key] = {}
+            bucket = self._data[key]
+            name = _encode(field)
+            current = int(bucket.get(name, 0)) + amount
+            bucket[name] = _encode(current)
+            return current
+
+    def hdel(self, key: str, *fields: str) -> int:
+        with self._lock:
+            if not self._alive(key):
+                return 0
+            bucket = self._data[key]
+            return sum(1 for field in fields if bucket.pop(_encode(field), None) is not None)
+
+    def flushdb(self) -> bool:
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+            return True
+
+    def pipeline(self, transaction: bool = True) -> "InMemoryPipeline":
+        return InMemoryPipeline(self)
+
+
+class InMemoryPipeline:
+    """Buffers commands and replays them under the client lock on execute()"""
+
+    def __init__(self, client: InMemoryRedis):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        command = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self) -> List[Any]:
+        with self._client._lock:
+            results = [command(*args, **kwargs) for command, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._commands = []
@@ -1,53 +1,13 @@
 import redis
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional, Dict, Any
 import bcrypt
 import json
 
 from config import config
 from logging_setup import logger
-
-@dataclass
-class User:
-    id: str
-    email: str
-    password_hash: str
-    role: str
-    permissions: List[str]
-    created_at: datetime
-    last_login: Optional[datetime] = None
-    is_active: bool = True
-    login_attempts: int = 0
-    locked_until: Optional[datetime] = None
-
-@dataclass
-class Project:
-    id: str
-    name: str
-    description: str
-    industry: str
-    manager_type: str
-    status: str
-    created_by: str
-    created_at: datetime
-    updated_at: datetime
-    metadata: Dict[str, Any]
-
-@dataclass
-class FileRecord:
-    id: str
-    filename: str
-    original_name: str
-    file_type: str
-    file_size: int
-    mime_type: str
-    uploaded_by: str
-    uploaded_at: datetime
-    processed: bool = False
-    processing_results: Optional[Dict] = None
+from records import User, Project, FileRecord
 
 class DatabaseManager:
     def __init__(self):
@@ -0,0 +1,55 @@
+"""
+KEYSET PAGINATION & NDJSON STREAMING
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+MAX_PAGE_SIZE = 1000
+DEFAULT_PAGE_SIZE = 100
+
+
+def encode_cursor(sort_value: datetime, row_id: str) -> str:
+    """Opaque token for the last (timestamp, id) a client has seen"""
+    payload = json.dumps([sort_value.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Tuple[datetime, str]]:
+    if not token:
+        return None
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        return datetime.fromisoformat(sort_value), str(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+
+def clamp_limit(raw_limit) -> int:
+    try:
+        limit = int(raw_limit) if raw_limit is not None else DEFAULT_PAGE_SIZE
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def stream_ndjson(records: Iterable, sort_field: str, limit: int):
+    """Yield one JSON line per record, then a trailer line carrying next_cursor"""
+    count = 0
+    last = None
+    for record in records:
+        count += 1
+        last = record
+        yield json.dumps(record.to_public_dict(), default=_json_default) + "\n"
+    next_cursor = None
+    if count == limit and last is not None:
+        next_cursor = encode_cursor(getattr(last, sort_field), last.id)
+    yield json.dumps({"next_cursor": next_cursor, "count": count}) + "\n"
@@ -0,0 +1,187 @@
+"""
+ATOMIC MULTI-WINDOW RATE LIMITING
+"""
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+# KEYS: (current bucket, previous bucket) per window
+# ARGV: cost, pending, then (previous-bucket weight, limit, ttl) per window
+# Checks every window first and only counts `cost` when all of them allow it;
+# `pending` (requests already admitted from a local lease) is always recorded.
+SLIDING_WINDOW_SCRIPT = """
+local cost = tonumber(ARGV[1])
+local pending = tonumber(ARGV[2])
+local windows = #KEYS / 2
+local used = {}
+local allowed = 1
+for i = 1, windows do
+    local current = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    local weight = tonumber(ARGV[3 * i])
+    local limit = tonumber(ARGV[3 * i + 1])
+    used[i] = math.floor(previous * weight) + current + pending
+    if used[i] + cost > limit then
+        allowed = 0
+    end
+end
+local charge = pending
+if allowed == 1 then
+    charge = charge + cost
+end
+for i = 1, windows do
+    if charge > 0 then
+        redis.call('INCRBY', KEYS[2 * i - 1], charge)
+        redis.call('EXPIRE', KEYS[2 * i - 1], tonumber(ARGV[3 * i + 2]))
+    end
+    if allowed == 1 then
+        used[i] = used[i] + cost
+    end
+end
+table.insert(used, 1, allowed)
+return used
+"""
+
+WINDOW_NAMES = {60: "minute", 3600: "hour", 86400: "day"}
+
+
+@dataclass
+class WindowState:
+    name: str
+    limit: int
+    remaining: int
+    reset_seconds: int
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    windows: List[WindowState]
+
+    @property
+    def tightest(self) -> WindowState:
+        return min(self.windows, key=lambda window: (window.remaining, -window.reset_seconds))
+
+    def headers(self) -> Dict[str, str]:
+        """X-RateLimit-* headers for the most constrained window, plus Retry-After when denied; Reset is seconds from now"""
+        window = self.tightest
+        headers = {
+            "X-RateLimit-Limit": str(window.limit),
+            "X-RateLimit-Remaining": str(window.remaining),
+            "X-RateLimit-Reset": str(window.reset_seconds),
+            "X-RateLimit-Window": window.name,
+        }
+        if not self.allowed:
+            exhausted = [w for w in self.windows if w.remaining <= 0]
+            headers["Retry-After"] = str(max(w.reset_seconds for w in exhausted or [window]))
+        return headers
+
+
+class _Lease:
+    __slots__ = ("remaining", "pending", "expires_at", "snapshot")
+
+    def __init__(self, remaining: int, expires_at: float, snapshot: RateLimitResult):
+        self.remaining = remaining
+        self.pending = 0
+        self.expires_at = expires_at
+        self.snapshot = snapshot
+
+
+class MultiWindowRateLimiter:
+    """Sliding-window counters for several windows, checked and charged in one Redis call.
+
+    A key that Redis reports as far from every limit gets a small local lease
+    (local_share of its remaining quota, for at most lease_seconds); requests
+    inside the lease skip Redis and are charged on the next round trip.
+    This module is shared by both apps (Mito/rate_limiter.py links to it),
+    so it depends on nothing but the client it is given.
+    """
+
+    def __init__(self, redis_client, prefix: str = "ratelimit", local_share: float = 0.05,
+                 lease_seconds: float = 1.0, max_leases: int = 100000):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.local_share = local_share
+        self.lease_seconds = lease_seconds
+        self.max_leases = max_leases
+        self._leases: Dict[str, _Lease] = {}
+        self._lock = threading.Lock()
+        # The in-process stand-in (memory_redis.InMemoryRedis) has no scripting; see _evaluate
+        register_script = getattr(redis_client, "register_script", None)
+        self._script = register_script(SLIDING_WINDOW_SCRIPT) if register_script is not None else None
+
+    def _plan(self, identity: str, windows: Sequence[Tuple[int, int]], now: float):
+        keys, weights, resets = [], [], []
+        for window_seconds, _ in windows:
+            bucket = int(now // window_seconds)
+            elapsed = (now % window_seconds) / window_seconds
+            keys.append(f"{self.prefix}:{identity}:{window_seconds}:{bucket}")
+            keys.append(f"{self.prefix}:{identity}:{window_seconds}:{bucket - 1}")
+            weights.append(1.0 - elapsed)
+            resets.append(int(math.ceil(window_seconds - now % window_seconds)))
+        return keys, weights, resets
+
+    def _evaluate(self, keys: List[str], args: List) -> List[int]:
+        if self._script is not None:
+            return [int(value) for value in self._script(keys=keys, args=args)]
+        # Same algorithm for the in-process stand-in, made atomic by its lock
+        cost, pending = args[0], args[1]
+        with self.redis.atomic():
+            used, allowed = [], 1
+            for i in range(len(keys) // 2):
+                current = int(self.redis.get(keys[2 * i]) or 0)
+                previous = int(self.redis.get(keys[2 * i + 1]) or 0)
+                weight, limit = args[3 * i + 2], args[3 * i + 3]
+                used.append(math.floor(previous * weight) + current + pending)
+                if used[i] + cost > limit:
+                    allowed = 0
+            charge = pending + (cost if allowed else 0)
+            for i in range(len(used)):
+                if charge:
+                    self.redis.incrby(keys[2 * i], charge)
+                    self.redis.expire(keys[2 * i], args[3 * i + 4])
+                if allowed:
+                    used[i] += cost
+            return [allowed] + used
+
+    def check(self, identity: str, windows: Sequence[Tuple[int, int]], cost: int = 1) -> RateLimitResult:
+        """Admit or reject one request against every (window_seconds, limit) pair"""
+        windows = [(seconds, limit) for seconds, limit in windows if limit is not None and limit >= 0]
+        if not windows:
+            return RateLimitResult(True, [])
+        now_mono = time.monotonic()
+
+        with self._lock:
+            lease = self._leases.get(identity)
+            if lease is not None and lease.remaining >= cost and now_mono < lease.expires_at:
+                lease.remaining -= cost
+                lease.pending += cost
+                return lease.snapshot
+            pending = lease.pending if lease is not None else 0
+            self._leases.pop(identity, None)
+
+        now = time.time()
+        keys, weights, resets = self._plan(identity, windows, now)
+        args = [cost, pending]
+        for (window_seconds, limit), weight in zip(windows, weights):
+            args.extend([weight, limit, window_seconds * 2])
+        allowed, *used = self._evaluate(keys, args)
+
+        states = [
+            WindowState(WINDOW_NAMES.get(seconds, f"{seconds}s"), limit, max(limit - count, 0), reset)
+            for (seconds, limit), count, reset in zip(windows, used, resets)
+        ]
+        result = RateLimitResult(bool(allowed), states)
+
+        if result.allowed:
+            grant = int(min(state.remaining for state in states) * self.local_share)
+            if grant > 0:
+                expires_at = now_mono + min(self.lease_seconds, min(resets))
+                with self._lock:
+                    if len(self._leases) >= self.max_leases:
+                        self._leases.clear()
+                    self._leases[identity] = _Lease(grant, expires_at, result)
+        return result
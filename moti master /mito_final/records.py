@@ -0,0 +1,175 @@
+"""
+COMPACT ROW RECORDS
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class JSONField:
+    """Descriptor that keeps a JSON column as raw text until first access"""
+
+    def __set_name__(self, owner, name):
+        self.slot = "_" + name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        # Columns using this descriptor hold objects/arrays, so text means undecoded
+        if isinstance(value, (str, bytes, bytearray)):
+            value = json.loads(value)
+            setattr(obj, self.slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
+
+class Record:
+    """Slotted base for table rows.
+
+    Subclasses list their columns in FIELDS (constructor order) and use
+    JSONField for JSONB columns, whose slot is the column name with a
+    leading underscore.
+    """
+
+    __slots__ = ()
+    FIELDS: Tuple[str, ...] = ()
+    DEFAULTS: Dict[str, Any] = {}
+    PRIVATE_FIELDS: Tuple[str, ...] = ()
+
+    def __init__(self, *args, **kwargs):
+        if len(args) > len(self.FIELDS):
+            raise TypeError(f"{type(self).__name__} takes at most {len(self.FIELDS)} positional arguments")
+        values = dict(self.DEFAULTS)
+        values.update(zip(self.FIELDS, args))
+        values.update(kwargs)
+        for name in self.FIELDS:
+            if name not in values:
+                raise TypeError(f"{type(self).__name__} missing required argument: '{name}'")
+            setattr(self, name, values[name])
+
+    @classmethod
+    def slot_for(cls, field: str) -> str:
+        return "_" + field if isinstance(cls.__dict__.get(field), JSONField) else field
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def to_public_dict(self) -> Dict[str, Any]:
+        """Fields safe to return from the API"""
+        return {name: getattr(self, name) for name in self.FIELDS if name not in self.PRIVATE_FIELDS}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+
+class RowMapper:
+    """Builds records from tuple rows with a column index resolved once per result set"""
+
+    def __init__(self, record_cls, description):
+        columns = {column[0]: index for index, column in enumerate(description)}
+        self.record_cls = record_cls
+        self.plan = tuple(
+            (record_cls.slot_for(name), columns[name])
+            for name in record_cls.FIELDS if name in columns
+        )
+        self.fill = tuple(
+            (record_cls.slot_for(name), record_cls.DEFAULTS.get(name))
+            for name in record_cls.FIELDS if name not in columns
+        )
+
+    def __call__(self, row):
+        record = self.record_cls.__new__(self.record_cls)
+        for slot, index in self.plan:
+            setattr(record, slot, row[index])
+        for slot, default in self.fill:
+            setattr(record, slot, default)
+        return record
+
+    def map_all(self, rows) -> List[Record]:
+        return [self(row) for row in rows]
+
+
+class User(Record):
+    __slots__ = ("id", "email", "password_hash", "role", "_permissions", "created_at",
+                 "last_login", "is_active", "login_attempts", "locked_until")
+    FIELDS = ("id", "email", "password_hash", "role", "permissions", "created_at",
+              "last_login", "is_active", "login_attempts", "locked_until")
+    DEFAULTS = {"last_login": None, "is_active": True, "login_attempts": 0, "locked_until": None}
+    PRIVATE_FIELDS = ("password_hash",)
+
+    id: str
+    email: str
+    password_hash: str
+    role: str
+    permissions: List[str] = JSONField()
+    created_at: datetime
+    last_login: Optional[datetime]
+    is_active: bool
+    login_attempts: int
+    locked_until: Optional[datetime]
+
+
+class Project(Record):
+    __slots__ = ("id", "name", "description", "industry", "manager_type", "status",
+                 "created_by", "created_at", "updated_at", "_metadata")
+    FIELDS = ("id", "name", "description", "industry", "manager_type", "status",
+              "created_by", "created_at", "updated_at", "metadata")
+
+    id: str
+    name: str
+    description: str
+    industry: str
+    manager_type: str
+    status: str
+    created_by: str
+    created_at: datetime
+    updated_at: datetime
+    metadata: Dict[str, Any] = JSONField()
+
+
+class FileRecord(Record):
+    __slots__ = ("id", "filename", "original_name", "file_type", "file_size", "mime_type",
+                 "uploaded_by", "uploaded_at", "processed", "_processing_results")
+    FIELDS = ("id", "filename", "original_name", "file_type", "file_size", "mime_type",
+              "uploaded_by", "uploaded_at", "processed", "processing_results")
+    DEFAULTS = {"processed": False, "processing_results": None}
+
+    id: str
+    filename: str
+    original_name: str
+    file_type: str
+    file_size: int
+    mime_type: str
+    uploaded_by: str
+    uploaded_at: datetime
+    processed: bool
+    processing_results: Optional[Dict] = JSONField()
+
+
+class APIKeyRecord(Record):
+    __slots__ = ("id", "key_hash", "user_id", "name", "_permissions", "created_at",
+                 "last_used", "is_active", "expires_at")
+    FIELDS = ("id", "key_hash", "user_id", "name", "permissions", "created_at",
+              "last_used", "is_active", "expires_at")
+    DEFAULTS = {"last_used": None, "is_active": True, "expires_at": None}
+    PRIVATE_FIELDS = ("key_hash",)
+
+    id: str
+    key_hash: str
+    user_id: str
+    name: str
+    permissions: List[str] = JSONField()
+    created_at: datetime
+    last_used: Optional[datetime]
+    is_active: bool
+    expires_at: Optional[datetime]
@@ -0,0 +1,114 @@
+"""
+READ REPLICA ROUTING
+"""
+
+import contextvars
+import itertools
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from logging_setup import logger
+
+# Reads go to the primary until this epoch time (read-your-writes)
+_primary_until = contextvars.ContextVar("db_primary_until", default=0.0)
+
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END AS lag_seconds
+"""
+
+
+def pin_reads_to_primary(seconds: float):
+    """Called on every writer checkout so this request/session reads its own writes"""
+    until = time.time() + seconds
+    if until > _primary_until.get():
+        _primary_until.set(until)
+
+
+def reads_pinned() -> bool:
+    return time.time() < _primary_until.get()
+
+
+def begin_request(primary_until: float = 0.0):
+    """Reset routing state for a new request, restoring a session's pin if any"""
+    _primary_until.set(primary_until or 0.0)
+
+
+def primary_pinned_until() -> float:
+    return _primary_until.get()
+
+
+class ReplicaRouter:
+    """
+    Round-robins reader DSNs and skips replicas lagging beyond max_lag_seconds
+
+    Lag is probed by a daemon thread every check_interval seconds, so
+    requests only read the last measurement. A replica that has not been
+    measured yet, or whose last measurement is older than three intervals
+    (the prober is stuck or the replica hangs), is treated as unhealthy.
+    """
+
+    def __init__(self, reader_urls: List[str], connect: Callable, max_lag_seconds: float,
+                 check_interval: float = 5.0):
+        self.reader_urls = list(reader_urls)
+        self.connect = connect
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._cycle = itertools.cycle(self.reader_urls) if self.reader_urls else None
+        self._lag: Dict[str, float] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if self.reader_urls:
+            threading.Thread(target=self._probe_loop, name="replica-lag", daemon=True).start()
+
+    def measure_lag(self, url: str) -> float:
+        """Query a replica's lag in seconds; unreachable counts as infinite"""
+        try:
+            conn = self.connect(url)
+            try:
+                cursor = conn.cursor()
+                cursor.execute(LAG_QUERY)
+                row = cursor.fetchone()
+                cursor.close()
+            finally:
+                conn.close()
+            lag = float(row["lag_seconds"] if isinstance(row, dict) else row[0])
+        except Exception as e:
+            logger.warning("replica_lag_check_failed", replica=url.rsplit("@", 1)[-1], error=str(e))
+            lag = float("inf")
+        with self._lock:
+            self._lag[url] = lag
+            self._checked_at[url] = time.monotonic()
+        return lag
+
+    def _probe_loop(self):
+        while True:
+            for url in self.reader_urls:
+                self.measure_lag(url)
+            if self._stop.wait(self.check_interval):
+                return
+
+    def stop(self):
+        self._stop.set()
+
+    def healthy(self, url: str) -> bool:
+        with self._lock:
+            lag = self._lag.get(url)
+            checked_at = self._checked_at.get(url, float("-inf"))
+        if lag is None or time.monotonic() - checked_at > 3 * self.check_interval:
+            return False
+        return lag <= self.max_lag_seconds
+
+    def choose(self) -> Optional[str]:
+        """Next healthy reader, or None to fall back to the primary"""
+        if self._cycle is None or reads_pinned():
+            return None
+        for _ in range(len(self.reader_urls)):
+            url = next(self._cycle)
+            if self.healthy(url):
+                return url
+        return None
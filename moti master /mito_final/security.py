@@ -1,4 +1,3 @@
-import redis
 from cryptography.fernet import Fernet
 import bcrypt
 import jwt
@@ -9,6 +8,7 @@ import uuid
 from config import config
 from database import db_manager
 from logging_setup import logger
+from rate_limiter import MultiWindowRateLimiter, RateLimitResult
 
 class AdvancedSecurityManager:
     def __init__(self):
@@ -16,6 +16,7 @@ class AdvancedSecurityManager:
         self.fernet = Fernet(self.fernet_key)
         self.jwt_secret = config.SECRET_KEY
         self.redis = db_manager.redis_client
+        self.rate_limiter = MultiWindowRateLimiter(self.redis, prefix="rate")
 
     def hash_password(self, password: str) -> str:
         return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
@@ -51,16 +52,13 @@ class AdvancedSecurityManager:
     def decrypt(self, ciphertext: str) -> str:
         return self.fernet.decrypt(ciphertext.encode()).decode()
 
-    def rate_limit_check(self, user_id: str, action: str, limit: int, window_seconds: int) -> bool:
-        key = f"rate:{user_id}:{action}"
-        current = self.redis.get(key)
-        if current and int(current) >= limit:
-            return False
-        pipe = self.redis.pipeline()
-        pipe.incr(key, 1)
-        pipe.expire(key, window_seconds)
-        pipe.execute()
-        return True
+    def check_user_limits(self, user_id: str) -> RateLimitResult:
+        """Enforce a user's minute/hour/day limits atomically; result.headers() feeds the response"""
+        return self.rate_limiter.check(f"user:{user_id}", [
+            (60, config.USER_LIMIT_PER_MINUTE),
+            (3600, config.USER_LIMIT_PER_HOUR),
+            (86400, config.USER_LIMIT_PER_DAY),
+        ])
 
     def log_auth_attempt(self, user_id: str, success: bool):
         logger.info("auth_attempt", user_id=user_id, success=success, timestamp=datetime.utcnow().isoformat())
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""
+EMBEDDED SQLITE STORAGE BACKEND
+"""
+
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+from config import config
+from database import DatabaseManager, _shift_month
+from logging_setup import logger
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(sep=" "))
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.fromisoformat(raw.decode("utf-8")))
+sqlite3.register_converter("BOOLEAN", lambda raw: raw not in (b"0", b""))
+
+_DIALECT_RULES = (
+    (re.compile(r"\bSERIAL PRIMARY KEY\b", re.IGNORECASE), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\bJSONB\b", re.IGNORECASE), "TEXT"),
+    (re.compile(r"%s"), "?"),
+)
+
+
+@lru_cache(maxsize=512)
+def translate_query(query: str) -> str:
+    """Rewrite Postgres-flavoured SQL used by DatabaseManager into SQLite SQL"""
+    for pattern, replacement in _DIALECT_RULES:
+        query = pattern.sub(replacement, query)
+    return query
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteCursor:
+    """Cursor wrapper that accepts psycopg2-style %s placeholders"""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def execute(self, query: str, params=()):
+        self._cursor.execute(translate_query(query), params)
+        return self
+
+    def executemany(self, query: str, seq_of_params):
+        self._cursor.executemany(translate_query(query), seq_of_params)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Thread-bound connection; close() keeps it open so its statement cache survives"""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+
+    def cursor(self, tuple_rows: bool = False) -> SQLiteCursor:
+        cursor = self._connection.cursor()
+        if tuple_rows:
+            cursor.row_factory = None
+        return SQLiteCursor(cursor)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        if self._connection.in_transaction:
+            self._connection.rollback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
+class SQLiteDatabaseManager(DatabaseManager):
+    """DatabaseManager backed by an embedded SQLite file in WAL mode"""
+
+    SYSTEM_LOGS_DDL = """
+        CREATE TABLE IF NOT EXISTS system_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            level VARCHAR(50) NOT NULL,
+            message TEXT NOT NULL,
+            module VARCHAR(200),
+            user_id VARCHAR(255),
+            metadata TEXT DEFAULT '{}',
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    KEYSET_INDEXES = DatabaseManager.KEYSET_INDEXES + (
+        "CREATE INDEX IF NOT EXISTS idx_system_logs_created ON system_logs (created_at)",
+    )
+
+    def __init__(self, database_url: str, redis_client=None):
+        self.database_path = self.parse_database_path(database_url)
+        self._local = threading.local()
+        super().__init__(database_url=database_url, redis_client=redis_client, reader_urls=[])
+
+    @staticmethod
+    def parse_database_path(database_url: str) -> str:
+        """Accept sqlite:///relative.db, sqlite:////abs/path.db and sqlite://:memory:"""
+        path = database_url.split("://", 1)[-1]
+        if path in ("", ":memory:", "/:memory:"):
+            return "file:mito?mode=memory&cache=shared"
+        return path[1:] if path.startswith("/") else path
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.database_path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            cached_statements=256,
+            uri=self.database_path.startswith("file:"),
+            timeout=30,
+        )
+        connection.row_factory = _dict_row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA foreign_keys=ON")
+        connection.execute("PRAGMA busy_timeout=30000")
+        return connection
+
+    def migrate_legacy_logs(self):
+        """system_logs is a plain table in SQLite, so there is nothing to convert"""
+
+    def maintain_log_partitions(self, now=None):
+        """No partitions in SQLite: retention is a range delete on the created_at index"""
+        first = (now or datetime.utcnow()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        cutoff = _shift_month(first, -config.LOG_RETENTION_MONTHS)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM system_logs WHERE created_at < %s", (cutoff,))
+        conn.commit()
+        cursor.close()
+        return []
+
+    def tuple_cursor(self, conn):
+        """JSON columns are TEXT here, so tuple rows already carry raw JSON"""
+        return conn.cursor(tuple_rows=True)
+
+    def get_connection(self, intent: str = "write"):
+        """Get this thread's SQLite connection; WAL readers never block the writer"""
+        try:
+            connection = getattr(self._local, "connection", None)
+            if connection is None:
+                connection = SQLiteConnection(self._connect())
+                self._local.connection = connection
+            return connection
+        except Exception as e:
+            logger.error("database_connection_failed", backend="sqlite", error=str(e))
+            raise